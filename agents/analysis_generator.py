@@ -1,22 +1,54 @@
-import io
-import contextlib
-from config import CSV_FILE_PATH
+import contextvars
+from agents.callbacks import AgentEventHandler, TracingCallbackHandler
+from tracing import traced, span
+from config import REPORT_CONCURRENCY
+from kernel import kernel_session, current_session, reset_kernel
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from langchain.schema import SystemMessage, HumanMessage
-from langchain.agents import initialize_agent, AgentType
 
-# Analyzes system error logs stored in a CSV file and generates an error summary report
-def analyze_errors(llm, tools):
+# Independent report sections: (key, title, what the section must cover)
+REPORT_SECTIONS = [
+    ("overview", "Overview of Errors", """
+                            - Total number of errors
+                            - Distribution of errors by severity (include count and percentages)
+                            - Breakdown of issue statuses (e.g., Resolved, Active, Pending)
+                            - Top 5 most frequent error messages (with occurrence counts)
+                            - Average issue duration (in human-readable format)"""),
+    ("trends", "Error Trends Over Time", """
+                            - Error trends over time (hourly), including peaks and quiet periods"""),
+    ("patterns", "Recurring Issues and Patterns", """
+                            - Frequently recurring issues with patterns over problem_time (hourly)"""),
+    ("unresolved", "Persistent and Unresolved Errors", """
+                            - Any persistent or unresolved error types, and how long they have been open"""),
+    ("hosts", "Component-Level Breakdown", """
+                            - Which hosts/systems are most affected, and by which problems"""),
+    ("mitigation", "Issue Mitigation Strategies", """
+                            - Concrete mitigation strategies and recommendations for the most significant issues""")
+]
+
+# System prompt shared by the full report and its sections
+def build_system_prompt(stats=None):
+
+    # Figures computed up front so the agent interprets them instead of recomputing each one
+    stats_section = f"""
+                        Pre-computed statistics (exact, computed from the full dataset):
+                        {stats}
+                        These count as real tool results: use these figures directly in the report. Only use 'python_executor_tool' for analysis they do not cover.
+                    """ if stats else ""
 
     system_prompt = f"""
-                        You are an advanced analytical agent responsible for analyzing system error logs stored in a CSV file located at: {CSV_FILE_PATH}.
-                        You have access to a tool called 'python_executor_tool', which allows you to dynamically execute Python code on the CSV. You MUST use this tool to retrieve any data or perform any calculations. Do NOT make up numbers or summaries — use the tool to get real data.
+                        You are an advanced analytical agent responsible for analyzing system error logs stored in a typed columnar data snapshot.
+                        You have access to a tool called 'python_executor_tool', which allows you to dynamically execute Python code on the dataset. You MUST use this tool to retrieve any data or perform any calculations. Do NOT make up numbers or summaries — use the tool to get real data.
                         Additionally, you can access the current date and time using the 'time_access_tool'. This tool will return the current date and time in a readable format whenever it is needed.
                         
                         For Python code execution:
-                        - Always read the CSV from the path: '{CSV_FILE_PATH}'
+                        - The data is already loaded as the pandas DataFrame `df` (typed; 'problem_time' is already a datetime). Do NOT read any CSV file
+                        - Variables you define persist between tool calls, so reuse earlier results instead of recomputing them
+                        - Do not modify `df` in place; assign filtered or derived frames to new variables
                         - Use pandas to manipulate data
                         - Do not use any plotting libraries
 
+                        {stats_section}
                         Use your own intelligence only for:
                         - Providing suggestions and strategic recommendations
                         - Interpreting the data
@@ -42,49 +74,62 @@ def analyze_errors(llm, tools):
                         Final Answer: <Full, plain-text summary with mitigation strategies and recommendations>  
 
                         ⚠️ You must explicitly include the line **Final Answer:** before concluding your response, or the system will break.
-                        Format your response as **plain text only** — do not use markdown, JSON, or code blocks. The output should be a comprehensive, human-readable analysis based solely on the CSV file.
+                        Format your response as **plain text only** — do not use markdown, JSON, or code blocks. The output should be a comprehensive, human-readable analysis based solely on the dataset.
                     """
+    return system_prompt
 
-    human_prompt = f"""
-                        The system error logs are stored in the provided CSV file path.
-                        Format your response as **plain text only** — do not use markdown, JSON, or code blocks.
+# Run the shared ReAct agent to completion, returning its response and thought log
+@traced("agent.analysis", "agent")
+def run_agent(agent, system_prompt, human_prompt, on_event=None):
+    # Structured events replace the ANSI stdout log; on_event streams them to the caller as they happen
+    handler = AgentEventHandler(on_event)
+    response = agent.invoke(
+        [
+            SystemMessage(content=system_prompt),
+            HumanMessage(content=human_prompt)
+        ],
+        config={"callbacks": [handler, TracingCallbackHandler()]},
+        handle_parsing_errors=True
+    )
+    thoughts = handler.transcript()
+        
+    return (response, thoughts)
 
-                        Error Summary Report:
-                        1) Overview of Errors:
-                            - Total number of errors
-                            - Distribution of errors by severity (include count and percentages)
-                            - Breakdown of issue statuses (e.g., Resolved, Active, Pending)
-                            - Top 5 most frequent error messages (with occurrence counts)
-                            - Average issue duration (in human-readable format)
+# Writes a single report section, in its own kernel namespace so concurrent sections don't share variables
+def analyze_section(agent, key, title, instructions, stats=None):
+    session_id, snapshot_id = current_session()
+    section_session = f"{session_id}/{key}"
 
-                        2) Detailed Analysis:
-                            - Error trends over time (hourly)
-                            - Frequently recurring issues with patterns over problem_time (hourly)
-                            - Any persistent or unresolved error types
-                            - Component-level breakdown (which hosts/systems are most affected)
-                            - Issue mitigation strategies
+    human_prompt = f"""
+                        The system error logs are preloaded as `df` in the python_executor_tool.
+                        Write ONLY the "{title}" section of the Error Summary Report. Other sections are written separately, so do not repeat their content.
+                        The section must cover:{instructions}
 
                         Output:
-                            Don't make up data — infer only from the provided CSV file
+                            Don't make up data — infer only from the provided dataset
                             Be clear and concise, avoid vague statements and quantify wherever possible
-                            Format your response as **plain text only** — do not use markdown, JSON, or code blocks.          
+                            Format your response as **plain text only** — do not use markdown, JSON, or code blocks.
                     """
-    
-    agent = initialize_agent(
-        tools=tools,
-        llm=llm,
-        agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
-        verbose=True,
-    )
 
-    with io.StringIO() as buf, contextlib.redirect_stdout(buf):
-        response = agent.invoke(
-            [
-                SystemMessage(content=system_prompt),
-                HumanMessage(content=human_prompt)
-            ],
-            handle_parsing_errors=True
-        )
-        thoughts = buf.getvalue()
-        
-    return (response, thoughts)
\ No newline at end of file
+    try:
+        with kernel_session(section_session, snapshot_id), span(f"report section {key}", "stage", section=title):
+            return run_agent(agent, build_system_prompt(stats), human_prompt)
+    finally:
+        reset_kernel(section_session)
+
+# Generates all report sections concurrently; yields (index, title, response, thoughts) as each one finishes
+def generate_report(agent, stats=None, max_workers=REPORT_CONCURRENCY):
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(contextvars.copy_context().run, analyze_section, agent, key, title, instructions, stats): (index, title)
+            for index, (key, title, instructions) in enumerate(REPORT_SECTIONS)
+        }
+
+        for future in as_completed(futures):
+            index, title = futures[future]
+            try:
+                response, thoughts = future.result()
+            except Exception as e:
+                response, thoughts = {"output": f"Section could not be generated: {str(e)}"}, ""
+            yield (index, title, response, thoughts)
\ No newline at end of file
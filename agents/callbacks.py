@@ -0,0 +1,193 @@
+import streamlit as st
+from langchain_core.callbacks import BaseCallbackHandler
+from history import estimate_tokens
+from tracing import start_span, end_span, current_span, activate, deactivate
+
+FINAL_ANSWER_MARKER = "Final Answer:"
+
+# Turns agent callbacks into structured events, keeps them for the transcript and forwards them to a sink
+class AgentEventHandler(BaseCallbackHandler):
+    run_inline = True
+
+    def __init__(self, on_event=None):
+        self.on_event = on_event
+        self.events = []
+
+    def emit(self, event):
+        self.events.append(event)
+        if self.on_event:
+            self.on_event(event)
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self.emit({"type": "llm_start"})
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.emit({"type": "llm_start"})
+
+    def on_llm_new_token(self, token, **kwargs):
+        self.emit({"type": "token", "text": token})
+
+    def on_agent_action(self, action, **kwargs):
+        self.emit({"type": "action", "tool": action.tool, "tool_input": action.tool_input, "log": action.log})
+
+    def on_tool_end(self, output, **kwargs):
+        self.emit({"type": "observation", "text": str(getattr(output, "content", output))})
+
+    def on_tool_error(self, error, **kwargs):
+        self.emit({"type": "error", "text": str(error)})
+
+    def on_agent_finish(self, finish, **kwargs):
+        self.emit({"type": "final", "text": finish.return_values.get("output", ""), "log": finish.log})
+
+    # Answers served from a cache finish without an agent run, so the sink still gets a closing event
+    def on_cache_hit(self, output):
+        self.emit({"type": "cached", "text": output})
+
+    # Plain-text thought log rebuilt from the events (no ANSI codes to strip)
+    def transcript(self):
+        lines = []
+        for event in self.events:
+            if event["type"] == "action":
+                lines.append(event["log"].strip())
+            elif event["type"] == "observation":
+                lines.append(f"Observation: {event['text'].strip()}")
+            elif event["type"] == "error":
+                lines.append(f"Error: {event['text']}")
+            elif event["type"] == "final":
+                lines.append(event["log"].strip())
+        return "\n".join(lines)
+
+# Token usage reported by the model, or None when the provider doesn't return it
+def _usage(response):
+    usage = (response.llm_output or {}).get("usage") or {}
+    generation = response.generations[0][0] if response.generations and response.generations[0] else None
+    usage = usage or getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+    if "input_tokens" not in usage:
+        return None
+    return {"input_tokens": usage.get("input_tokens"), "output_tokens": usage.get("output_tokens")}
+
+# Records agent steps as spans: each step (one LLM call and the tool call it asks for) holds an llm span and
+# a tool span; the tool span is current while the tool runs, so its queries and code runs nest under it
+class TracingCallbackHandler(BaseCallbackHandler):
+    run_inline = True
+
+    def __init__(self):
+        self.parent = current_span()
+        self.step = None
+        self.steps = 0
+        self.runs = {}
+        self.prompt_tokens = {}
+
+    def _end_step(self):
+        if self.step is not None:
+            end_span(self.step)
+            self.step = None
+
+    def _start_llm(self, run_id, prompt):
+        if self.step is None:
+            self.steps += 1
+            self.step = start_span(f"agent step {self.steps}", "step", parent=self.parent, step=self.steps)
+        self.runs[run_id] = start_span("llm", "llm", parent=self.step, prompt_chars=len(prompt), streamed_tokens=0)
+        self.prompt_tokens[run_id] = estimate_tokens(prompt)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start_llm(run_id, "".join(prompts))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start_llm(run_id, "".join(str(m.content) for batch in messages for m in batch))
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        span = self.runs.get(run_id)
+        if span is not None:
+            span.attributes["streamed_tokens"] += 1
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        span = self.runs.pop(run_id, None)
+        prompt_tokens = self.prompt_tokens.pop(run_id, None)
+        if span is None:
+            return
+
+        # Providers that don't report usage get the same ~4 characters per token estimate as the chat history
+        usage = _usage(response)
+        if usage is None:
+            text = "".join(g.text for batch in response.generations for g in batch)
+            usage = {"input_tokens": prompt_tokens, "output_tokens": estimate_tokens(text), "tokens_estimated": True}
+        end_span(span.set(**usage))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        span = self.runs.pop(run_id, None)
+        self.prompt_tokens.pop(run_id, None)
+        if span is not None:
+            end_span(span, error)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        span = start_span(f"tool {serialized.get('name', 'tool')}", "tool", parent=self.step or self.parent, input_chars=len(input_str))
+        self.runs[run_id] = (span, activate(span))
+
+    def _end_tool(self, run_id, output=None, error=None):
+        span, token = self.runs.pop(run_id, (None, None))
+        if span is None:
+            return
+        deactivate(token, span.parent)
+
+        if output is not None:
+            span.set(bytes=len(str(getattr(output, "content", output))))
+        end_span(span, error)
+        self._end_step()
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end_tool(run_id, output=output)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end_tool(run_id, error=error)
+
+    def on_agent_finish(self, finish, **kwargs):
+        self._end_step()
+
+    def on_chain_error(self, error, *, run_id, parent_run_id=None, **kwargs):
+        if parent_run_id is None:
+            self._end_step()
+
+# Renders agent events into the page as they arrive: steps in a status box, the answer streamed below it
+class StreamlitAgentStream:
+
+    def __init__(self, label, show_answer=True):
+        self.label = label
+        self.status = st.status(label, expanded=False)
+        self.thinking = self.status.empty()
+        self.answer = st.empty() if show_answer else None
+        self.generation = ""
+
+    def __call__(self, event):
+        if event["type"] == "llm_start":
+            self.generation = ""
+
+        elif event["type"] == "token":
+            self.generation += event["text"]
+            head, marker, answer = self.generation.partition(FINAL_ANSWER_MARKER)
+            if marker and self.answer is not None:
+                self.answer.markdown(f"**🤖 AI:** {answer.strip()}")
+            else:
+                self.thinking.text(head.strip()[-2000:])
+
+        elif event["type"] == "action":
+            self.status.update(label=f"{self.label} — running {event['tool']}")
+            self.status.markdown(f"🔧 **{event['tool']}**")
+            self.status.code(str(event["tool_input"]))
+            self.thinking = self.status.empty()
+
+        elif event["type"] == "observation":
+            self.status.text(event["text"][:2000])
+
+        elif event["type"] == "error":
+            self.status.update(label=f"{self.label} — tool error", state="error")
+
+        elif event["type"] == "final":
+            self.thinking.empty()
+            self.status.update(label=self.label, state="complete")
+
+        elif event["type"] == "cached":
+            self.thinking.empty()
+            if self.answer is not None:
+                self.answer.markdown(f"**🤖 AI:** {event['text'].strip()}")
+            self.status.update(label=f"{self.label} — cached", state="complete")
@@ -1,24 +1,38 @@
-import io
-import contextlib
-from config import CSV_FILE_PATH
+from agents.callbacks import AgentEventHandler, TracingCallbackHandler
+from tracing import traced, current_span
+from kernel import session_snapshot_id
+from snapshot_store import get_snapshot_store
+from answer_cache import get_answer_cache
+from config import ANSWER_CACHE_ENABLED
 from langchain.schema import SystemMessage, HumanMessage
-from langchain.agents import initialize_agent, AgentType
 
-# Generates a follow-up response by analyzing chat history and system error logs stored in a CSV file
-def provide_followup(user_input, llm, tools, chat_history):
+# Generates a follow-up response by analyzing compacted chat history and system error logs stored in the current data snapshot
+@traced("agent.followup", "agent")
+def provide_followup(user_input, agent, history_context, on_event=None):
+
+    # The same question asked before on identical data skips the agent entirely
+    snapshot_id = session_snapshot_id()
+    content_hash = get_snapshot_store().content_hash(snapshot_id) if ANSWER_CACHE_ENABLED and snapshot_id else None
+    cached_answer = get_answer_cache().answer(content_hash, user_input) if content_hash else None
+    current_span().set(cached=bool(cached_answer))
+    if cached_answer:
+        AgentEventHandler(on_event).on_cache_hit(cached_answer)
+        return ({"output": cached_answer}, "Served from the answer cache; no LLM calls were made.")
     
     system_prompt = f"""
-                        You are an advanced analytical agent responsible for analyzing system error logs stored in a CSV file located at: {CSV_FILE_PATH} and answering user questions.
-                        You have access to a tool called 'python_executor_tool', which allows you to dynamically execute Python code on the CSV. You MUST use this tool to retrieve any data or perform any calculations. Do NOT make up numbers or summaries — use the tool to get real data.
+                        You are an advanced analytical agent responsible for analyzing system error logs stored in a typed columnar data snapshot and answering user questions.
+                        You have access to a tool called 'python_executor_tool', which allows you to dynamically execute Python code on the dataset. You MUST use this tool to retrieve any data or perform any calculations. Do NOT make up numbers or summaries — use the tool to get real data.
                         Additionally, you can access the current date and time using the 'time_access_tool'. This tool will return the current date and time in a readable format whenever it is needed.
 
-                        You have access to the previous chat history.
-                        {chat_history}
+                        You have access to the previous chat history, compacted: recent turns verbatim, older turns summarised, and facts computed earlier.
+                        {history_context}
                         Use chat history **only if** the current user query can be answered directly using that context.  
-                        If not, you MUST use the 'python_executor_tool' to perform analysis and retrieve information from the CSV file.
+                        If not, you MUST use the 'python_executor_tool' to perform analysis and retrieve information from the dataset.
 
                         For Python code execution:
-                        - Always read the CSV from the path: '{CSV_FILE_PATH}'
+                        - The data is already loaded as the pandas DataFrame `df` (typed; 'problem_time' is already a datetime). Do NOT read any CSV file
+                        - Variables you define persist between tool calls, so reuse earlier results instead of recomputing them
+                        - Do not modify `df` in place; assign filtered or derived frames to new variables
                         - Use pandas to manipulate data
                         - Do not use any plotting libraries
 
@@ -47,24 +61,23 @@ def provide_followup(user_input, llm, tools, chat_history):
                         Final Answer: <Full, plain-text summary with mitigation strategies and recommendations>  
 
                         ⚠️ You must explicitly include the line **Final Answer:** before concluding your response, or the system will break.
-                        Format your response as **plain text only** — do not use markdown, JSON, or code blocks. The output should be a comprehensive, human-readable analysis based solely on the CSV file.
+                        Format your response as **plain text only** — do not use markdown, JSON, or code blocks. The output should be a comprehensive, human-readable analysis based solely on the dataset.
                     """
     
-    agent = initialize_agent(
-        tools=tools,
-        llm=llm,
-        agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
-        verbose=True,
+    # Structured events replace the ANSI stdout log; on_event streams them to the caller as they happen
+    handler = AgentEventHandler(on_event)
+    response = agent.invoke(
+        [
+            SystemMessage(content=system_prompt),
+            HumanMessage(content=user_input)
+        ],
+        config={"callbacks": [handler, TracingCallbackHandler()]},
+        handle_parsing_errors=True
     )
+    thoughts = handler.transcript()
 
-    with io.StringIO() as buf, contextlib.redirect_stdout(buf):
-        response = agent.invoke(
-            [
-                SystemMessage(content=system_prompt),
-                HumanMessage(content=user_input)
-            ],
-            handle_parsing_errors=True
-        )
-        thoughts = buf.getvalue()
+    # Only answers the agent finished are reused, not iteration-limit or parsing-error fallbacks
+    if content_hash and any(event["type"] == "final" for event in handler.events):
+        get_answer_cache().store_answer(content_hash, user_input, response.get("output"))
         
     return (response, thoughts)
\ No newline at end of file
@@ -1,14 +1,23 @@
-import io
-import contextlib
+from agents.callbacks import AgentEventHandler, TracingCallbackHandler
+from tracing import traced, current_span
+from sql_cache import get_sql_cache
 from langchain.schema import SystemMessage, HumanMessage
-from langchain.agents import initialize_agent, AgentType
 
-# Generates a ClickHouse SQL query based on user input using an AI agent
-def generate_sql_query(user_input, llm, tools):
+# Generates a ClickHouse SQL query based on user input using a prebuilt AI agent
+@traced("agent.query", "agent")
+def generate_sql_query(user_input, agent, on_event=None):
+
+    # Equivalent requests answered before skip the agent entirely
+    cached_query = get_sql_cache().lookup(user_input)
+    current_span().set(cached=bool(cached_query))
+    if cached_query:
+        AgentEventHandler(on_event).on_cache_hit(cached_query)
+        return ({"output": cached_query}, "Served from the query cache; no LLM calls were made.")
     
     system_prompt = f"""
                         You are an advanced analytical agent responsible for generating queries from a ClickHouse database based on user-inputs.
                         You can query the database using the 'clickhouse_query_tool' to validate whether the SQL query you've written is correct and whether the expected data exists.
+                        The tool checks the query without fetching it: it returns the output columns, the number of matching rows and a few sample rows.
                         Additionally, you can access the current date and time using the 'time_access_tool'. This tool will return the current date and time in a readable format whenever it is needed.
 
                         Database Table: 'zabbix_problems'
@@ -41,21 +50,17 @@ def generate_sql_query(user_input, llm, tools):
                         Final Answer must ONLY contain the validated ClickHouse SQL query. Do not wrap it in backticks or markdown formatting. Do not explain it.
                     """
     
-    agent = initialize_agent(
-        tools=tools,
-        llm=llm,
-        agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
-        verbose=True
+    # Structured events replace the ANSI stdout log; on_event streams them to the caller as they happen
+    handler = AgentEventHandler(on_event)
+    response = agent.invoke(
+        [
+            SystemMessage(content=system_prompt),
+            HumanMessage(content=user_input)
+        ],
+        config={"callbacks": [handler, TracingCallbackHandler()]},
+        handle_parsing_errors=True
     )
-    
-    with io.StringIO() as buf, contextlib.redirect_stdout(buf):
-        response = agent.invoke(
-            [
-                SystemMessage(content=system_prompt),
-                HumanMessage(content=user_input)
-            ],
-            handle_parsing_errors=True
-        )
-        thoughts = buf.getvalue()
-        
+    thoughts = handler.transcript()
+
+    get_sql_cache().store(user_input, response["output"])
     return (response, thoughts)
\ No newline at end of file
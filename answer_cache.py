@@ -0,0 +1,186 @@
+import re
+import ast
+import time
+import hashlib
+import builtins
+import threading
+from collections import OrderedDict
+from sql_cache import normalize_request, RELATIVE_TIME
+from config import ANSWER_CACHE_MAX_ANSWERS, ANSWER_CACHE_MAX_OUTPUTS, ANSWER_CACHE_RELATIVE_TTL
+
+# Questions that lean on the conversation ("what about that host?") have no answer of their own to reuse
+CONTEXT_REFERENCE = re.compile(r"\b(it|its|that|those|these|them|they|above|previous|earlier|same|else)\b", re.IGNORECASE)
+
+# Snippets whose output changes from run to run
+NONDETERMINISTIC = re.compile(r"\b(now|today|utcnow|random|sample|uuid|time\.time|perf_counter)\b")
+
+# Methods that change their receiver in place (list, dict, set and DataFrame/Series mutators), and builtins that
+# change their argument; calls to them, or with inplace=True, change state later snippets may see
+MUTATING_METHODS = {
+    "append", "extend", "insert", "remove", "pop", "popitem", "clear", "update", "setdefault",
+    "add", "discard", "sort", "reverse", "__setitem__", "__delitem__"
+}
+MUTATING_BUILTINS = {"setattr", "delattr"}
+
+def _mutating_call(node):
+    if any(keyword.arg == "inplace" and not (isinstance(keyword.value, ast.Constant) and not keyword.value.value) for keyword in node.keywords):
+        return True
+    if isinstance(node.func, ast.Attribute):
+        return node.func.attr in MUTATING_METHODS
+    return isinstance(node.func, ast.Name) and node.func.id in MUTATING_BUILTINS
+
+# Names every kernel starts with, and names that read the namespace behind the parser's back
+KERNEL_NAMES = {"df", "pd", "load_data"}
+DYNAMIC_NAMES = {"globals", "locals", "vars", "eval", "exec", "__import__"}
+
+# Source position a statement's bindings take effect at: assignment targets bind after their value is read
+def _binding_position(node):
+    if isinstance(node, (ast.Assign, ast.AnnAssign, ast.AugAssign)):
+        return (node.end_lineno, node.end_col_offset)
+    return (node.lineno, node.col_offset)
+
+# What a snippet reads from and binds in the kernel namespace; a self-contained snippet reads nothing but the
+# preloaded data and names it bound earlier itself, so its output is a function of the snapshot and the code alone.
+# That only holds while the preloaded names are untouched, so rebinding, deleting or mutating them is a mutation
+class Snippet:
+
+    def __init__(self, code, tree):
+        loads, stores, scoped, mutates = {}, {}, set(), False
+        positions = {}
+
+        def record(names, name, position):
+            names[name] = min(position, names.get(name, position))
+
+        for node in ast.walk(tree):
+            if isinstance(node, (ast.Assign, ast.AnnAssign, ast.AugAssign)):
+                for target in (node.targets if isinstance(node, ast.Assign) else [node.target]):
+                    for name in ast.walk(target):
+                        positions[id(name)] = _binding_position(node)
+                if isinstance(node, ast.AugAssign) and isinstance(node.target, ast.Name):
+                    record(loads, node.target.id, (node.lineno, node.col_offset))
+            elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                for alias in node.names:
+                    # `import pandas as pd` rebinds pd to the module it already holds
+                    if isinstance(node, ast.Import) and (alias.name, alias.asname) == ("pandas", "pd"):
+                        continue
+                    record(stores, (alias.asname or alias.name).split(".")[0], (node.lineno, node.col_offset))
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                record(stores, node.name, (node.lineno, node.col_offset))
+            elif isinstance(node, ast.ExceptHandler) and node.name:
+                record(stores, node.name, (node.lineno, node.col_offset))
+            elif isinstance(node, ast.comprehension):
+                scoped.update(name.id for name in ast.walk(node.target) if isinstance(name, ast.Name))
+            elif isinstance(node, ast.arg):
+                scoped.add(node.arg)
+            elif isinstance(node, ast.Name):
+                if isinstance(node.ctx, (ast.Store, ast.Del)):
+                    record(stores, node.id, positions.get(id(node), (node.lineno, node.col_offset)))
+                else:
+                    record(loads, node.id, (node.lineno, node.col_offset))
+            elif isinstance(node, (ast.Attribute, ast.Subscript)) and not isinstance(node.ctx, ast.Load):
+                mutates = True
+            elif isinstance(node, (ast.Global, ast.Nonlocal)):
+                mutates = True
+            elif isinstance(node, ast.Call) and _mutating_call(node):
+                mutates = True
+
+        self.bound = set(stores) - scoped
+        self.mutates = mutates or bool(self.bound & KERNEL_NAMES)
+        self.dynamic = bool(set(loads) & DYNAMIC_NAMES)
+        self.free = {name for name, position in loads.items() if name not in scoped and not stores.get(name, position) < position}
+        self.free -= set(dir(builtins)) | KERNEL_NAMES
+        self.self_contained = not (self.free or self.dynamic or self.mutates or NONDETERMINISTIC.search(code))
+
+# Parsed snippet, or None when it doesn't parse (it will fail in the kernel anyway)
+def analyse_snippet(code):
+    try:
+        return Snippet(code, ast.parse(code))
+    except SyntaxError:
+        return None
+
+def code_key(code):
+    return hashlib.sha1(code.strip().encode()).hexdigest()
+
+# Two-level follow-up cache per snapshot content hash: normalised question -> final answer, and
+# self-contained snippet -> executor output; a new snapshot hashes differently, so both levels miss
+# on new data without explicit invalidation, and old entries age out least recently used first
+class AnswerCache:
+
+    def __init__(self, max_answers=ANSWER_CACHE_MAX_ANSWERS, max_outputs=ANSWER_CACHE_MAX_OUTPUTS, relative_ttl=ANSWER_CACHE_RELATIVE_TTL):
+        self.max_answers = max_answers
+        self.max_outputs = max_outputs
+        self.relative_ttl = relative_ttl
+        self.lock = threading.Lock()
+        self.answers = OrderedDict()
+        self.outputs = OrderedDict()
+        self.hits = {"answers": 0, "outputs": 0}
+        self.misses = {"answers": 0, "outputs": 0}
+
+    def _get(self, level, key):
+        entries = getattr(self, level)
+
+        with self.lock:
+            entry = entries.get(key)
+            if entry is None or (entry["expires"] is not None and time.time() > entry["expires"]):
+                if entry is not None:
+                    del entries[key]
+                self.misses[level] += 1
+                return None
+
+            entries.move_to_end(key)
+            self.hits[level] += 1
+            return entry["value"]
+
+    def _put(self, level, key, value, limit, ttl=None):
+        entries = getattr(self, level)
+
+        with self.lock:
+            entries[key] = {"value": value, "expires": time.time() + ttl if ttl else None}
+            entries.move_to_end(key)
+            while len(entries) > limit:
+                entries.popitem(last=False)
+
+    # Questions phrased relative to "now" are kept briefly
+    def _question_ttl(self, question):
+        return self.relative_ttl if RELATIVE_TIME.search(question) else None
+
+    # Final answer given earlier to an equivalent question on identical data; questions about earlier turns never hit
+    def answer(self, content_hash, question):
+        if CONTEXT_REFERENCE.search(question):
+            return None
+        return self._get("answers", (content_hash, normalize_request(question)))
+
+    def store_answer(self, content_hash, question, answer):
+        if CONTEXT_REFERENCE.search(question) or not answer:
+            return
+        self._put("answers", (content_hash, normalize_request(question)), answer, self.max_answers, self._question_ttl(question))
+
+    def output(self, content_hash, code):
+        return self._get("outputs", (content_hash, code_key(code)))
+
+    def store_output(self, content_hash, code, output):
+        self._put("outputs", (content_hash, code_key(code)), output, self.max_outputs)
+
+    def hit_rate(self, level):
+        total = self.hits[level] + self.misses[level]
+        return self.hits[level] / total if total else 0.0
+
+    def stats(self):
+        return {
+            "answers": len(self.answers),
+            "outputs": len(self.outputs),
+            "answer_hit_rate": self.hit_rate("answers"),
+            "output_hit_rate": self.hit_rate("outputs")
+        }
+
+_cache = None
+_cache_lock = threading.Lock()
+
+# Answer cache shared by every session in this process
+def get_answer_cache():
+    global _cache
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = AnswerCache()
+        return _cache
@@ -0,0 +1,264 @@
+import re
+import time
+import threading
+import contextlib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# Raised for SQL outside the subset the stand-in understands
+class UnsupportedQuery(ValueError):
+    pass
+
+# Query result with the attributes the app reads from clickhouse_connect's QueryResult
+class QueryResult:
+
+    def __init__(self, df, read_rows):
+        self.column_names = list(df.columns)
+        self.result_rows = list(df.itertuples(index=False, name=None))
+        self.summary = {"read_rows": str(read_rows)}
+
+COMPARISON = re.compile(r"^(?:lower\((\w+)\)|(\w+))\s*(=|==|!=|<>|>=|<=|>|<)\s*(.+)$", re.IGNORECASE | re.DOTALL)
+LIKE = re.compile(r"^(?:lower\((\w+)\)|(\w+))\s+(not\s+)?(i?like)\s+'(.*)'$", re.IGNORECASE | re.DOTALL)
+MEMBERSHIP = re.compile(r"^(?:lower\((\w+)\)|(\w+))\s+(not\s+)?in\s+\((.*)\)$", re.IGNORECASE | re.DOTALL)
+PARAMETER = re.compile(r"^\{(\w+):[^}]+\}$")
+RELATIVE_TIME = re.compile(r"^now\(\)(?:\s*([+-])\s*interval\s+(\d+)\s+(second|minute|hour|day|week)s?)?$", re.IGNORECASE)
+AGGREGATE = re.compile(r"^(count|max|min)\((\w*)\)$", re.IGNORECASE)
+CLICKHOUSE_TYPES = {"category": "String", "object": "String", "int32": "Int32", "int64": "Int64", "float64": "Float64", "datetime64[ns]": "DateTime64(6)"}
+
+# Position of a keyword outside quotes and parentheses, or -1
+def _top_level(sql, keyword, start=0):
+    depth, quoted = 0, False
+    pattern = re.compile(rf"\b{keyword}\b" if keyword.isalnum() else re.escape(keyword), re.IGNORECASE)
+
+    for i in range(start, len(sql)):
+        char = sql[i]
+        if char == "'" and (i == 0 or sql[i - 1] != "\\"):
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and pattern.match(sql, i) and (i == 0 or not keyword.isalnum() or not sql[i - 1].isalnum()):
+            return i
+    return -1
+
+# Text inside the parenthesis opening at `start`, and the position after its closing one
+def _parenthesized(sql, start):
+    depth, quoted = 0, False
+    for i in range(start, len(sql)):
+        if sql[i] == "'":
+            quoted = not quoted
+        elif not quoted and sql[i] == "(":
+            depth += 1
+        elif not quoted and sql[i] == ")":
+            depth -= 1
+            if depth == 0:
+                return sql[start + 1:i], i + 1
+    raise UnsupportedQuery("Unbalanced parentheses")
+
+def _split_top_level(sql, keyword):
+    parts = []
+    while True:
+        position = _top_level(sql, keyword)
+        if position < 0:
+            return parts + [sql.strip()]
+        parts.append(sql[:position].strip())
+        sql = sql[position + len(keyword):]
+
+# Boolean mask from a per-value test; categorical columns are tested once per category
+def _test(series, test, lower=False):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = pd.Series(series.cat.categories.astype(str))
+        hits = test(categories.str.lower() if lower else categories)
+        return np.append(np.asarray(hits, dtype=bool), False)[series.cat.codes.to_numpy()]
+
+    if lower:
+        series = series.astype(str).str.lower()
+    return np.asarray(test(series), dtype=bool)
+
+# File-backed stand-in for a clickhouse_connect client: the zabbix_problems table is an Arrow file
+# evaluated with pandas, for the SELECT subset the app and its agents generate
+class FileBackedClickHouse:
+    _tables = {}
+    _tables_lock = threading.Lock()
+
+    def __init__(self, path, now=None, latency=0.0, table_name="zabbix_problems"):
+        self.table_name = table_name
+        self.latency = latency
+        self.table = self._load(path)
+        self.now = pd.Timestamp(now) if now is not None else pd.Timestamp.now()
+        self.queries = 0
+
+    # One shared frame per file, however many clients the pool opens
+    @classmethod
+    def _load(cls, path):
+        with cls._tables_lock:
+            if path not in cls._tables:
+                with pa.memory_map(path, "r") as source:
+                    cls._tables[path] = pa.ipc.open_file(source).read_all().to_pandas()
+            return cls._tables[path]
+
+    def _value(self, text, parameters, series=None):
+        text = text.strip()
+        parameter = PARAMETER.match(text)
+        relative = RELATIVE_TIME.match(text)
+
+        if parameter:
+            value = parameters[parameter.group(1)]
+        elif relative:
+            value = self.now
+            if relative.group(1):
+                delta = pd.Timedelta(**{f"{relative.group(3).lower()}s": int(relative.group(2))})
+                value = value + delta if relative.group(1) == "+" else value - delta
+        elif text.lower() == "today()":
+            value = self.now.normalize()
+        elif text.startswith("'") and text.endswith("'"):
+            value = text[1:-1].replace("\\'", "'")
+        else:
+            try:
+                value = float(text)
+            except ValueError:
+                raise UnsupportedQuery(f"Unsupported value: {text}")
+
+        if series is not None and pd.api.types.is_datetime64_any_dtype(series):
+            value = pd.Timestamp(value)
+        return value
+
+    def _predicate(self, frame, text, parameters):
+        text = text.strip()
+        while text.startswith("(") and _parenthesized(text, 0)[1] == len(text):
+            text = _parenthesized(text, 0)[0].strip()
+        if _top_level(text, "or") >= 0:
+            raise UnsupportedQuery("OR conditions are not supported")
+
+        match = LIKE.match(text)
+        if match:
+            lowered, column, negated, operator, pattern = match.groups()
+            regex = "^" + re.escape(pattern).replace("%", ".*").replace("_", ".") + "$"
+            case = operator.lower() == "like"
+            mask = _test(frame[lowered or column], lambda v: v.str.match(regex, case=case), lower=bool(lowered))
+            return ~mask if negated else mask
+
+        match = MEMBERSHIP.match(text)
+        if match:
+            lowered, column, negated, inner = match.groups()
+            if re.match(r"^\s*select\b", inner, re.IGNORECASE):
+                values = set(self.execute(inner, parameters).iloc[:, 0])
+            else:
+                values = {self._value(item, parameters) for item in _split_top_level(inner, ",")} if "," in inner else {self._value(inner, parameters)}
+            mask = _test(frame[lowered or column], lambda v: v.isin(values), lower=bool(lowered))
+            return ~mask if negated else mask
+
+        match = COMPARISON.match(text)
+        if match:
+            lowered, column, operator, value = match.groups()
+            series = frame[lowered or column]
+            value = self._value(value, parameters, series)
+            compare = {"=": "__eq__", "==": "__eq__", "!=": "__ne__", "<>": "__ne__", ">=": "__ge__", "<=": "__le__", ">": "__gt__", "<": "__lt__"}[operator]
+            return _test(series, lambda v: getattr(v, compare)(value), lower=bool(lowered))
+
+        raise UnsupportedQuery(f"Unsupported condition: {text}")
+
+    # Evaluate a SELECT over the table (or a subquery) and return the result frame
+    def execute(self, sql, parameters=None):
+        sql = sql.strip().rstrip(";").strip()
+        parameters = parameters or {}
+
+        if re.match(r"^describe\b", sql, re.IGNORECASE):
+            inner = sql[len("describe"):].strip()
+            frame = self.execute(_parenthesized(inner, 0)[0] if inner.startswith("(") else inner, parameters)
+            return pd.DataFrame({"name": frame.columns, "type": [CLICKHOUSE_TYPES.get(str(t), "String") for t in frame.dtypes]})
+
+        if not re.match(r"^select\b", sql, re.IGNORECASE):
+            raise UnsupportedQuery("Only SELECT statements are supported")
+
+        source_at = _top_level(sql, "from")
+        if source_at < 0:
+            raise UnsupportedQuery("SELECT without FROM")
+        select = sql[len("select"):source_at].strip()
+        rest = sql[source_at + len("from"):].strip()
+
+        if rest.startswith("("):
+            inner, end = _parenthesized(rest, 0)
+            frame, rest = self.execute(inner, parameters), rest[end:]
+        else:
+            name, _, rest = rest.partition(" ")
+            if name.split(".")[-1] != self.table_name:
+                raise UnsupportedQuery(f"Unknown table: {name}")
+            frame = self.table
+
+        read_rows = len(frame)
+        limit = _top_level(rest, "limit")
+        limit, rest = (int(rest[limit + len("limit"):].strip().split()[0]), rest[:limit]) if limit >= 0 else (None, rest)
+        order = _top_level(rest, "order")
+        order, rest = (rest[order:].strip()[len("order"):].strip()[len("by"):].strip(), rest[:order]) if order >= 0 else (None, rest)
+
+        where = _top_level(rest, "where")
+        if where >= 0:
+            mask = np.ones(len(frame), dtype=bool)
+            for condition in _split_top_level(rest[where + len("where"):], "and"):
+                mask &= self._predicate(frame, condition, parameters)
+            frame = frame[mask]
+
+        if order:
+            columns, ascending = [], []
+            for item in _split_top_level(order, ","):
+                column, _, direction = item.partition(" ")
+                columns.append(column)
+                ascending.append(direction.strip().lower() != "desc")
+            frame = frame.sort_values(columns, ascending=ascending, kind="stable")
+
+        distinct = select.lower().startswith("distinct ")
+        select = select[len("distinct "):] if distinct else select
+        aggregate = AGGREGATE.match(select)
+
+        if aggregate:
+            function, column = aggregate.group(1).lower(), aggregate.group(2)
+            value = len(frame) if function == "count" else getattr(frame[column], function)()
+            frame = pd.DataFrame({select: [value]})
+        elif select != "*":
+            frame = frame[[column.strip() for column in select.split(",")]]
+
+        if distinct:
+            frame = frame.drop_duplicates()
+        if limit is not None:
+            frame = frame.head(limit)
+
+        # A copy, like a real client materialising the result
+        frame = frame.reset_index(drop=True).copy()
+        frame.attrs["read_rows"] = read_rows
+        return frame
+
+    def _round_trip(self):
+        self.queries += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def query_df(self, query, parameters=None, settings=None, **kwargs):
+        self._round_trip()
+        return self.execute(query, parameters)
+
+    def query(self, query, parameters=None, settings=None, **kwargs):
+        self._round_trip()
+        frame = self.execute(query, parameters)
+        return QueryResult(frame, frame.attrs.get("read_rows", len(frame)))
+
+    # Result in blocks of max_block_size rows, like clickhouse_connect's query_df_stream
+    @contextlib.contextmanager
+    def query_df_stream(self, query, parameters=None, settings=None, **kwargs):
+        self._round_trip()
+        frame = self.execute(query, parameters)
+        block_rows = int((settings or {}).get("max_block_size", 65_536))
+        yield (frame.iloc[start:start + block_rows] for start in range(0, len(frame), block_rows))
+
+    # DDL and inserts (e.g. rollup setup) are accepted and ignored
+    def command(self, command, parameters=None, settings=None, **kwargs):
+        self._round_trip()
+        return None
+
+    def ping(self):
+        return True
+
+    def close(self):
+        pass
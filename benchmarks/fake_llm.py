@@ -0,0 +1,39 @@
+import time
+from typing import Any, List, Optional, Tuple
+from langchain_core.language_models.llms import LLM
+
+# Deterministic LLM replaying scripted ReAct traces. A trace is picked by a marker found in the prompt,
+# and the step is the number of its earlier outputs already echoed back in the agent scratchpad,
+# so concurrent agents sharing one instance each follow their own script.
+class ScriptedReActLLM(LLM):
+    traces: List[Tuple[str, List[str]]]
+    latency: float = 0.0
+    stream_tokens: bool = True
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-react"
+
+    def _trace(self, prompt):
+        for marker, steps in self.traces:
+            if marker in prompt:
+                return steps
+        raise ValueError("No scripted trace matches the prompt")
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> str:
+        steps = self._trace(prompt)
+        step = 0
+        while step < len(steps) - 1 and steps[step].strip() in prompt:
+            step += 1
+
+        # Stand-in for model time, so end-to-end runs can include it or leave it out
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        output = steps[step]
+        if self.stream_tokens and run_manager is not None:
+            for token in output.split(" "):
+                run_manager.on_llm_new_token(token + " ")
+        return output
@@ -0,0 +1,93 @@
+import argparse
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# Severity mix of a typical Zabbix installation
+SEVERITIES = ["Not classified", "Information", "Warning", "Average", "High", "Disaster"]
+SEVERITY_WEIGHTS = [0.02, 0.25, 0.40, 0.20, 0.10, 0.03]
+
+# Problem templates; the parameter fills in a handful of variants per template
+PROBLEM_TEMPLATES = [
+    "High CPU utilization (over {}% for 5m)",
+    "Free disk space is less than {}% on volume /var",
+    "Memory usage is above {}%",
+    "Load average is too high (per CPU load over {} for 5m)",
+    "Ping loss is too high (over {}% in 5m)",
+    "Interface eth{}: Link down",
+    "Service nginx{} is not running",
+    "Certificate expires in less than {} days",
+    "MySQL: Replication lag is over {} seconds",
+    "Zabbix agent is not available (for {}m)"
+]
+TEMPLATE_PARAMETERS = [1, 2, 3, 5, 10, 15, 20, 30, 80, 90, 95]
+ROLES = ["web", "db", "cache", "app", "lb", "mq", "batch"]
+DATACENTERS = ["fra1", "ams2", "lon1", "nyc3"]
+
+# Host count grows with the data set: ~20 hosts for 10k rows, capped at 5000 for 10M
+def host_count(rows):
+    return int(min(max(rows // 500, 20), 5000))
+
+# Power-law weights: a few noisy hosts and problems produce most of the events
+def _zipf_weights(n, exponent=1.1, rng=None):
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    if rng is not None:
+        rng.shuffle(weights)
+    return weights / weights.sum()
+
+# Seeded zabbix_problems rows spread over `days` days ending at `end`, generated in chunks
+def generate_problems(rows, seed=42, days=30, end="2025-01-01 00:00:00", chunk_rows=1_000_000):
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp(end)
+
+    hosts = host_count(rows)
+    hostnames = pd.Index([f"srv-{DATACENTERS[i % len(DATACENTERS)]}-{ROLES[i % len(ROLES)]}-{i:04d}" for i in range(hosts)])
+    ip_addresses = pd.Index([f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}" for i in range(hosts)])
+    problems = pd.Index([template.format(p) for template in PROBLEM_TEMPLATES for p in TEMPLATE_PARAMETERS])
+
+    host_weights = _zipf_weights(hosts, rng=rng)
+    problem_weights = _zipf_weights(len(problems), rng=rng)
+    span_seconds = days * 86400
+
+    chunks = []
+    for offset in range(0, rows, chunk_rows):
+        n = min(chunk_rows, rows - offset)
+        host = rng.choice(hosts, n, p=host_weights)
+        problem_time = end - pd.to_timedelta(rng.integers(1, span_seconds, n), unit="s")
+
+        # Recent problems are more likely to still be active
+        age = (end - problem_time) / pd.Timedelta(days=1)
+        active = rng.random(n) < np.where(age < 1, 0.5, 0.08)
+        duration = np.where(active, 0, np.clip(rng.lognormal(7, 1.5, n), 30, 30 * 86400)).astype("int32")
+
+        chunks.append(pd.DataFrame({
+            "hostname": pd.Categorical.from_codes(host, categories=hostnames),
+            "ip_address": pd.Categorical.from_codes(host, categories=ip_addresses),
+            "eventid": (10_000_000 + offset + np.arange(n)).astype(str).astype(object),
+            "full_problem_description": pd.Categorical.from_codes(rng.choice(len(problems), n, p=problem_weights), categories=problems),
+            "problem_time": problem_time,
+            "status": pd.Categorical.from_codes(np.where(active, 0, 1), categories=["Active", "Resolved"]),
+            "recovery_time": (problem_time + pd.to_timedelta(duration, unit="s")).where(~active),
+            "duration": duration,
+            "severity_name": pd.Categorical.from_codes(rng.choice(len(SEVERITIES), n, p=SEVERITY_WEIGHTS), categories=SEVERITIES),
+            "insert_time": problem_time + pd.to_timedelta(rng.integers(1, 30, n), unit="s")
+        }))
+
+    return pd.concat(chunks, ignore_index=True)
+
+# Save generated rows as an Arrow IPC file (the file-backed Clickhouse stand-in reads this)
+def write_table(df, path):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic zabbix_problems table")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--out", default="zabbix_problems.arrow")
+    args = parser.parse_args()
+
+    write_table(generate_problems(args.rows, args.seed, args.days), args.out)
+    print(f"Wrote {args.rows:,} rows to {args.out}")
@@ -0,0 +1,88 @@
+import os
+import time
+import threading
+import numpy as np
+
+# Resident set size of this process in bytes (Linux only; 0 elsewhere)
+def rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+# Samples RSS in a background thread while a stage runs, keeping the peak
+class RssSampler:
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.baseline = self.peak = 0
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self.done.wait(self.interval):
+            self.peak = max(self.peak, rss_bytes())
+
+    def __enter__(self):
+        self.baseline = self.peak = rss_bytes()
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.done.set()
+        self.thread.join()
+        self.peak = max(self.peak, rss_bytes())
+
+# Time `fn` over `repeat` runs after `warmup` untimed ones; fn may return the number of items it processed
+# (rows, events, ...) so throughput is reported per item instead of per call
+def measure(name, fn, repeat=10, warmup=1, unit="ops"):
+    for _ in range(warmup):
+        fn()
+
+    latencies, items = [], 0
+    with RssSampler() as rss:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = fn()
+            latencies.append(time.perf_counter() - start)
+            items += result if isinstance(result, int) and not isinstance(result, bool) else 1
+
+    latencies = np.array(latencies) * 1000
+    return {
+        "stage": name,
+        "runs": repeat,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "mean_ms": float(latencies.mean()),
+        "throughput": items / (latencies.sum() / 1000) if latencies.sum() else float("inf"),
+        "unit": unit,
+        "peak_rss_mb": rss.peak / 2**20,
+        "rss_delta_mb": (rss.peak - rss.baseline) / 2**20
+    }
+
+# Results as an aligned text table
+def format_results(results):
+    header = f"{'stage':<34} {'runs':>5} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'throughput':>20} {'peak RSS MB':>12} {'ΔRSS MB':>9}"
+    lines = [header, "-" * len(header)]
+    for r in results:
+        throughput = f"{r['throughput']:,.1f} {r['unit']}/s"
+        lines.append(f"{r['stage']:<34} {r['runs']:>5} {r['p50_ms']:>10.2f} {r['p95_ms']:>10.2f} {r['p99_ms']:>10.2f} "
+                     f"{throughput:>20} {r['peak_rss_mb']:>12.1f} {r['rss_delta_mb']:>9.1f}")
+    return "\n".join(lines)
+
+# Stages whose median latency or peak RSS grew by more than `tolerance` against a baseline run
+def find_regressions(results, baseline, tolerance=0.2):
+    previous = {r["stage"]: r for r in baseline}
+    regressions = []
+
+    for r in results:
+        before = previous.get(r["stage"])
+        if before is None:
+            continue
+        for metric in ("p50_ms", "peak_rss_mb"):
+            if before[metric] and r[metric] > before[metric] * (1 + tolerance):
+                regressions.append(f"{r['stage']}: {metric} {before[metric]:.2f} -> {r[metric]:.2f} (+{r[metric] / before[metric] - 1:.0%})")
+
+    return regressions
@@ -0,0 +1,109 @@
+import os
+import sys
+import json
+import logging
+import warnings
+import argparse
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Secrets for the benchmark workspace; the database and model are replaced by local stand-ins
+SECRETS = """ANTHROPIC_API_KEY = "benchmark"
+DB_HOST = "localhost"
+DB_USER = "benchmark"
+DB_NAME = "benchmark"
+DB_PASSWORD = "benchmark"
+CSV_FILE_PATH = "{workdir}/data/logs.csv"
+SNAPSHOT_DIR = "{workdir}/data/snapshots"
+SQL_CACHE_PATH = "{workdir}/data/sql_cache.json"
+EXECUTOR_BACKEND = "{executor}"
+FETCH_MAX_ROWS = 0
+"""
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the app's hot paths on synthetic zabbix_problems data")
+    parser.add_argument("--rows", type=int, default=100_000, help="Generated rows (10k to 10M)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--days", type=int, default=30, help="Days of history the rows are spread over")
+    parser.add_argument("--repeat", type=int, default=10, help="Timed runs per stage")
+    parser.add_argument("--stages", default="fetch,snapshot,dashboard,executor,agent", help="Comma-separated stage groups or stage name prefixes")
+    parser.add_argument("--db-latency", type=float, default=0.0, help="Seconds added to each stand-in database round trip")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds added to each scripted LLM call")
+    parser.add_argument("--executor", choices=["inprocess", "pool"], default="inprocess")
+    parser.add_argument("--workdir", help="Workspace for the table, snapshots and secrets (a temporary directory by default)")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--baseline", help="Results JSON of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown against the baseline (0.2 = 20%%)")
+    return parser.parse_args(argv)
+
+# Generate the table and secrets, then switch into the workspace so the app's config picks them up
+def prepare_workspace(args):
+    from benchmarks.generate import generate_problems, write_table
+
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="zabbix-bench-"))
+    os.makedirs(os.path.join(workdir, ".streamlit"), exist_ok=True)
+    os.makedirs(os.path.join(workdir, "data", "snapshots"), exist_ok=True)
+
+    with open(os.path.join(workdir, ".streamlit", "secrets.toml"), "w") as f:
+        f.write(SECRETS.format(workdir=workdir, executor=args.executor))
+
+    df = generate_problems(args.rows, args.seed, args.days)
+    table_path = os.path.join(workdir, "data", "zabbix_problems.arrow")
+    write_table(df, table_path)
+    end = df["problem_time"].max().ceil("D")
+
+    os.chdir(workdir)
+    return table_path, end
+
+def main(argv=None):
+    args = parse_args(argv)
+    sys.path.insert(0, REPO_ROOT)
+
+    from benchmarks.harness import measure, format_results, find_regressions
+    table_path, end = prepare_workspace(args)
+    print(f"Generated {args.rows:,} rows in {os.getcwd()}")
+
+    # Streamlit warns about the missing script run context on every st.* call outside `streamlit run`
+    for name in ("streamlit", "streamlit.runtime"):
+        logging.getLogger(name).setLevel(logging.ERROR)
+    warnings.simplefilter("ignore", DeprecationWarning)
+
+    from benchmarks.stages import Workload
+    workload = Workload(table_path, end, args.db_latency, args.llm_latency)
+    groups = workload.stages()
+    selected = [s.strip() for s in args.stages.split(",") if s.strip()]
+
+    results = []
+    for group, build in groups.items():
+        if not any(group.startswith(s) or s.startswith(group) for s in selected):
+            continue
+
+        for stage in build():
+            if not any(stage.name.startswith(s) for s in selected):
+                continue
+            if stage.setup:
+                stage.setup()
+
+            results.append(measure(stage.name, stage.fn, repeat=args.repeat, unit=stage.unit))
+            print(format_results(results[-1:]).splitlines()[-1], flush=True)
+
+    print()
+    print(format_results(results))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"rows": args.rows, "seed": args.seed, "results": results}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(results, json.load(f)["results"], args.tolerance)
+        if regressions:
+            print("\nRegressions against the baseline:\n" + "\n".join(regressions))
+            return 1
+        print("\nNo regressions against the baseline.")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+import os
+import functools
+from dataclasses import dataclass
+from typing import Callable, Optional
+from db import configure_pool
+from registry import TOOLSETS, build_agent
+from utils import fetch_csv_from_db, fetch_to_snapshot
+from snapshots import write_snapshot, load_snapshot, publish_snapshot, snapshot_path
+from stats import compute_error_stats, format_error_stats
+from kernel import kernel_session, run_code, reset_kernel
+from answer_cache import get_answer_cache
+from agents.query_generator import generate_sql_query
+from agents.followup_generator import provide_followup
+from agents.analysis_generator import generate_report, REPORT_SECTIONS
+import dashboard
+from benchmarks.fake_clickhouse import FileBackedClickHouse
+from benchmarks.fake_llm import ScriptedReActLLM
+
+# Queries the fetch stages run: everything, a typical time/severity slice and a lowercase text filter
+BENCH_QUERIES = {
+    "full": "SELECT * FROM zabbix_problems",
+    "recent_high": "SELECT * FROM zabbix_problems WHERE lower(severity_name) IN ('high', 'disaster') AND problem_time >= now() - INTERVAL 7 DAY",
+    "db_active": "SELECT * FROM zabbix_problems WHERE lower(hostname) LIKE '%-db-%' AND lower(status) = 'active'"
+}
+
+# Snippets in the style the analysis agents write
+SNIPPETS = {
+    "value_counts": "print(df['severity_name'].value_counts())",
+    "top_hosts": "print(df.groupby('hostname', observed=True).size().nlargest(10))",
+    "hourly": "hourly = df.set_index('problem_time').resample('h').size()\nprint(hourly.describe())",
+    "unresolved": "active = df[df['status'] == 'Active']\nprint(active.groupby('full_problem_description', observed=True)['hostname'].nunique().nlargest(5))"
+}
+
+QUERY_REQUEST = "Show high and disaster problems from the last 7 days"
+FOLLOWUP_QUESTION = "Which hosts had the most unresolved problems?"
+
+# One ReAct step calling `tool`, then the final answer
+def _trace(marker, tool, tool_input, answer):
+    return (marker, [
+        f"Thought: I need to check this with {tool}.\nAction: {tool}\nAction Input: {tool_input}",
+        f"Thought: I now know the final answer.\nFinal Answer: {answer}"
+    ])
+
+# Scripted traces for every agent the app runs: SQL generation, each report section and the follow-up
+def scripted_traces():
+    sql = BENCH_QUERIES["recent_high"]
+    traces = [_trace("responsible for generating queries", "clickhouse_query_tool", sql, sql)]
+
+    snippets = list(SNIPPETS.values())
+    for i, (_, title, _) in enumerate(REPORT_SECTIONS):
+        traces.append(_trace(f'"{title}" section', "python_executor_tool", snippets[i % len(snippets)], f"{title}: summary of the figures above."))
+
+    traces.append(_trace(FOLLOWUP_QUESTION, "python_executor_tool", SNIPPETS["unresolved"], "These hosts have the most unresolved problems."))
+    return traces
+
+# A benchmarked step; setup runs once, untimed, before the stage's warmup
+@dataclass
+class Stage:
+    name: str
+    fn: Callable
+    unit: str = "ops"
+    setup: Optional[Callable] = None
+
+# Builds the stages against a generated table; the app's pool and LLM are replaced by the local stand-ins
+class Workload:
+
+    def __init__(self, table_path, now, db_latency=0.0, llm_latency=0.0):
+        self.table_path = table_path
+        self.now = now
+        self.db_latency = db_latency
+        self.llm = ScriptedReActLLM(traces=scripted_traces(), latency=llm_latency)
+        self.full_snapshot = None
+        self.requests = 0
+
+        configure_pool(client_factory=lambda: FileBackedClickHouse(table_path, now=now, latency=db_latency))
+
+    # Make the full table the current snapshot again (fetch and write stages publish their own)
+    def use_full_snapshot(self):
+        if self.full_snapshot and os.path.exists(snapshot_path(self.full_snapshot)):
+            publish_snapshot(self.full_snapshot)
+        else:
+            self.full_snapshot, _, _ = fetch_to_snapshot(BENCH_QUERIES["full"], max_rows=0, max_bytes=0)
+        return self.full_snapshot
+
+    @functools.lru_cache(maxsize=None)
+    def agent(self, kind):
+        return build_agent(self.llm, TOOLSETS[kind]())
+
+    def frame(self):
+        return load_snapshot(self.use_full_snapshot())
+
+    # Dashboard filter selections, from no filter to a single problem type
+    def filter_combinations(self):
+        df = self.frame()
+        top_host = df["hostname"].value_counts().index[0]
+        top_problem = df["full_problem_description"].value_counts().index[0]
+        return {
+            "all": (None, None, None, None),
+            "severity": (["High", "Disaster"], None, None, None),
+            "host+status": (None, [top_host], ["Active"], None),
+            "problem": (None, None, None, [top_problem])
+        }
+
+    def fetch_stages(self):
+        stages = []
+        for name, query in BENCH_QUERIES.items():
+            stages.append(Stage(f"fetch.query_df[{name}]", lambda query=query: len(fetch_csv_from_db(query)), "rows"))
+            stages.append(Stage(f"fetch.stream[{name}]", lambda query=query: fetch_to_snapshot(query, max_rows=0, max_bytes=0)[1], "rows"))
+        return stages
+
+    def snapshot_stages(self):
+        data = {}
+
+        def setup():
+            data["df"] = self.frame()
+
+        return [
+            Stage("snapshot.write", lambda: write_snapshot(data["df"], BENCH_QUERIES["full"]) and len(data["df"]), "rows", setup),
+            Stage("snapshot.load", lambda: len(load_snapshot(self.use_full_snapshot())), "rows", self.use_full_snapshot),
+            Stage("stats.compute", lambda: len(format_error_stats(compute_error_stats(data["df"]))) and len(data["df"]), "rows", setup)
+        ]
+
+    def dashboard_stages(self):
+        def load_index():
+            dashboard._indexes.pop(self.full_snapshot, None)
+            return len(dashboard.load_index(self.full_snapshot).df)
+
+        def path():
+            return f"{dashboard.DASH_PREFIX}{self.full_snapshot}"
+
+        stages = [Stage("dashboard.load_index", load_index, "rows", self.use_full_snapshot)]
+        for name, filters in self.filter_combinations().items():
+            stages += [
+                Stage(f"dashboard.update[{name}]", lambda filters=filters: dashboard.update_dashboard(path(), *filters) and 1, setup=self.use_full_snapshot),
+                Stage(f"dashboard.table[{name}]", lambda filters=filters: dashboard.update_table(path(), *filters, 0, dashboard.TABLE_PAGE_SIZE, [], "") and 1, setup=self.use_full_snapshot),
+                Stage(f"dashboard.trend[{name}]", lambda filters=filters: dashboard.update_trend(path(), *filters, None) and 1, setup=self.use_full_snapshot)
+            ]
+
+        sort_by = [{"column_id": "hostname", "direction": "asc"}]
+        stages.append(Stage("dashboard.table[sorted+filtered]", lambda: dashboard.update_table(path(), None, None, None, None, 3, dashboard.TABLE_PAGE_SIZE, sort_by, "{status} = Active && {hostname} contains db") and 1,
+                            setup=self.use_full_snapshot))
+
+        # Opening a dashboard on the running server: readiness check plus the page's first callback
+        def open_dashboard():
+            dashboard.start_dashboard()
+            return dashboard.update_dashboard(path(), None, None, None, None) and 1
+
+        stages.append(Stage("dashboard.open", open_dashboard, setup=self.use_full_snapshot))
+        return stages
+
+    # Uncached stages clear the answer cache first, so they keep measuring the work itself
+    def executor_stages(self):
+        def run(code, cached=False):
+            if not cached:
+                get_answer_cache().outputs.clear()
+            with kernel_session("bench-executor", self.full_snapshot):
+                return run_code(code) and 1
+
+        stages = [Stage(f"executor.{name}", lambda code=code: run(code), setup=self.use_full_snapshot) for name, code in SNIPPETS.items()]
+        stages.append(Stage("executor.cached[hourly]", lambda: run(SNIPPETS["hourly"], cached=True), setup=self.use_full_snapshot))
+        return stages
+
+    def agent_stages(self):
+        def query():
+            self.requests += 1
+            generate_sql_query(f"{QUERY_REQUEST} (request {self.requests})", self.agent("query"))
+
+        def followup(cached=False):
+            if not cached:
+                get_answer_cache().answers.clear()
+                get_answer_cache().outputs.clear()
+            with kernel_session("bench-followup", self.full_snapshot):
+                provide_followup(FOLLOWUP_QUESTION, self.agent("followup"), "")
+            reset_kernel("bench-followup")
+
+        def report():
+            get_answer_cache().outputs.clear()
+            stats = format_error_stats(compute_error_stats(self.frame()))
+            with kernel_session("bench-report", self.full_snapshot):
+                return len(list(generate_report(self.agent("analysis"), stats)))
+
+        return [
+            Stage("agent.query", query, setup=self.use_full_snapshot),
+            Stage("agent.query_cached", lambda: generate_sql_query(QUERY_REQUEST, self.agent("query")) and 1),
+            Stage("agent.followup", followup, setup=self.use_full_snapshot),
+            Stage("agent.followup_cached", lambda: followup(cached=True), setup=self.use_full_snapshot),
+            Stage("agent.report", report, "sections", self.use_full_snapshot)
+        ]
+
+    # Every stage, grouped in pipeline order
+    def stages(self):
+        return {
+            "fetch": self.fetch_stages,
+            "snapshot": self.snapshot_stages,
+            "dashboard": self.dashboard_stages,
+            "executor": self.executor_stages,
+            "agent": self.agent_stages
+        }
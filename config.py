@@ -1,3 +1,4 @@
+import os
 import streamlit as st
 
 # API Keys for LLM
@@ -11,3 +12,90 @@ DB_PASSWORD = st.secrets["DB_PASSWORD"]
 
 # Generic Variables
 CSV_FILE_PATH = st.secrets["CSV_FILE_PATH"]
+
+# Columnar Snapshot Store
+SNAPSHOT_DIR = st.secrets.get("SNAPSHOT_DIR", os.path.join(os.path.dirname(CSV_FILE_PATH), "snapshots"))
+SNAPSHOT_KEEP = int(st.secrets.get("SNAPSHOT_KEEP", 5))
+
+# Shared Snapshot Store (loaded frames are evicted LRU above the budget; clock-relative queries are shared
+# for SNAPSHOT_RELATIVE_WINDOW seconds; sessions idle longer than SNAPSHOT_SESSION_TIMEOUT release their snapshot)
+SNAPSHOT_MEMORY_BUDGET_MB = int(st.secrets.get("SNAPSHOT_MEMORY_BUDGET_MB", 2048))
+SNAPSHOT_RELATIVE_WINDOW = int(st.secrets.get("SNAPSHOT_RELATIVE_WINDOW", 60))
+SNAPSHOT_SESSION_TIMEOUT = int(st.secrets.get("SNAPSHOT_SESSION_TIMEOUT", 3600))
+
+# Distinct values kept per dictionary-encoded column before its shared vocabulary starts over
+SHARED_VOCABULARY_MAX = int(st.secrets.get("SHARED_VOCABULARY_MAX", 1_000_000))
+
+# New-data Watcher (one probe per interval for all sessions; idle sessions are unsubscribed)
+WATCH_INTERVAL = int(st.secrets.get("WATCH_INTERVAL", 60))
+WATCH_IDLE_TIMEOUT = int(st.secrets.get("WATCH_IDLE_TIMEOUT", 300))
+
+# Streaming Fetch (result blocks are written straight to the snapshot; 0 disables a ceiling)
+FETCH_STREAMING = bool(st.secrets.get("FETCH_STREAMING", True))
+FETCH_BLOCK_ROWS = int(st.secrets.get("FETCH_BLOCK_ROWS", 65_536))
+FETCH_MAX_ROWS = int(st.secrets.get("FETCH_MAX_ROWS", 5_000_000))
+FETCH_MAX_BYTES = int(st.secrets.get("FETCH_MAX_BYTES", 1024 * 2**20))
+
+# Report Generation
+REPORT_CONCURRENCY = int(st.secrets.get("REPORT_CONCURRENCY", 6))
+
+# Follow-up Chat History
+HISTORY_TOKEN_BUDGET = int(st.secrets.get("HISTORY_TOKEN_BUDGET", 3000))
+HISTORY_RECENT_TURNS = int(st.secrets.get("HISTORY_RECENT_TURNS", 2))
+HISTORY_MAX_FACTS = int(st.secrets.get("HISTORY_MAX_FACTS", 60))
+
+# Natural-language to SQL Cache
+SQL_CACHE_PATH = st.secrets.get("SQL_CACHE_PATH", os.path.join(os.path.dirname(CSV_FILE_PATH), "sql_cache.json"))
+SQL_CACHE_TTL = float(st.secrets.get("SQL_CACHE_TTL", 7 * 24 * 3600))
+SQL_CACHE_MAX_ENTRIES = int(st.secrets.get("SQL_CACHE_MAX_ENTRIES", 512))
+
+# Follow-up Answer Cache (keyed on the snapshot's content hash: question -> answer and self-contained snippet -> output;
+# answers to questions about "today" or "the last hour" expire after ANSWER_CACHE_RELATIVE_TTL seconds)
+ANSWER_CACHE_ENABLED = bool(st.secrets.get("ANSWER_CACHE_ENABLED", True))
+ANSWER_CACHE_MAX_ANSWERS = int(st.secrets.get("ANSWER_CACHE_MAX_ANSWERS", 256))
+ANSWER_CACHE_MAX_OUTPUTS = int(st.secrets.get("ANSWER_CACHE_MAX_OUTPUTS", 1024))
+ANSWER_CACHE_RELATIVE_TTL = float(st.secrets.get("ANSWER_CACHE_RELATIVE_TTL", 300))
+
+# Analysis Kernels
+KERNEL_MAX_SESSIONS = int(st.secrets.get("KERNEL_MAX_SESSIONS", 16))
+EXECUTOR_BACKEND = st.secrets.get("EXECUTOR_BACKEND", "inprocess")
+EXECUTOR_WORKERS = int(st.secrets.get("EXECUTOR_WORKERS", os.cpu_count() or 2))
+EXECUTOR_TIMEOUT = float(st.secrets.get("EXECUTOR_TIMEOUT", 120))
+EXECUTOR_CPU_LIMIT = int(st.secrets.get("EXECUTOR_CPU_LIMIT", 60))
+EXECUTOR_MEMORY_LIMIT_MB = int(st.secrets.get("EXECUTOR_MEMORY_LIMIT_MB", 2048))
+
+# Tracing (exporter: "jsonl", "otlp" with the OpenTelemetry SDK installed, or "none"; the JSONL file rotates at
+# TRACE_MAX_BYTES keeping TRACE_BACKUPS old files; TRACE_KEEP runs for each of the last TRACE_MAX_SESSIONS sessions
+# are kept for the debug panel)
+TRACE_ENABLED = bool(st.secrets.get("TRACE_ENABLED", True))
+TRACE_EXPORTER = st.secrets.get("TRACE_EXPORTER", "jsonl")
+TRACE_PATH = st.secrets.get("TRACE_PATH", os.path.join(os.path.dirname(CSV_FILE_PATH), "traces.jsonl"))
+TRACE_MAX_BYTES = int(st.secrets.get("TRACE_MAX_BYTES", 50 * 2**20))
+TRACE_BACKUPS = int(st.secrets.get("TRACE_BACKUPS", 3))
+TRACE_OTLP_ENDPOINT = st.secrets.get("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+TRACE_SERVICE_NAME = st.secrets.get("TRACE_SERVICE_NAME", "zabbix-error-analysis")
+TRACE_KEEP = int(st.secrets.get("TRACE_KEEP", 10))
+TRACE_MAX_SESSIONS = int(st.secrets.get("TRACE_MAX_SESSIONS", 64))
+TRACE_DEBUG_PANEL = bool(st.secrets.get("TRACE_DEBUG_PANEL", True))
+
+# Dashboard Server (started once per app process; DASHBOARD_URL is the address browsers use to reach it)
+DASHBOARD_HOST = st.secrets.get("DASHBOARD_HOST", "127.0.0.1")
+DASHBOARD_PORT = int(st.secrets.get("DASHBOARD_PORT", 8050))
+DASHBOARD_URL = st.secrets.get("DASHBOARD_URL", f"http://127.0.0.1:{DASHBOARD_PORT}")
+DASHBOARD_READY_TIMEOUT = float(st.secrets.get("DASHBOARD_READY_TIMEOUT", 15))
+DASHBOARD_CACHED_SNAPSHOTS = int(st.secrets.get("DASHBOARD_CACHED_SNAPSHOTS", 8))
+
+# Connection Pool Settings
+DB_POOL_SIZE = int(st.secrets.get("DB_POOL_SIZE", 4))
+DB_POOL_WAIT = float(st.secrets.get("DB_POOL_WAIT", 30))
+DB_QUERY_TIMEOUT = int(st.secrets.get("DB_QUERY_TIMEOUT", 120))
+DB_HEALTHCHECK_INTERVAL = float(st.secrets.get("DB_HEALTHCHECK_INTERVAL", 30))
+
+# Clickhouse Rollups (run `python rollups.py` once to create them); they feed the dashboard charts only,
+# the report's figures, hourly trends included, always come from the session's snapshot
+ROLLUPS_ENABLED = bool(st.secrets.get("ROLLUPS_ENABLED", False))
+
+# Query Validation Settings
+VALIDATION_TIMEOUT = int(st.secrets.get("VALIDATION_TIMEOUT", 10))
+VALIDATION_MAX_ROWS_TO_READ = int(st.secrets.get("VALIDATION_MAX_ROWS_TO_READ", 50_000_000))
+VALIDATION_SAMPLE_ROWS = int(st.secrets.get("VALIDATION_SAMPLE_ROWS", 3))
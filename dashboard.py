@@ -1,22 +1,139 @@
+import re
 import dash
+import time
+import logging
+import threading
+import functools
+import urllib.request
 import pandas as pd
 import plotly.express as px
-from config import CSV_FILE_PATH
+from collections import OrderedDict
+from flask import jsonify, redirect
 from dash import dcc, html, dash_table
 from dash.dependencies import Input, Output
+from dash.exceptions import PreventUpdate
+from werkzeug.serving import make_server
+from dashboard_index import SnapshotIndex, CUBE_COLUMNS, parse_filter_query, combine_masks
+from snapshots import read_metadata
+from snapshot_store import get_snapshot_store
+from rollups import is_routable, trend_counts, severity_counts, duration_counts
+from stats import format_duration
+from timeseries import trend_series
+from tracing import traced
+from config import ROLLUPS_ENABLED, DASHBOARD_HOST, DASHBOARD_PORT, DASHBOARD_URL, DASHBOARD_READY_TIMEOUT, DASHBOARD_CACHED_SNAPSHOTS
 
-# Load initial data
-def load_data():
-    file_path = CSV_FILE_PATH
-    return pd.read_csv(file_path)
+logger = logging.getLogger(__name__)
+
+# Dashboards are served per snapshot at /dash/<snapshot-id> (linked with dashboard_url); /dash/ alone shows no
+# data, since the process-wide current snapshot belongs to whichever session fetched last
+DASH_PREFIX = "/dash/"
+SNAPSHOT_ID = re.compile(r"[0-9A-Za-z_-]+")
+
+# Process-level cache of prepared snapshots and their indexes (least recently viewed evicted first),
+# shared by every browser session looking at the same snapshot
+_indexes = OrderedDict()
+_building = {}
+_indexes_lock = threading.Lock()
+
+# Snapshot a dashboard page shows, from its path, or None when the path names none
+def snapshot_from_path(pathname):
+    snapshot_id = (pathname or "")[len(DASH_PREFIX):].strip("/") if (pathname or "").startswith(DASH_PREFIX) else ""
+    return snapshot_id if SNAPSHOT_ID.fullmatch(snapshot_id) else None
+
+# Derive the columns the charts need once per snapshot instead of once per callback (on the store's
+# private view of the snapshot, so other readers don't see them)
+def prepare_data(df):
+    df["problem_time"] = pd.to_datetime(df["problem_time"])
+    df["minute"] = df["problem_time"].dt.floor("min")
+
+    # Durations are stored as integer seconds; older string snapshots hold timedeltas
+    if pd.api.types.is_numeric_dtype(df["duration"]):
+        df["duration_seconds"] = df["duration"].astype("float64")
+    else:
+        df["duration_seconds"] = pd.to_timedelta(df["duration"]).dt.total_seconds()
+
+    return df
+
+# Indexed data of a snapshot, built once however many pages ask for it at the same time
+def load_index(snapshot_id):
+    with _indexes_lock:
+        if snapshot_id in _indexes:
+            _indexes.move_to_end(snapshot_id)
+            return _indexes[snapshot_id]
+        building = _building.setdefault(snapshot_id, threading.Lock())
+
+    with building:
+        with _indexes_lock:
+            if snapshot_id in _indexes:
+                return _indexes[snapshot_id]
+
+        index = SnapshotIndex(prepare_data(get_snapshot_store().frame(snapshot_id)))
+        with _indexes_lock:
+            _indexes[snapshot_id] = index
+            _building.pop(snapshot_id, None)
+            while len(_indexes) > DASHBOARD_CACHED_SNAPSHOTS:
+                _indexes.popitem(last=False)
+        return index
+
+# Index of the snapshot a page shows; pages of missing or pruned snapshots are left as they are
+def page_index(pathname):
+    snapshot_id = snapshot_from_path(pathname)
+    if snapshot_id is None:
+        raise PreventUpdate
+    try:
+        return snapshot_id, load_index(snapshot_id)
+    except FileNotFoundError:
+        raise PreventUpdate
+
+# Build a snapshot's index in the background so its dashboard opens without waiting
+def warm(snapshot_id):
+    threading.Thread(target=load_index, args=(snapshot_id,), daemon=True, name=f"dashboard-warm-{snapshot_id}").start()
+
+# Chart data read from the Clickhouse rollups, cached per snapshot and filter selection
+@functools.lru_cache(maxsize=64)
+def _rollup_charts(snapshot_id, selection):
+    query = read_metadata(snapshot_id).get("query")
+    if not query or not is_routable(query):
+        return None
+
+    filters = dict(selection)
+    return trend_counts(query, filters), severity_counts(query, filters), duration_counts(query, filters)
+
+# Rollup chart data, or None when the snapshot's query can't be answered from the rollups
+def rollup_charts(snapshot_id, filters):
+    if not ROLLUPS_ENABLED or filters.get('full_problem_description'):
+        return None
+
+    selection = tuple((column, tuple(filters[column])) for column in CUBE_COLUMNS if filters.get(column))
+    try:
+        return _rollup_charts(snapshot_id, selection)
+    except Exception as e:
+        logger.warning("Rollup query failed, using snapshot data: %s", e)
+        return None
+
+# Issues table columns and rows per page
+TABLE_COLUMNS = ["problem_time", "severity_name", "hostname", "full_problem_description", "status"]
+TABLE_PAGE_SIZE = 25
 
 # Initialize Dash app
-app = dash.Dash(__name__)
+app = dash.Dash(__name__, url_base_pathname=DASH_PREFIX)
 app.title = "Real-Time Trading Log Monitoring"
 
+# Readiness check the app polls after starting the server
+@app.server.route("/healthz")
+def healthz():
+    with _indexes_lock:
+        return jsonify(status="ok", snapshots=len(_indexes))
+
+@app.server.route("/")
+def root():
+    return redirect(DASH_PREFIX)
+
 # Layout
 app.layout = html.Div(style={'fontFamily': 'Arial, sans-serif', 'padding': '20px'}, children=[
+    dcc.Location(id='url'),
     html.H1("Trading Log Monitoring Dashboard", style={'textAlign': 'center', 'color': '#4CAF50'}),
+    html.Div(id='snapshot-notice', style={'textAlign': 'center', 'color': '#888'}),
     
     # Filters Section
     html.Div(style={'display': 'flex', 'flexWrap': 'wrap', 'justifyContent': 'space-between', 'paddingBottom': '20px'}, children=[
@@ -38,12 +155,20 @@ app.layout = html.Div(style={'fontFamily': 'Arial, sans-serif', 'padding': '20px
         ])
     ]),
     
-    # Error Table
-    html.H3("Recent Issues", style={'paddingTop': '20px'}),
+    # Error Table (paged, sorted and filtered on the server, newest first by default)
+    html.H3("Issues", style={'paddingTop': '20px'}),
     dash_table.DataTable(
         id='error-table',
-        columns=[{"name": col, "id": col} for col in ["problem_time", "severity_name", "hostname", "full_problem_description", "status"]],
-        style_table={'height': '300px', 'overflowY': 'auto'},
+        columns=[{"name": col, "id": col, "type": "datetime" if col == "problem_time" else "text"} for col in TABLE_COLUMNS],
+        page_current=0,
+        page_size=TABLE_PAGE_SIZE,
+        page_action='custom',
+        sort_action='custom',
+        sort_mode='single',
+        sort_by=[],
+        filter_action='custom',
+        filter_query='',
+        style_table={'height': '400px', 'overflowY': 'auto'},
         style_cell={'padding': '10px', 'textAlign': 'center'},
         style_header={'fontWeight': 'bold', 'backgroundColor': '#f5f5f5'},
     ),
@@ -52,8 +177,8 @@ app.layout = html.Div(style={'fontFamily': 'Arial, sans-serif', 'padding': '20px
     html.H3("Severity Breakdown", style={'paddingTop': '30px'}),
     dcc.Graph(id='severity-breakdown', config={'displayModeBar': False}),
     
-    # Issue Trend Graph
-    html.H3("Issues Over Time (Per Minute)"),
+    # Issue Trend Graph (bucket size follows the visible range)
+    html.H3("Issues Over Time"),
     dcc.Graph(id='issue-trend-graph', config={'displayModeBar': False}),
     
     # Time-to-Resolution Histogram
@@ -61,11 +186,16 @@ app.layout = html.Div(style={'fontFamily': 'Arial, sans-serif', 'padding': '20px
     dcc.Graph(id='time-resolution-histogram', config={'displayModeBar': False}),
 ])
 
+# Pages without a snapshot in their path stay empty and say how to get one
+@app.callback(Output('snapshot-notice', 'children'), Input('url', 'pathname'))
+def snapshot_notice(pathname):
+    if snapshot_from_path(pathname) is None:
+        return "No snapshot selected. Open the dashboard from the analysis app to see your data."
+    return ""
+
 # Callbacks to update data
 @app.callback(
     [
-        Output('error-table', 'data'),
-        Output('issue-trend-graph', 'figure'),
         Output('severity-breakdown', 'figure'),
         Output('time-resolution-histogram', 'figure'),
         Output('severity-filter', 'options'),
@@ -74,26 +204,29 @@ app.layout = html.Div(style={'fontFamily': 'Arial, sans-serif', 'padding': '20px
         Output('problem-filter', 'options')
     ],
     [
+        Input('url', 'pathname'),
         Input('severity-filter', 'value'),
         Input('host-filter', 'value'),
         Input('status-filter', 'value'),
         Input('problem-filter', 'value')
     ]
 )
-def update_dashboard(selected_severity, selected_host, selected_status, selected_problem):
-    df = load_data()
-    
-    if selected_severity:
-        df = df[df['severity_name'].isin(selected_severity)]
-    if selected_host:
-        df = df[df['hostname'].isin(selected_host)]
-    if selected_status:
-        df = df[df['status'].isin(selected_status)]
-    if selected_problem:
-        df = df[df['full_problem_description'].isin(selected_problem)]
-    
-    # Table Data
-    recent_issues = df.sort_values("problem_time", ascending=False).head(10).to_dict('records')
+@traced("dashboard.update_dashboard", "callback")
+def update_dashboard(pathname, selected_severity, selected_host, selected_status, selected_problem):
+    snapshot_id, index = page_index(pathname)
+    filters = {
+        'severity_name': selected_severity,
+        'hostname': selected_host,
+        'status': selected_status,
+        'full_problem_description': selected_problem
+    }
+
+    # Rows come from index intersection; charts roll up the count cube unless filtering by problem
+    mask = index.select(filters)
+    cube = index.cube_slice(filters)
+
+    # Charts over the full history come from the Clickhouse rollups when the query allows it
+    _, severity, durations = rollup_charts(snapshot_id, filters) or (None, None, None)
     
     # Severity Breakdown (Color-coded)
     severity_colors = {
@@ -104,28 +237,154 @@ def update_dashboard(selected_severity, selected_host, selected_status, selected
         'High Disaster': 'red'
     }
     
-    severity_breakdown_fig = px.pie(df, names="severity_name", title="Severity Distribution", 
+    if severity is None:
+        severity = index.severity_counts(mask, cube)
+    severity_breakdown_fig = px.pie(severity, names="severity_name", values="count", title="Severity Distribution", 
                                     color='severity_name', color_discrete_map=severity_colors)
 
-    # Issue Trend (Per Minute)
-    df["problem_time"] = pd.to_datetime(df["problem_time"])
-    df["minute"] = df["problem_time"].dt.floor('T')  # Round time to the nearest minute
-    issue_trend_fig = px.line(df.groupby('minute').size().reset_index(name='count'), x="minute", y="count", 
-                              title="Issues by Minute", markers=True)
-    
-    # Time-to-Resolution Histogram (Seconds)
-    df['duration'] = pd.to_timedelta(df['duration']).dt.total_seconds()  # Convert to seconds
-    resolution_fig = px.histogram(df, x='duration', title='Time-to-Resolution Histogram (Seconds)', nbins=20, 
-                                   color_discrete_sequence=px.colors.qualitative.Plotly)
+    # Time-to-Resolution Histogram (Seconds); the rollup keeps power-of-two duration buckets
+    if durations is not None:
+        durations = durations.assign(duration=[f"≤ {format_duration(bucket)}" if bucket else "unresolved" for bucket in durations["duration_bucket"]])
+        resolution_fig = px.bar(durations, x='duration', y='count', title='Time-to-Resolution Histogram (Seconds)',
+                                color_discrete_sequence=px.colors.qualitative.Plotly)
+    else:
+        resolution_fig = px.histogram(index.rows(mask), x='duration_seconds', title='Time-to-Resolution Histogram (Seconds)', nbins=20, 
+                                       color_discrete_sequence=px.colors.qualitative.Plotly)
     
     # Dropdown options
-    severity_options = [{'label': sev, 'value': sev} for sev in df['severity_name'].unique()]
-    host_options = [{'label': host, 'value': host} for host in df['hostname'].unique()]
-    status_options = [{'label': status, 'value': status} for status in df['status'].unique()]
-    problem_options = [{'label': prob, 'value': prob} for prob in df['full_problem_description'].unique()]
+    severity_options = [{'label': sev, 'value': sev} for sev in index.values('severity_name', mask, cube)]
+    host_options = [{'label': host, 'value': host} for host in index.values('hostname', mask, cube)]
+    status_options = [{'label': status, 'value': status} for status in index.values('status', mask, cube)]
+    problem_options = [{'label': prob, 'value': prob} for prob in index.values('full_problem_description', mask)]
     
-    return recent_issues, issue_trend_fig, severity_breakdown_fig, resolution_fig, severity_options, host_options, status_options, problem_options
+    return severity_breakdown_fig, resolution_fig, severity_options, host_options, status_options, problem_options
+
+# One page of the issues table; rows come from the index's pre-sorted orders, so only the page is materialised
+@app.callback(
+    [
+        Output('error-table', 'data'),
+        Output('error-table', 'page_count'),
+        Output('error-table', 'page_current')
+    ],
+    [
+        Input('url', 'pathname'),
+        Input('severity-filter', 'value'),
+        Input('host-filter', 'value'),
+        Input('status-filter', 'value'),
+        Input('problem-filter', 'value'),
+        Input('error-table', 'page_current'),
+        Input('error-table', 'page_size'),
+        Input('error-table', 'sort_by'),
+        Input('error-table', 'filter_query')
+    ]
+)
+@traced("dashboard.update_table", "callback")
+def update_table(pathname, selected_severity, selected_host, selected_status, selected_problem, page_current, page_size, sort_by, filter_query):
+    snapshot_id, index = page_index(pathname)
+    filters = {
+        'severity_name': selected_severity,
+        'hostname': selected_host,
+        'status': selected_status,
+        'full_problem_description': selected_problem
+    }
+
+    mask = combine_masks(index.select(filters), index.filter_mask(parse_filter_query(filter_query)))
+    page_count = max(-(-index.count(mask) // page_size), 1)
+    page_current = min(page_current or 0, page_count - 1)
+
+    if sort_by:
+        order = index.order(sort_by[0]['column_id'], ascending=sort_by[0]['direction'] == 'asc')
+    else:
+        order = index.time_order
+
+    rows = index.page(order, mask, page_current * page_size, page_size)
+    return rows[TABLE_COLUMNS].to_dict('records'), page_count, page_current
+
+# Visible x-range from a zoom/pan, or (None, None) for the full range
+def visible_range(relayout):
+    relayout = relayout or {}
+    if relayout.get('xaxis.autorange'):
+        return None, None
+    if 'xaxis.range[0]' in relayout:
+        return pd.Timestamp(relayout['xaxis.range[0]']), pd.Timestamp(relayout['xaxis.range[1]'])
+    if 'xaxis.range' in relayout:
+        return tuple(pd.Timestamp(bound) for bound in relayout['xaxis.range'])
+    return None, None
+
+# Issue trend, re-bucketed for the visible range and downsampled to a fixed point budget
+@app.callback(
+    Output('issue-trend-graph', 'figure'),
+    [
+        Input('url', 'pathname'),
+        Input('severity-filter', 'value'),
+        Input('host-filter', 'value'),
+        Input('status-filter', 'value'),
+        Input('problem-filter', 'value'),
+        Input('issue-trend-graph', 'relayoutData')
+    ]
+)
+@traced("dashboard.update_trend", "callback")
+def update_trend(pathname, selected_severity, selected_host, selected_status, selected_problem, relayout):
+    snapshot_id, index = page_index(pathname)
+    filters = {
+        'severity_name': selected_severity,
+        'hostname': selected_host,
+        'status': selected_status,
+        'full_problem_description': selected_problem
+    }
+
+    trend, _, _ = rollup_charts(snapshot_id, filters) or (None, None, None)
+    if trend is None:
+        trend = index.trend(index.select(filters), index.cube_slice(filters))
+
+    start, end = visible_range(relayout)
+    series, bucket = trend_series(trend, start, end)
+    issue_trend_fig = px.line(series, x="minute", y="count", title=f"Issues per {bucket}", markers=len(series) <= 200)
+
+    # Keep the user's zoom when the figure is replaced
+    issue_trend_fig.update_layout(uirevision="trend")
+    if start is not None:
+        issue_trend_fig.update_xaxes(range=[start, end])
+    return issue_trend_fig
+
+_server = None
+_server_lock = threading.Lock()
+
+# Whether a dashboard server answers its readiness check at `url`
+def is_ready(url=DASHBOARD_URL):
+    try:
+        with urllib.request.urlopen(f"{url}/healthz", timeout=1) as response:
+            return response.status == 200
+    except OSError:
+        return False
+
+# Start the dashboard server once per process on a background thread and wait until it answers; if another
+# app process already serves the port, its dashboard is used (snapshots are read from the shared directory)
+def start_dashboard(host=DASHBOARD_HOST, port=DASHBOARD_PORT, url=DASHBOARD_URL, timeout=DASHBOARD_READY_TIMEOUT):
+    global _server
+
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = make_server(host, port, app.server, threaded=True)
+            except OSError:
+                if not is_ready(url):
+                    raise
+                _server = False
+            else:
+                threading.Thread(target=_server.serve_forever, daemon=True, name="dashboard-server").start()
+
+    deadline = time.monotonic() + timeout
+    while not is_ready(url):
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Dashboard server at {url} did not become ready within {timeout:.0f}s")
+        time.sleep(0.05)
+    return url
+
+# Address of a snapshot's dashboard
+def dashboard_url(snapshot_id, url=DASHBOARD_URL):
+    return f"{url}{DASH_PREFIX}{snapshot_id}"
 
 # Run app
 if __name__ == '__main__':
-    app.run_server(debug=False)
\ No newline at end of file
+    app.run(host=DASHBOARD_HOST, port=DASHBOARD_PORT, debug=False)
@@ -0,0 +1,233 @@
+import re
+import operator
+import numpy as np
+import pandas as pd
+
+# Dashboard filter columns, and the subset pre-aggregated in the count cube
+FILTER_COLUMNS = ["severity_name", "hostname", "status", "full_problem_description"]
+CUBE_COLUMNS = ["severity_name", "hostname", "status"]
+
+# One expression of the DataTable filter syntax, e.g. '{hostname} contains "db"' or '{duration} >= 60': a column
+# in braces, an operator (symbolic, or a word with an optional i/s case prefix) and a quoted or bare value
+FILTER_EXPRESSION = re.compile(
+    r"""\s*\{(?P<column>[^}]*)\}\s*"""
+    r"""(?P<operator>>=|<=|!=|<|>|=|[is]?(?:ge|le|lt|gt|ne|eq|contains|datestartswith)(?=[\s"'`]|$))\s*"""
+    r"""(?P<value>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*'|`(?:[^`\\]|\\.)*`|.*?)\s*$""",
+    re.DOTALL
+)
+SYMBOLS = {">=": "ge", "<=": "le", "<": "lt", ">": "gt", "!=": "ne", "=": "eq"}
+COMPARISONS = {"ge": operator.ge, "le": operator.le, "lt": operator.lt, "gt": operator.gt, "ne": operator.ne, "eq": operator.eq}
+
+# Split a filter query at the "&&" between expressions, leaving "&&" inside quoted values alone
+def _split_conjunction(filter_query):
+    parts, start, quote, i = [], 0, None, 0
+    while i < len(filter_query):
+        char = filter_query[i]
+        if quote:
+            if char == "\\":
+                i += 1
+            elif char == quote:
+                quote = None
+        elif char in "'\"`":
+            quote = char
+        elif filter_query.startswith("&&", i):
+            parts.append(filter_query[start:i])
+            start, i = i + 2, i + 1
+        i += 1
+    return parts + [filter_query[start:]]
+
+# Parse a DataTable filter_query into (column, operator, value) expressions. Only what the table's column
+# filters produce is understood: comparisons joined by "&&". Expressions using "||", "!", parentheses or
+# unary operators such as "is blank" are skipped, which widens the filter rather than failing it
+def parse_filter_query(filter_query):
+    expressions = []
+
+    for part in _split_conjunction(filter_query or ""):
+        match = FILTER_EXPRESSION.match(part)
+        if match is None or not match.group("value"):
+            continue
+
+        # Case prefixes are dropped: contains always ignores case, comparisons never do
+        operator_name = SYMBOLS.get(match.group("operator"), match.group("operator"))
+        if operator_name not in COMPARISONS and operator_name not in ("contains", "datestartswith"):
+            operator_name = operator_name[1:]
+
+        value = match.group("value")
+        if len(value) > 1 and value[0] == value[-1] and value[0] in "'\"`":
+            value = re.sub(r"\\(.)", r"\1", value[1:-1])
+        expressions.append((match.group("column"), operator_name, value))
+
+    return expressions
+
+# Boolean array for one filter expression over a column of values
+def _compare(values, op, value):
+    if op == "contains":
+        return values.astype(str).str.contains(value, case=False, regex=False).to_numpy()
+    if op == "datestartswith" and pd.api.types.is_datetime64_any_dtype(values):
+        # The prefix only depends on the timestamp up to a unit, so match the few distinct floored values
+        unit = "D" if len(value) <= 10 else "h" if len(value) <= 13 else "min" if len(value) <= 16 else "s"
+        floored = values.dt.floor(unit)
+        distinct = pd.Series(floored.unique())
+        return floored.isin(distinct[distinct.astype(str).str.startswith(value)]).to_numpy()
+    if op == "datestartswith":
+        return values.astype(str).str.startswith(value).to_numpy()
+
+    if pd.api.types.is_datetime64_any_dtype(values):
+        value = pd.Timestamp(value)
+    elif pd.api.types.is_numeric_dtype(values):
+        value = float(value)
+    return COMPARISONS[op](values, value).to_numpy()
+
+# Mask intersection where None means "everything"
+def combine_masks(*masks):
+    result = None
+    for mask in masks:
+        if mask is not None:
+            result = mask if result is None else result & mask
+    return result
+
+# Row ids grouped by value, from a single stable sort of the column's category codes
+def group_row_ids(column):
+    column = column.astype("category")
+    codes = column.cat.codes.to_numpy()
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(len(column.cat.categories) + 1))
+
+    row_ids = {}
+    for i, value in enumerate(column.cat.categories):
+        if bounds[i + 1] > bounds[i]:
+            row_ids[value] = order[bounds[i]:bounds[i + 1]]
+    return codes, column.cat.categories, row_ids
+
+# Per-snapshot indexes answering dashboard filters without scanning the frame
+class SnapshotIndex:
+
+    def __init__(self, df):
+        self.df = df
+        self.size = len(df)
+
+        # Row-id sets per filter value, plus category codes for distinct-value lookups
+        self.codes, self.categories, self.row_ids = {}, {}, {}
+        for col in FILTER_COLUMNS:
+            self.codes[col], self.categories[col], self.row_ids[col] = group_row_ids(df[col])
+
+        # Row orders per sort column, built on first use; rows ordered newest first by default
+        self.orders = {}
+        self.time_order = self.order("problem_time", ascending=False)
+
+        # Pre-aggregated counts by minute x severity x host x status
+        self.cube = df.groupby(["minute"] + CUBE_COLUMNS, observed=True).size().reset_index(name="count")
+
+    # Boolean row mask for the selected values (None when nothing is filtered)
+    def select(self, filters):
+        mask = None
+
+        for col, values in filters.items():
+            if not values:
+                continue
+
+            col_mask = np.zeros(self.size, dtype=bool)
+            ids = [self.row_ids[col][v] for v in values if v in self.row_ids[col]]
+            if ids:
+                col_mask[np.concatenate(ids)] = True
+            mask = col_mask if mask is None else mask & col_mask
+
+        return mask
+
+    # Cube rows matching the filters, or None when a filter is not part of the cube
+    def cube_slice(self, filters):
+        if any(values for col, values in filters.items() if col not in CUBE_COLUMNS):
+            return None
+
+        cube = self.cube
+        for col in CUBE_COLUMNS:
+            if filters.get(col):
+                cube = cube[cube[col].isin(filters[col])]
+        return cube
+
+    # Rows sorted by one column (categories alphabetically, missing values first), computed once per column
+    def order(self, col, ascending=True):
+        if col not in self.orders:
+            column = self.df[col]
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                ranks = np.argsort(np.argsort(column.cat.categories.astype(str)))
+                codes = column.cat.codes.to_numpy()
+                keys = np.append(ranks, -1)[codes]
+            else:
+                keys = column.to_numpy()
+            self.orders[col] = np.argsort(keys, kind="stable")
+
+        return self.orders[col] if ascending else self.orders[col][::-1]
+
+    # Matching rows [offset, offset + size) in the given order, walking it in growing chunks
+    def page(self, order, mask, offset=0, size=10, chunk=4096):
+        if mask is None:
+            return self.df.iloc[order[offset:offset + size]]
+
+        found, skipped, start = [], 0, 0
+        while start < self.size and len(found) < size:
+            ids = order[start:start + chunk]
+            hits = ids[mask[ids]]
+
+            # Matches before the page start are only counted
+            skip = min(offset - skipped, len(hits))
+            skipped += skip
+            found.extend(hits[skip:skip + size - len(found)])
+            start += chunk
+            chunk *= 2
+
+        return self.df.iloc[found]
+
+    # Number of matching rows
+    def count(self, mask):
+        return self.size if mask is None else int(mask.sum())
+
+    # Boolean mask for parsed table filter expressions (None when there are none); categorical columns
+    # are compared once per category and mapped back through the codes
+    def filter_mask(self, expressions):
+        mask = None
+
+        for col, op, value in expressions:
+            if col not in self.df.columns:
+                continue
+
+            column = self.df[col]
+            try:
+                if isinstance(column.dtype, pd.CategoricalDtype):
+                    hits = _compare(pd.Series(column.cat.categories.astype(str)), op, value)
+                    col_mask = np.append(hits, False)[column.cat.codes.to_numpy()]
+                else:
+                    col_mask = _compare(column, op, value)
+            except (ValueError, TypeError):
+                continue
+
+            mask = col_mask if mask is None else mask & col_mask
+
+        return mask
+
+    # Matching rows as a frame
+    def rows(self, mask):
+        return self.df if mask is None else self.df.iloc[np.flatnonzero(mask)]
+
+    # Distinct values of a column among the matching rows
+    def values(self, col, mask, cube=None):
+        if cube is not None and col in CUBE_COLUMNS:
+            return sorted(cube[col].unique())
+        if mask is None:
+            return sorted(self.row_ids[col])
+        codes = np.unique(self.codes[col][mask])
+        return sorted(self.categories[col][codes[codes >= 0]])
+
+    # Issue counts per minute for the matching rows
+    def trend(self, mask, cube=None):
+        if cube is not None:
+            return cube.groupby("minute")["count"].sum().reset_index()
+        return self.rows(mask).groupby("minute").size().reset_index(name="count")
+
+    # Issue counts per severity for the matching rows
+    def severity_counts(self, mask, cube=None):
+        if cube is not None:
+            counts = cube.groupby("severity_name", observed=True)["count"].sum()
+        else:
+            counts = self.rows(mask).groupby("severity_name", observed=True).size()
+        return counts[counts > 0].reset_index(name="count")
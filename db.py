@@ -0,0 +1,160 @@
+import time
+import queue
+import hashlib
+import threading
+import contextlib
+import clickhouse_connect
+from clickhouse_connect.driver.exceptions import OperationalError
+from tracing import span
+from config import DB_HOST, DB_USER, DB_PASSWORD, DB_NAME
+from config import DB_POOL_SIZE, DB_POOL_WAIT, DB_QUERY_TIMEOUT, DB_HEALTHCHECK_INTERVAL
+
+# Raised when no pooled connection frees up within the wait budget
+class PoolExhaustedError(RuntimeError):
+    pass
+
+# Strip trailing semicolons so a generated query can be wrapped as a subquery
+def as_subquery(query):
+    return query.strip().rstrip(";").strip()
+
+# Identity of a generated query, ignoring formatting
+def query_fingerprint(query):
+    return hashlib.sha1(" ".join(as_subquery(query).split()).encode()).hexdigest()[:16]
+
+# Longest SQL text recorded on a query span
+SQL_SPAN_CHARS = 2000
+
+# Pass result blocks through, adding their rows and bytes to the query's span
+def _counted(blocks, current):
+    for block in blocks:
+        current.attributes["rows"] += len(block)
+        current.attributes["bytes"] += int(block.memory_usage(index=False).sum())
+        current.attributes["blocks"] += 1
+        yield block
+
+# Default factory opening a new Clickhouse client
+def create_client():
+    return clickhouse_connect.get_client(
+        host=DB_HOST,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        database=DB_NAME,
+        autogenerate_session_id=False
+    )
+
+# Process-wide pool of Clickhouse clients shared by every session and rerun
+class ClickHousePool:
+
+    def __init__(self, size=DB_POOL_SIZE, wait=DB_POOL_WAIT, timeout=DB_QUERY_TIMEOUT,
+                 healthcheck_interval=DB_HEALTHCHECK_INTERVAL, client_factory=create_client):
+        self.size = size
+        self.wait = wait
+        self.timeout = timeout
+        self.healthcheck_interval = healthcheck_interval
+        self.client_factory = client_factory
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    # Reuse an idle client, pinging it first if it sat unused for too long
+    def _checkout(self):
+        while True:
+            try:
+                client, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self.client_factory()
+
+            if time.monotonic() - last_used < self.healthcheck_interval:
+                return client
+            try:
+                if client.ping():
+                    return client
+            except Exception:
+                pass
+            self._discard(client)
+
+    def _discard(self, client):
+        try:
+            client.close()
+        except Exception:
+            pass
+
+    # Borrow a client, bounded by the pool size; clients with broken connections are dropped instead of returned
+    @contextlib.contextmanager
+    def connection(self):
+        if not self._slots.acquire(timeout=self.wait):
+            raise PoolExhaustedError(f"No Clickhouse connection available after {self.wait}s")
+
+        client = None
+        try:
+            client = self._checkout()
+            yield client
+
+        except OperationalError:
+            self._discard(client)
+            client = None
+            raise
+
+        finally:
+            if client is not None:
+                self._idle.put((client, time.monotonic()))
+            self._slots.release()
+
+    # Per-query settings enforcing the server-side execution timeout
+    def settings(self, timeout=None, settings=None):
+        merged = {"max_execution_time": timeout or self.timeout}
+        merged.update(settings or {})
+        return merged
+
+    def query_df(self, query, parameters=None, timeout=None, settings=None):
+        with span("clickhouse.query_df", "query", sql=query[:SQL_SPAN_CHARS]) as current, self.connection() as client:
+            df = client.query_df(query, parameters=parameters, settings=self.settings(timeout, settings))
+            current.set(rows=len(df), bytes=int(df.memory_usage(index=False).sum()))
+            return df
+
+    def query(self, query, parameters=None, timeout=None, settings=None):
+        with span("clickhouse.query", "query", sql=query[:SQL_SPAN_CHARS]) as current, self.connection() as client:
+            result = client.query(query, parameters=parameters, settings=self.settings(timeout, settings))
+            summary = result.summary or {}
+            current.set(rows=len(result.result_rows), read_rows=int(summary.get("read_rows", 0)), read_bytes=int(summary.get("read_bytes", 0)))
+            return result
+
+    # Result as a stream of DataFrame blocks; the client stays checked out until the stream is closed
+    @contextlib.contextmanager
+    def query_df_stream(self, query, parameters=None, timeout=None, settings=None):
+        with span("clickhouse.query_df_stream", "query", sql=query[:SQL_SPAN_CHARS], rows=0, bytes=0, blocks=0) as current, self.connection() as client:
+            with client.query_df_stream(query, parameters=parameters, settings=self.settings(timeout, settings)) as stream:
+                yield _counted(stream, current)
+
+    def command(self, command, parameters=None, timeout=None, settings=None):
+        with span("clickhouse.command", "query", sql=command[:SQL_SPAN_CHARS]), self.connection() as client:
+            return client.command(command, parameters=parameters, settings=self.settings(timeout, settings))
+
+    def close(self):
+        while True:
+            try:
+                client, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(client)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Shared pool, created lazily on first use
+def get_pool():
+    global _pool
+
+    with _pool_lock:
+        if _pool is None:
+            _pool = ClickHousePool()
+        return _pool
+
+# Swap the shared pool (e.g. to point at a different client factory)
+def configure_pool(**kwargs):
+    global _pool
+
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = ClickHousePool(**kwargs)
+        return _pool
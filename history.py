@@ -0,0 +1,106 @@
+import re
+from collections import OrderedDict
+from config import HISTORY_TOKEN_BUDGET, HISTORY_RECENT_TURNS, HISTORY_MAX_FACTS
+
+# Rough token estimate (~4 characters per token for English text)
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+# Cut text to about `tokens` tokens
+def truncate_tokens(text, tokens):
+    limit = tokens * 4
+    return text if len(text) <= limit else text[:limit].rsplit(" ", 1)[0] + " …"
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+BULLET = re.compile(r"^(?:[-*•]|\d+[.)])\s*")
+
+# "Label: value" lines whose value holds a number, e.g. "Total number of errors: 5000";
+# bullet items are qualified with the heading above them ("Errors by severity / Warning")
+def extract_facts(text):
+    heading = None
+
+    for line in text.splitlines():
+        is_item = bool(BULLET.match(line.strip()))
+        stripped = BULLET.sub("", line.strip())
+
+        if stripped.endswith(":"):
+            heading = stripped[:-1]
+            continue
+
+        label, _, value = stripped.partition(": ")
+        if not value or not re.search(r"\d", value) or not label[:1].isalpha() or len(label) > 80:
+            continue
+        if is_item and heading:
+            label = f"{heading} / {label}"
+        yield label, value
+
+# Chat history kept under a token budget: recent turns verbatim, older turns summarised, numeric facts cached
+class ConversationMemory:
+
+    def __init__(self, token_budget=HISTORY_TOKEN_BUDGET, recent_turns=HISTORY_RECENT_TURNS, max_facts=HISTORY_MAX_FACTS):
+        self.token_budget = token_budget
+        self.recent_turns = recent_turns
+        self.max_facts = max_facts
+        self.turns = []
+        self.summaries = []
+        self.facts = OrderedDict()
+
+    def add(self, question, answer):
+        self.turns.append((question, answer))
+        self.add_facts(answer, source=question)
+
+        # Turns leaving the verbatim window are folded into one-line summaries
+        while len(self.turns) - len(self.summaries) > self.recent_turns:
+            self.summaries.append(self.summarize(*self.turns[len(self.summaries)]))
+
+    # Cache figures stated in an answer so they survive summarisation (newest value wins)
+    def add_facts(self, text, source=None):
+        for label, value in extract_facts(text):
+            key = label.strip().lower()
+            self.facts.pop(key, None)
+            self.facts[key] = (label.strip(), value.strip()[:200], source)
+
+        while len(self.facts) > self.max_facts:
+            self.facts.popitem(last=False)
+
+    # First sentences of an answer, enough to recall what was asked and concluded
+    def summarize(self, question, answer, sentences=2):
+        lead = " ".join(SENTENCE_END.split(" ".join(answer.split()))[:sentences])
+        return f"Q: {question} → A: {truncate_tokens(lead, 80)}"
+
+    def clear(self):
+        self.turns.clear()
+        self.summaries.clear()
+        self.facts.clear()
+
+    # Prompt-ready history: facts, then summaries and recent turns, trimmed oldest-first to the budget
+    def render(self):
+        budget = self.token_budget
+        sections = []
+
+        if self.facts:
+            fact_lines = [f"- {label}: {value}" for label, value, _ in reversed(self.facts.values())]
+            facts = truncate_tokens("\n".join(fact_lines), budget // 3)
+            sections.append("Previously computed facts (newest first):\n" + facts)
+            budget -= estimate_tokens(facts)
+
+        recent = []
+        for question, answer in reversed(self.turns[len(self.summaries):]):
+            turn = f"User: {question}\nAI: {truncate_tokens(answer, max(budget // 2, 100))}"
+            if estimate_tokens(turn) > budget:
+                break
+            recent.insert(0, turn)
+            budget -= estimate_tokens(turn)
+
+        older = []
+        for summary in reversed(self.summaries):
+            if estimate_tokens(summary) > budget:
+                break
+            older.insert(0, summary)
+            budget -= estimate_tokens(summary)
+
+        if older:
+            sections.append("Earlier conversation (summarised):\n" + "\n".join(older))
+        if recent:
+            sections.append("Recent conversation:\n" + "\n\n".join(recent))
+        return "\n\n".join(sections) if sections else "(no previous conversation)"
@@ -0,0 +1,186 @@
+import threading
+import contextlib
+import contextvars
+import pandas as pd
+from collections import OrderedDict
+from config import KERNEL_MAX_SESSIONS, EXECUTOR_BACKEND, ANSWER_CACHE_ENABLED
+from utils import capture_stdout
+from snapshot_store import get_snapshot_store
+from answer_cache import get_answer_cache, analyse_snippet
+from tracing import span
+
+# (session_id, snapshot_id) the executor tool runs against; set around each agent run
+_session = contextvars.ContextVar("kernel_session", default=("default", None))
+
+# Bind agent tool calls in this context to a session's kernel and snapshot
+@contextlib.contextmanager
+def kernel_session(session_id, snapshot_id=None):
+    token = _session.set((session_id, snapshot_id))
+    try:
+        yield
+    finally:
+        _session.reset(token)
+
+def current_session():
+    return _session.get()
+
+# Raised when code is run for a session that has no snapshot bound
+class NoSnapshotError(RuntimeError):
+    pass
+
+# Snapshot the current session's code runs against, or None when no data is loaded for it; another
+# session's (or the latest) snapshot is never substituted
+def session_snapshot_id():
+    return current_session()[1]
+
+# Long-lived execution namespace with the snapshot preloaded as `df`; generated code may write values in place,
+# so the kernel holds its own deep copy of the shared frame
+class AnalysisKernel:
+
+    def __init__(self, snapshot_id, data=None):
+        self.snapshot_id = snapshot_id
+        self.lock = threading.Lock()
+        self.data = (get_snapshot_store().frame(snapshot_id) if data is None else data).copy()
+        self.namespace = {"__builtins__": __builtins__, "pd": pd, "df": self.data, "load_data": self.load_data}
+
+    def load_data(self):
+        return self.data
+
+    # Run a snippet in the persistent namespace; returns printed output, or the names it bound
+    def run(self, code):
+        with self.lock:
+            before = dict(self.namespace)
+
+            with capture_stdout() as buffer:
+                try:
+                    exec(code, self.namespace)
+                    output = buffer.getvalue()
+
+                except Exception as e:
+                    output = f"Execution failed: {str(e)}"
+
+            if output:
+                return output
+            return str({k: v for k, v in self.namespace.items() if k not in before or before[k] is not v})
+
+_kernels = OrderedDict()
+_kernels_lock = threading.Lock()
+
+# Kernel for the current session, recreated when its snapshot changes
+def get_kernel(session_id=None, snapshot_id=None):
+    session_id = session_id or current_session()[0]
+    snapshot_id = snapshot_id or session_snapshot_id()
+    if snapshot_id is None:
+        raise NoSnapshotError(f"No data is loaded for session {session_id}")
+
+    with _kernels_lock:
+        kernel = _kernels.get(session_id)
+
+        if kernel is None or kernel.snapshot_id != snapshot_id:
+            kernel = _kernels[session_id] = AnalysisKernel(snapshot_id)
+
+        # Least recently used sessions give up their kernels first
+        _kernels.move_to_end(session_id)
+        while len(_kernels) > KERNEL_MAX_SESSIONS:
+            _kernels.popitem(last=False)
+
+        return kernel
+
+# Snippets answered from the output cache per session, with the names they would have bound; they run
+# only when a later snippet reads one of those names: session_id -> (snapshot_id, [(code, names)])
+_deferred = {}
+_deferred_lock = threading.Lock()
+
+def _defer(session_id, snapshot_id, code, names):
+    if not names:
+        return
+    with _deferred_lock:
+        deferred_snapshot, snippets = _deferred.get(session_id, (None, []))
+        if deferred_snapshot != snapshot_id:
+            snippets = []
+        _deferred[session_id] = (snapshot_id, snippets + [(code, set(names))])
+
+# Deferred snippets that must run before a snippet: those binding a name it reads or rebinds (all of them if it
+# can't be analysed), in the order they were asked, so the namespace ends up as if nothing had been cached
+def _take_deferred(session_id, snapshot_id, snippet):
+    with _deferred_lock:
+        deferred_snapshot, snippets = _deferred.pop(session_id, (None, []))
+        if deferred_snapshot != snapshot_id:
+            return []
+
+        touched = None if snippet is None or snippet.dynamic else snippet.free | snippet.bound
+        replay = [code for code, names in snippets if touched is None or names & touched]
+        remaining = [(code, names) for code, names in snippets if touched is not None and not names & touched]
+        if remaining:
+            _deferred[session_id] = (snapshot_id, remaining)
+        return replay
+
+# Sessions whose namespace may no longer hold the snapshot's pristine `df`, `pd` and `load_data` (a snippet
+# rebound or mutated something, or read the namespace dynamically): session_id -> snapshot_id. Cached outputs
+# were computed on pristine namespaces, so these sessions neither read nor feed the output cache
+_changed = {}
+_changed_lock = threading.Lock()
+
+def _namespace_changed(session_id, snapshot_id):
+    with _changed_lock:
+        return _changed.get(session_id) == snapshot_id
+
+def _mark_changed(session_id, snapshot_id):
+    with _changed_lock:
+        _changed[session_id] = snapshot_id
+
+# Drop a session's kernel, e.g. when a new fetch replaces its data
+def reset_kernel(session_id):
+    with _kernels_lock:
+        _kernels.pop(session_id, None)
+    with _deferred_lock:
+        _deferred.pop(session_id, None)
+    with _changed_lock:
+        _changed.pop(session_id, None)
+
+    if EXECUTOR_BACKEND == "pool":
+        from worker_pool import get_worker_pool
+        get_worker_pool().reset(session_id)
+
+# Run a snippet in a session's namespace on the configured backend
+def _execute(session_id, snapshot_id, code):
+    if EXECUTOR_BACKEND == "pool":
+        from worker_pool import get_worker_pool
+        return get_worker_pool().run(session_id, snapshot_id, code)
+    return get_kernel(session_id, snapshot_id).run(code)
+
+# Run a snippet for the current session; self-contained snippets already run on identical data are answered
+# from the output cache, and run later only if another snippet needs the names they bind. Sessions that changed
+# their namespace bypass the cache
+def run_code(code):
+    with span("executor.run", "code", backend=EXECUTOR_BACKEND, code_chars=len(code)) as current:
+        session_id, snapshot_id = current_session()[0], session_snapshot_id()
+        if snapshot_id is None:
+            current.set(bytes=0, failed=True, cached=False)
+            return "Execution failed: no data is loaded for this session. Ask the user to fetch data first."
+
+        snippet = analyse_snippet(code)
+
+        content_hash = None
+        cacheable = snippet is not None and snippet.self_contained and not _namespace_changed(session_id, snapshot_id)
+        if ANSWER_CACHE_ENABLED and cacheable:
+            content_hash = get_snapshot_store().content_hash(snapshot_id)
+            output = get_answer_cache().output(content_hash, code)
+            if output is not None:
+                _defer(session_id, snapshot_id, code, snippet.bound)
+                current.set(bytes=len(output), failed=False, cached=True)
+                return output
+
+        for replay in _take_deferred(session_id, snapshot_id, snippet):
+            _execute(session_id, snapshot_id, replay)
+
+        if snippet is not None and (snippet.mutates or snippet.dynamic):
+            _mark_changed(session_id, snapshot_id)
+
+        output = _execute(session_id, snapshot_id, code)
+        failed = output.startswith("Execution failed")
+        if content_hash is not None and not failed:
+            get_answer_cache().store_output(content_hash, code, output)
+
+        current.set(bytes=len(output), failed=failed, cached=False)
+        return output
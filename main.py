@@ -1,161 +1,252 @@
 # Import required libraries
-import sys
 import time
-import subprocess
-import webbrowser
+import uuid
 import streamlit as st
-from config import CSV_FILE_PATH
-from langchain_anthropic import ChatAnthropic
-from streamlit_autorefresh import st_autorefresh
 
 # Import custom libraries
-from tools.time_access_tool import TimeAccessTool
-from agents.analysis_generator import analyze_errors
+from agents.analysis_generator import generate_report, REPORT_SECTIONS
 from agents.query_generator import generate_sql_query
 from agents.followup_generator import provide_followup
-from tools.python_executor_tool import PythonExecutorTool
-from tools.clickhouse_query_tool import ClickHouseQueryTool
-from utils import fetch_csv_from_db, cleanup, strip_ansi_codes
+from agents.callbacks import StreamlitAgentStream
+from registry import get_agent
+from refresh import probe_watermark
+from watcher import get_watcher
+from snapshots import write_snapshot
+from snapshot_store import get_snapshot_store
+from schema import to_typed_frame
+from stats import compute_error_stats, format_error_stats
+from kernel import kernel_session, reset_kernel
+from sql_cache import get_sql_cache
+from answer_cache import get_answer_cache
+from history import ConversationMemory
+from dashboard import start_dashboard, dashboard_url, warm
+from tracing import span, recent_traces, trace_rows, waterfall_figure
+from utils import fetch_csv_from_db, fetch_to_snapshot, cleanup, strip_ansi_codes
+from config import FETCH_STREAMING, FETCH_MAX_ROWS, WATCH_INTERVAL, TRACE_DEBUG_PANEL
 
 # Configure Streamlit layout settings
 st.set_page_config(page_title="Error Analysis Dashboard", layout="wide")
 
-# Initialize Claude model for LLM-based processing
-llm = ChatAnthropic(model="claude-3-5-sonnet-20240620", max_tokens=8192, temperature=0.0)
-
 # Define session state variables with default values
 defaults = {
+    "session_id": uuid.uuid4().hex,
     "chat_history": [], 
+    "conversation": ConversationMemory(),
     "thoughts": [],
     "user_input": "", 
-    "fetched_data": None,
     "last_query": None,
     "last_raw_thought": None,
     "analysis_completed": False,
     "dashboard_generated": False,
     "new_data_available": False,
-    "prev_row_count": 0,
-    "last_data_check": 0
+    "data_watermark": None,
+    "snapshot_id": None,
+    "delta_rows": 0,
+    "fetch_truncated": False,
+    "watch_error": None
 }
 
 # Initialize session state variables if not already set
 for key, val in defaults.items():
     st.session_state.setdefault(key, val)
 
-# Enable auto-refresh every 60 seconds to check for new data
-st_autorefresh(interval=60000, key="data_refresh")
+# Sessions hold only a snapshot id; the data itself lives once per process in the shared store
+if st.session_state["snapshot_id"]:
+    get_snapshot_store().acquire(st.session_state["session_id"], st.session_state["snapshot_id"])
+
+# Apply new-data events pushed by the shared watcher; only the watcher probes the database
+@st.fragment(run_every=WATCH_INTERVAL)
+def watch_for_new_data():
+    watcher = get_watcher()
+    events = watcher.poll(st.session_state["session_id"])
+
+    # Not subscribed (e.g. the watcher expired this session while it was idle): subscribe again
+    if events is None:
+        watcher.subscribe(st.session_state["session_id"], st.session_state["last_query"], st.session_state["data_watermark"], st.session_state["snapshot_id"])
+        return
+
+    for event in events:
+        # Merged deltas and newer fetches by other sessions both move this session to the newer snapshot
+        if event["type"] in ("delta", "snapshot"):
+            st.session_state["data_watermark"] = event["watermark"]
+            st.session_state["snapshot_id"] = event["snapshot_id"]
+            get_snapshot_store().acquire(st.session_state["session_id"], event["snapshot_id"])
+            if event["type"] == "delta":
+                st.session_state["delta_rows"] += event["delta_rows"]
+            else:
+                st.session_state["new_data_available"] = True
+
+            # The dashboard link moves to the newer snapshot; index it before anyone opens it
+            if st.session_state.dashboard_generated:
+                warm(event["snapshot_id"])
+        elif event["type"] == "new_data":
+            st.session_state["new_data_available"] = True
+        elif event["type"] == "error":
+            st.session_state["watch_error"] = event["text"]
 
-# Track time since last data check
-current_time = time.time()
-time_since_last_check = current_time - st.session_state["last_data_check"]
+    if events:
+        st.rerun()
 
 # Sidebar - Input for querying error logs
 st.sidebar.header("🔍 Load Error Logs from the database")
 user_input = st.sidebar.text_input("Enter your request (e.g., 'fetch all logs for server 175'):")
 
+sql_cache_stats = get_sql_cache().stats()
+st.sidebar.caption(f"Query cache: {sql_cache_stats['entries']} entries, {sql_cache_stats['hit_rate']:.0%} hit rate")
+
 # If there is a previous query, display it and check for new data
 if st.session_state["last_query"]:
     with st.expander("🔍 View Generated SQL Query"):
         st.code(st.session_state["last_query"], language="sql")
         st.text_area("🧠 Agent's Thought Process", value=st.session_state.last_raw_thought.strip(), height=300)
-    
-    # Check if new data is available
-    if time_since_last_check >= 60:
-        try:
-            new_data = fetch_csv_from_db(st.session_state["last_query"])
-            new_row_count = len(new_data)
-            
-            if new_row_count > st.session_state["prev_row_count"]:
-                st.session_state["new_data_available"] = True
-                st.session_state["prev_row_count"] = new_row_count
-                st.session_state["last_data_check"] = current_time
 
-        except Exception as e:
-            st.sidebar.error(f"⚠️ Error checking for new data: {str(e)}")
+    # Poll this session's event queue; the watcher fetches changed rows once per distinct query
+    if st.session_state["snapshot_id"] is not None:
+        watch_for_new_data()
+
+if st.session_state["watch_error"]:
+    st.sidebar.error(f"⚠️ Error checking for new data: {st.session_state['watch_error']}")
+    st.session_state["watch_error"] = None
 
 # Notify the user if new data is available
 if st.session_state.get("new_data_available", False):
     st.sidebar.warning("🔄 New data available! Please press 'Fetch Data' to refresh.")
     st.session_state["new_data_available"] = False
 
+if st.session_state["delta_rows"]:
+    st.sidebar.info(f"🔄 {st.session_state['delta_rows']} new or updated rows merged. Press 'Fetch Data' to re-run the analysis.")
+    st.session_state["delta_rows"] = 0
+
+if st.session_state["fetch_truncated"] and st.session_state["snapshot_id"] is not None:
+    st.sidebar.warning(f"⚠️ Only the first {len(get_snapshot_store().frame(st.session_state['snapshot_id'])):,} rows were fetched (fetch limit reached). Narrow your request to see everything.")
+
 # Button to fetch data and run analysis
 if st.sidebar.button("Fetch Data & Run Analysis"):
-    with st.spinner("Generating query..."):
-
-        # Generate SQL query using LLM
-        query, last_raw_thought = generate_sql_query(user_input, llm, [ClickHouseQueryTool(), TimeAccessTool()])
-        query, last_raw_thought = query["output"], strip_ansi_codes(last_raw_thought)
-
-        # Store query and agent's thought process
-        st.session_state["last_query"] = query
-        st.session_state["last_raw_thought"] = last_raw_thought
-        
-        # Initialize row count if this is the first query
-        if st.session_state["prev_row_count"] == 0:
-            st.session_state["prev_row_count"] = len(fetch_csv_from_db(query))
-            st.session_state["last_data_check"] = time.time()
+    with span("fetch run", "run", session_id=st.session_state["session_id"], request=user_input):
+        with st.spinner("Generating query..."):
+
+            # Generate SQL query using LLM, streaming the agent's steps into the sidebar
+            with st.sidebar:
+                query_stream = StreamlitAgentStream("🧠 Generating query", show_answer=False)
+            query, last_raw_thought = generate_sql_query(user_input, get_agent("query"), on_event=query_stream)
+            query, last_raw_thought = query["output"], strip_ansi_codes(last_raw_thought)
+
+            # Store query and agent's thought process
+            st.session_state["last_query"] = query
+            st.session_state["last_raw_thought"] = last_raw_thought
     
-    with st.spinner("Fetching and analyzing data..."):
-        try:
-            data = fetch_csv_from_db(query)
-            if data.empty:
-                st.error("No data found. Please check your query and try again.")
+        with st.spinner("Fetching and analyzing data..."):
+            try:
+                # Take the watermark before fetching so rows inserted mid-fetch are picked up by the next delta
+                watermark = probe_watermark()
 
-            else:
-                st.session_state["fetched_data"] = data
-                st.session_state["new_data_available"] = False
-                data.to_csv(CSV_FILE_PATH, index=False)
-                st.success("✅ Data fetched successfully!")
+                # Stream result blocks straight into the snapshot (or write a legacy in-memory fetch as one)
+                def fetch():
+                    if FETCH_STREAMING:
+                        progress = st.sidebar.progress(0.0, text="Fetching data...")
+
+                        def show_progress(rows, nbytes):
+                            fraction = min(rows / FETCH_MAX_ROWS, 1.0) if FETCH_MAX_ROWS else 0.0
+                            progress.progress(fraction, text=f"Fetched {rows:,} rows ({nbytes / 2**20:.1f} MB)")
+
+                        try:
+                            snapshot_id, _, truncated = fetch_to_snapshot(query, on_progress=show_progress)
+                        finally:
+                            progress.empty()
+                        return (snapshot_id, truncated) if snapshot_id else None
+
+                    data = fetch_csv_from_db(query)
+                    if data is None or data.empty:
+                        return None
+                    data = to_typed_frame(data)
+                    return write_snapshot(data, query), False, data
+
+                # Sessions asking for the same query at the same data version share one fetch and one snapshot;
+                # its frame is loaded by the store only when the analysis or dashboard first needs it
+                store = get_snapshot_store()
+                snapshot_id, truncated, reused = store.get_or_fetch(query, watermark, fetch) or (None, False, False)
+
+                if snapshot_id is None:
+                    st.error("No data found. Please check your query and try again.")
+
+                else:
+                    st.session_state["new_data_available"] = False
+                    st.session_state["data_watermark"] = watermark
+                    st.session_state["snapshot_id"] = snapshot_id
+                    st.session_state["fetch_truncated"] = truncated
+                    store.acquire(st.session_state["session_id"], snapshot_id)
+                    get_watcher().subscribe(st.session_state["session_id"], query, watermark, snapshot_id)
+                    reset_kernel(st.session_state["session_id"])
+                    st.success("✅ Data fetched successfully!" + (" (shared with another session)" if reused else ""))
                 
-                # Reset session state variables for new data processing
-                if data is not None:
+                    # Reset session state variables for new data processing
                     st.session_state.chat_history.clear()
+                    st.session_state.conversation.clear()
                     st.session_state.thoughts.clear()
                     cleanup()
                     st.session_state.analysis_completed = st.session_state.dashboard_generated = False
-                    st.session_state.pop("dashboard_process", None)
                     st.rerun()
 
-        except Exception as e:
-            st.error(f"Error fetching data: {str(e)}. Please check your query and try again.")
+            except Exception as e:
+                st.error(f"Error fetching data: {str(e)}. Please check your query and try again.")
 
 # Sidebar - Dashboard control buttons
 st.sidebar.markdown("---")
 st.sidebar.header("📊 Dashboard Controls")
 
-if st.session_state.dashboard_generated:
-    if st.sidebar.button("🚀 Open Dashboard", key="open_dash"):
-        webbrowser.open("http://127.0.0.1:8050/", new=2)
+if st.session_state.dashboard_generated and st.session_state["snapshot_id"] is not None:
+    st.sidebar.link_button("🚀 Open Dashboard", dashboard_url(st.session_state["snapshot_id"]))
+    st.sidebar.button("🛑 Close Dashboard", on_click=cleanup, key="stop_dash")
 
-    st.sidebar.button("🛑 Stop Dashboard", on_click=cleanup, key="stop_dash")
+# Debug panel: timing waterfall of this session's recent runs (stages, agent steps, tool calls, queries, LLM calls)
+traces = recent_traces(st.session_state["session_id"]) if TRACE_DEBUG_PANEL else []
+if traces:
+    with st.sidebar.expander("🐞 Run Timings"):
+        labels = [f"{t.name} at {time.strftime('%H:%M:%S', time.localtime(t.start_ns / 1e9))} ({t.duration_ms / 1000:.1f}s)" for t in traces]
+        selected_trace = st.selectbox("Run", range(len(traces)), format_func=labels.__getitem__)
+        rows = trace_rows(traces[selected_trace])
+        st.plotly_chart(waterfall_figure(rows), use_container_width=True)
+        st.dataframe(rows.drop(columns=["start_ms"]), hide_index=True)
 
 # Main UI title
 st.title("📊 System Error Analysis Dashboard")
 
 # Run error analysis if data is available and not yet analyzed
-if st.session_state["fetched_data"] is not None and not st.session_state.analysis_completed:
-    st.subheader("📄 Error Summary Report")
-    
-    with st.spinner("Analyzing error logs..."):
-        response, raw_thoughts = analyze_errors(llm, [PythonExecutorTool(), TimeAccessTool()])
+if st.session_state["snapshot_id"] is not None and not st.session_state.analysis_completed:
+    with span("analysis run", "run", session_id=st.session_state["session_id"], snapshot_id=st.session_state["snapshot_id"]):
+        st.subheader("📄 Error Summary Report")
     
-    # Store analysis results in session state
-    st.session_state.chat_history.append(("Error Analysis Summary", response["output"]))
-    st.session_state.thoughts.append(raw_thoughts)
-    st.session_state.analysis_completed = True
-
-    # Start the dashboard process
-    dashboard_script_path = "dashboard.py"
-
-    if not st.session_state.dashboard_generated:
-        if "dashboard_process" in st.session_state:
-            st.session_state.dashboard_process.terminate()
-            del st.session_state["dashboard_process"]
+        # Sections are generated concurrently and rendered as soon as each one finishes
+        section_placeholders = [st.empty() for _ in REPORT_SECTIONS]
+        for placeholder, (_, title, _) in zip(section_placeholders, REPORT_SECTIONS):
+            placeholder.info(f"⏳ {title}...")
+
+        sections = [None] * len(REPORT_SECTIONS)
+        with st.spinner("Analyzing error logs..."), kernel_session(st.session_state["session_id"], st.session_state["snapshot_id"]):
+            # Every figure comes from the session's snapshot, so totals, time range and hourly trends agree
+            with span("stats"):
+                stats = format_error_stats(compute_error_stats(get_snapshot_store().frame(st.session_state["snapshot_id"])))
+
+            with span("report"):
+                for index, title, response, raw_thoughts in generate_report(get_agent("analysis"), stats):
+                    sections[index] = (title, response["output"], raw_thoughts)
+                    section_placeholders[index].markdown(f"**{title}**\n\n{response['output']}")
     
-    st.session_state.dashboard_process = subprocess.Popen([sys.executable, dashboard_script_path])
-    st.session_state.dashboard_generated = True
-    time.sleep(3)
-    st.rerun()
+        # Store analysis results in session state
+        report = "\n\n".join(f"{title}\n{output}" for title, output, _ in sections)
+        st.session_state.chat_history.append(("Error Analysis Summary", report))
+        st.session_state.conversation.add("Error Analysis Summary", report)
+        st.session_state.conversation.add_facts(stats, source="Pre-computed statistics")
+        st.session_state.thoughts.append("\n\n".join(f"=== {title} ===\n{raw_thoughts}" for title, _, raw_thoughts in sections))
+        st.session_state.analysis_completed = True
+
+        # Serve this session's snapshot from the shared dashboard server (started and awaited once per process),
+        # building its index in the background so the dashboard opens straight away
+        with span("dashboard start"):
+            start_dashboard()
+            warm(st.session_state["snapshot_id"])
+            st.session_state.dashboard_generated = True
+        st.rerun()
 
 # Display chat history with AI responses
 for i, exchange in enumerate(st.session_state.chat_history):
@@ -180,11 +271,17 @@ def handle_input():
     user_question = st.session_state.user_input
 
     if user_question:
-        with st.spinner("Thinking..."):
-            response, raw_thoughts = provide_followup(user_question, llm, [PythonExecutorTool(), TimeAccessTool()], st.session_state.chat_history)
+        followup_stream = StreamlitAgentStream(f"🧠 {user_question}")
+        with span("follow-up run", "run", session_id=st.session_state["session_id"], question=user_question), kernel_session(st.session_state["session_id"], st.session_state["snapshot_id"]):
+            response, raw_thoughts = provide_followup(user_question, get_agent("followup"), st.session_state.conversation.render(), on_event=followup_stream)
 
         st.session_state.chat_history.append((user_question, response["output"]))
+        st.session_state.conversation.add(user_question, response["output"])
         st.session_state.thoughts.append(raw_thoughts)
         st.session_state.user_input = ""
 
-st.text_input("Ask a follow-up question:", key="user_input", on_change=handle_input)
\ No newline at end of file
+st.text_input("Ask a follow-up question:", key="user_input", on_change=handle_input)
+
+answer_cache_stats = get_answer_cache().stats()
+st.caption(f"Answer cache: {answer_cache_stats['answers']} answers ({answer_cache_stats['answer_hit_rate']:.0%} hit rate), "
+           f"{answer_cache_stats['outputs']} code outputs ({answer_cache_stats['output_hit_rate']:.0%} hit rate)")
\ No newline at end of file
@@ -0,0 +1,63 @@
+import pandas as pd
+from db import get_pool, as_subquery
+from schema import to_typed_frame
+
+SOURCE_TABLE = "zabbix_problems"
+
+# Cheap probe for the newest insert in the source table
+def probe_watermark():
+    result = get_pool().query(f"SELECT max(insert_time) FROM {SOURCE_TABLE}")
+    return result.result_rows[0][0] if result.result_rows else None
+
+# Row count of the generated query, used when its result cannot be keyed by eventid
+def probe_row_count(query):
+    result = get_pool().query(f"SELECT count() FROM ({as_subquery(query)})")
+    return result.result_rows[0][0]
+
+# Event ids inserted or re-inserted (e.g. status changes) after the watermark
+def changed_event_ids(watermark):
+    result = get_pool().query(
+        f"SELECT DISTINCT eventid FROM {SOURCE_TABLE} WHERE insert_time > {{watermark:DateTime64(6)}}",
+        parameters={"watermark": watermark}
+    )
+    return [row[0] for row in result.result_rows]
+
+# Rows of the generated query restricted to events that changed after the watermark
+def fetch_delta(query, watermark):
+    return get_pool().query_df(
+        f"""SELECT * FROM ({as_subquery(query)})
+            WHERE eventid IN (SELECT eventid FROM {SOURCE_TABLE} WHERE insert_time > {{watermark:DateTime64(6)}})""",
+        parameters={"watermark": watermark}
+    )
+
+# Upsert delta rows into the fetched data, keyed by eventid
+def merge_delta(data, delta, changed_ids):
+
+    # Events that changed but no longer match the query (e.g. filtered on Active) are dropped
+    kept = data[~data["eventid"].isin(changed_ids)]
+
+    # An event may appear in both states until Clickhouse merges parts; Resolved wins over Active
+    if "status" in delta.columns:
+        resolved = delta["status"].astype(str).str.lower().eq("resolved")
+        delta = delta.iloc[resolved.to_numpy().argsort(kind="stable")]
+    delta = delta.drop_duplicates("eventid", keep="last")
+
+    # Type the delta first: it may grow the shared vocabulary the kept rows are then re-encoded against
+    delta = to_typed_frame(delta)
+    return pd.concat([to_typed_frame(kept), delta], ignore_index=True)
+
+# Incrementally refresh the fetched data for a query; returns (data, watermark, delta_rows)
+# delta_rows is None when the result has no eventid to upsert on and must be re-fetched in full;
+# pass `latest` when the watermark has already been probed
+def refresh_incremental(query, data, watermark, latest=None):
+    latest = latest if latest is not None else probe_watermark()
+
+    if latest is None or (watermark is not None and latest <= watermark):
+        return data, watermark, 0
+
+    if watermark is None or "eventid" not in data.columns:
+        return data, latest, None
+
+    changed_ids = changed_event_ids(watermark)
+    delta = fetch_delta(query, watermark)
+    return merge_delta(data, delta, changed_ids), latest, len(delta)
@@ -0,0 +1,36 @@
+import streamlit as st
+from langchain_anthropic import ChatAnthropic
+from langchain.agents import initialize_agent, AgentType
+from tools.time_access_tool import TimeAccessTool
+from tools.python_executor_tool import PythonExecutorTool
+from tools.clickhouse_query_tool import ClickHouseQueryTool
+
+# Tool sets per agent kind; tools are stateless, per-session state lives in the kernel session
+TOOLSETS = {
+    "query": lambda: [ClickHouseQueryTool(), TimeAccessTool()],
+    "analysis": lambda: [PythonExecutorTool(), TimeAccessTool()],
+    "followup": lambda: [PythonExecutorTool(), TimeAccessTool()]
+}
+
+# ReAct agent executor; prompts and callbacks are supplied per invocation, so one executor serves every session
+def build_agent(llm, tools):
+    return initialize_agent(
+        tools=tools,
+        llm=llm,
+        agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
+        verbose=False,
+    )
+
+# Claude model for LLM-based processing (streaming so agent output reaches the page token by token)
+@st.cache_resource
+def get_llm():
+    return ChatAnthropic(model="claude-3-5-sonnet-20240620", max_tokens=8192, temperature=0.0, streaming=True)
+
+@st.cache_resource
+def get_tools(kind):
+    return TOOLSETS[kind]()
+
+# Agent executor built once per process and shared across reruns and sessions
+@st.cache_resource
+def get_agent(kind):
+    return build_agent(get_llm(), get_tools(kind))
@@ -0,0 +1,193 @@
+import re
+from db import get_pool
+from refresh import SOURCE_TABLE
+
+# The rollups serve the dashboard charts. The analysis report doesn't use them: they cover the live table, not the
+# rows a (possibly truncated, older) snapshot holds, and the report's hourly trends must agree with its totals
+MINUTE_ROLLUP = f"{SOURCE_TABLE}_minute_rollup"
+HOUR_ROLLUP = f"{SOURCE_TABLE}_hour_rollup"
+
+# Status changes arrive as re-inserted rows of the same eventid (Clickhouse merges them later), so the rollups
+# count distinct events instead of rows: each bucket keeps the event ids it saw and the ids it saw resolved,
+# and Active is all minus resolved. Hostname, severity and problem_time are taken as fixed per event.
+RESOLVED = "lower(status) = 'resolved'"
+EVENT_STATES = f"uniqExactState(eventid) AS events, uniqExactStateIf(eventid, {RESOLVED}) AS resolved"
+
+# Resolved events by the power-of-two bucket of their final duration, unresolved ones in bucket 0
+DURATION_BUCKET = f"if({RESOLVED}, toUInt32(exp2(ceil(log2(greatest(duration, 1))))), 0)"
+
+# Distinct and resolved events per minute x host x severity
+MINUTE_ROLLUP_SELECT = f"""SELECT toStartOfMinute(problem_time) AS minute, hostname, severity_name, {EVENT_STATES}
+        FROM {SOURCE_TABLE}
+        GROUP BY minute, hostname, severity_name"""
+MINUTE_ROLLUP_DDL = [
+    f"""CREATE TABLE IF NOT EXISTS {MINUTE_ROLLUP} (
+            minute DateTime,
+            hostname LowCardinality(String),
+            severity_name LowCardinality(String),
+            events AggregateFunction(uniqExact, String),
+            resolved AggregateFunction(uniqExact, String)
+        ) ENGINE = AggregatingMergeTree
+        PARTITION BY toYYYYMM(minute)
+        ORDER BY (minute, hostname, severity_name)""",
+    f"CREATE MATERIALIZED VIEW IF NOT EXISTS {MINUTE_ROLLUP}_mv TO {MINUTE_ROLLUP} AS\n        {MINUTE_ROLLUP_SELECT}"
+]
+
+# Distinct and resolved events per hour x host x severity x duration bucket
+HOUR_ROLLUP_SELECT = f"""SELECT toStartOfHour(problem_time) AS hour, hostname, severity_name, {DURATION_BUCKET} AS duration_bucket, {EVENT_STATES}
+        FROM {SOURCE_TABLE}
+        GROUP BY hour, hostname, severity_name, duration_bucket"""
+HOUR_ROLLUP_DDL = [
+    f"""CREATE TABLE IF NOT EXISTS {HOUR_ROLLUP} (
+            hour DateTime,
+            hostname LowCardinality(String),
+            severity_name LowCardinality(String),
+            duration_bucket UInt32,
+            events AggregateFunction(uniqExact, String),
+            resolved AggregateFunction(uniqExact, String)
+        ) ENGINE = AggregatingMergeTree
+        PARTITION BY toYYYYMM(hour)
+        ORDER BY (hour, hostname, severity_name, duration_bucket)""",
+    f"CREATE MATERIALIZED VIEW IF NOT EXISTS {HOUR_ROLLUP}_mv TO {HOUR_ROLLUP} AS\n        {HOUR_ROLLUP_SELECT}"
+]
+
+# One-off copy of the existing history; the views only see rows inserted after they were created. Unmerged
+# duplicates of an event are harmless: its id lands in the same sets twice
+BACKFILL = {
+    MINUTE_ROLLUP: f"INSERT INTO {MINUTE_ROLLUP}\n        {MINUTE_ROLLUP_SELECT}",
+    HOUR_ROLLUP: f"INSERT INTO {HOUR_ROLLUP}\n        {HOUR_ROLLUP_SELECT}"
+}
+
+# Create the rollup tables and views; backfill rebuilds them from the source table, replacing rollups of an
+# older layout (run it while inserts are paused)
+def ensure_rollups(backfill=False):
+    pool = get_pool()
+    if backfill:
+        for table in (MINUTE_ROLLUP, HOUR_ROLLUP):
+            pool.command(f"DROP VIEW IF EXISTS {table}_mv")
+            pool.command(f"DROP TABLE IF EXISTS {table}")
+
+    for statement in MINUTE_ROLLUP_DDL + HOUR_ROLLUP_DDL:
+        pool.command(statement)
+
+    if backfill:
+        for statement in BACKFILL.values():
+            pool.command(statement)
+
+# Generated queries a rollup can stand in for: plain row selections from the source table
+QUERY_SHAPE = re.compile(
+    rf"^\s*select\s+(?P<columns>[\w\s,*]+?)\s+from\s+(?:\w+\.)?{SOURCE_TABLE}\b"
+    r"(?:\s+where\s+(?P<where>.+?))?(?:\s+order\s+by\s+[\w\s,]+?)?\s*;?\s*$",
+    re.IGNORECASE | re.DOTALL
+)
+STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'")
+IDENTIFIER = re.compile(r"\b[A-Za-z_]\w*\b")
+
+# Columns the rollups keep, plus the functions and keywords a filter on them may use (status is not a
+# dimension, so queries filtering on it are answered from the snapshot)
+ROLLUP_COLUMNS = {"hostname", "severity_name", "problem_time"}
+FILTER_WORDS = {
+    "and", "or", "not", "in", "like", "ilike", "between", "is", "null", "interval",
+    "second", "minute", "hour", "day", "week", "month", "year",
+    "lower", "upper", "lowerutf8", "upperutf8", "trim", "position", "match", "startswith", "endswith",
+    "now", "today", "yesterday", "todate", "todatetime", "todatetime64", "parsedatetimebesteffort",
+    "tostartofminute", "tostartofhour", "tostartofday", "tostartofweek", "tostartofmonth",
+    "subtractminutes", "subtracthours", "subtractdays", "subtractweeks", "subtractmonths",
+    "addminutes", "addhours", "adddays", "addweeks", "addmonths"
+}
+GROUPING_WORDS = {"group", "having", "limit", "join", "union", "select", "settings", "format", "array"}
+
+# WHERE clause of a generated query rewritten against a rollup's time column, "" when there is none,
+# or None when the query filters on anything the rollups don't keep
+def rollup_where(query, time_column):
+    match = QUERY_SHAPE.match(query)
+    if not match:
+        return None
+
+    where = match.group("where") or ""
+    words = {word.lower() for word in IDENTIFIER.findall(STRING_LITERAL.sub("''", where))}
+    if words & GROUPING_WORDS or not words <= ROLLUP_COLUMNS | FILTER_WORDS:
+        return None
+
+    # Bucket starts stand in for event times, so time bounds are exact to the bucket
+    return re.sub(r"\bproblem_time\b", time_column, where, flags=re.IGNORECASE)
+
+def is_routable(query):
+    return rollup_where(query, "minute") is not None
+
+# Extra equality filters (dashboard dropdowns) as bound parameters; a status selection picks the count instead
+def _selection(filters):
+    clauses, parameters = [], {}
+    for column, values in (filters or {}).items():
+        if values and column != "status":
+            clauses.append(f"{column} IN {{{column}:Array(String)}}")
+            parameters[column] = list(values)
+    return clauses, parameters
+
+# Statuses a dashboard status selection asks for, out of Active and Resolved (both when there is no selection);
+# None when it selects neither
+def _statuses(filters):
+    selected = {str(value).lower() for value in (filters or {}).get("status") or ()}
+    statuses = selected & {"active", "resolved"} if selected else {"active", "resolved"}
+    return statuses or None
+
+# Distinct events of the selected statuses in a group
+def _count(statuses):
+    if statuses == {"active"}:
+        return "toInt64(uniqExactMerge(events) - uniqExactMerge(resolved))"
+    if statuses == {"resolved"}:
+        return "toInt64(uniqExactMerge(resolved))"
+    return "toInt64(uniqExactMerge(events))"
+
+# Conditions and parameters for reading a rollup on behalf of a query, or None when the query cannot be answered from it
+def _conditions(query, time_column, filters=None, time_filtered=True):
+    where = rollup_where(query, time_column)
+    if where is None or (not time_filtered and re.search(rf"\b{time_column}\b", where)):
+        return None
+
+    clauses, parameters = _selection(filters)
+    if where:
+        clauses.insert(0, f"({where})")
+    return " AND ".join(clauses) or "1", parameters
+
+# Event counts over a rollup grouped by `key`, or None when the query cannot be answered from it
+def _query_rollup(query, table, time_column, key, group_by, filters=None, time_filtered=True):
+    conditions, statuses = _conditions(query, time_column, filters, time_filtered), _statuses(filters)
+    if conditions is None or statuses is None:
+        return None
+
+    where, parameters = conditions
+    return get_pool().query_df(
+        f"SELECT {key}, {_count(statuses)} AS count FROM {table} WHERE {where} GROUP BY {group_by} ORDER BY {group_by}",
+        parameters=parameters
+    )
+
+# Issues per minute
+def trend_counts(query, filters=None):
+    return _query_rollup(query, MINUTE_ROLLUP, "minute", "minute", "minute", filters)
+
+# Issues per severity
+def severity_counts(query, filters=None):
+    return _query_rollup(query, MINUTE_ROLLUP, "minute", "severity_name", "severity_name", filters)
+
+# Issues per duration bucket (upper bound in seconds, 0 for unresolved); only for queries without time bounds.
+# Resolved events count in the bucket of their final duration, unresolved ones are all events minus resolved ones
+def duration_counts(query, filters=None):
+    conditions, statuses = _conditions(query, "hour", filters, time_filtered=False), _statuses(filters)
+    if conditions is None or statuses is None:
+        return None
+
+    where, parameters = conditions
+    parts = []
+    if "resolved" in statuses:
+        parts.append(f"SELECT duration_bucket, {_count({'resolved'})} AS count FROM {HOUR_ROLLUP} WHERE {where} AND duration_bucket > 0 GROUP BY duration_bucket")
+    if "active" in statuses:
+        parts.append(f"SELECT toUInt32(0) AS duration_bucket, {_count({'active'})} AS count FROM {HOUR_ROLLUP} WHERE {where} HAVING count > 0")
+    return get_pool().query_df(
+        f"SELECT duration_bucket, count FROM ({' UNION ALL '.join(parts)}) ORDER BY duration_bucket",
+        parameters=parameters
+    )
+
+# Run once against the database: python rollups.py
+if __name__ == "__main__":
+    ensure_rollups(backfill=True)
@@ -0,0 +1,104 @@
+import re
+import threading
+import numpy as np
+import pandas as pd
+from config import SHARED_VOCABULARY_MAX
+
+# Clickhouse column types of zabbix_problems
+ZABBIX_PROBLEMS = {
+    "hostname": "String",
+    "ip_address": "String",
+    "eventid": "String",
+    "full_problem_description": "String",
+    "problem_time": "DateTime64(6)",
+    "status": "String",
+    "recovery_time": "Nullable(DateTime64(6))",
+    "duration": "Int32",
+    "severity_name": "String",
+    "insert_time": "DateTime64(6)"
+}
+
+# String columns with few distinct values, held dictionary-encoded (categorical)
+DICTIONARY_COLUMNS = {"hostname", "ip_address", "severity_name", "status", "full_problem_description"}
+
+INTEGER_TYPE = re.compile(r"^U?Int(8|16|32|64)$")
+TYPE_WRAPPER = re.compile(r"^(?:Nullable|LowCardinality)\((.*)\)$")
+
+# pandas dtype for a Clickhouse column type, or None to leave the column as fetched
+def pandas_dtype(column, clickhouse_type):
+    base = clickhouse_type
+    while TYPE_WRAPPER.match(base):
+        base = TYPE_WRAPPER.match(base).group(1)
+
+    if base == "String" and (column in DICTIONARY_COLUMNS or clickhouse_type.startswith("LowCardinality")):
+        return "category"
+    if base.startswith("DateTime"):
+        return "datetime64[ns]"
+    if INTEGER_TYPE.match(base):
+        return base.lower()
+    return None
+
+# Per-column category vocabularies shared by every frame loaded in this process; they only grow,
+# so frames from different snapshots share one dtype and concat/isin stay on integer codes
+class SharedVocabulary:
+
+    def __init__(self, max_size=SHARED_VOCABULARY_MAX):
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.dtypes = {}
+
+    # Re-encode a column against the shared vocabulary, adding values it hasn't seen
+    def encode(self, column, values):
+        if not isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype("category")
+
+        with self.lock:
+            dtype = self.dtypes.get(column)
+            if dtype is not None and values.cat.categories is dtype.categories:
+                return values
+
+            categories = values.cat.categories
+            vocabulary = pd.Index([], dtype=object) if dtype is None else dtype.categories
+            positions = vocabulary.get_indexer(categories)
+            unseen = categories[positions == -1]
+
+            if len(unseen):
+                # Start over rather than grow without bound; frames loaded earlier keep the old dtype
+                if len(vocabulary) + len(unseen) > self.max_size:
+                    vocabulary, unseen = pd.Index([], dtype=object), categories
+
+                dtype = self.dtypes[column] = pd.CategoricalDtype(vocabulary.append(unseen))
+                positions = dtype.categories.get_indexer(categories)
+
+        codes = values.cat.codes.to_numpy()
+        codes = np.where(codes >= 0, positions[codes], -1)
+        return pd.Series(pd.Categorical.from_codes(codes, dtype=dtype), index=values.index, name=values.name)
+
+_vocabulary = SharedVocabulary()
+
+def get_vocabulary():
+    return _vocabulary
+
+# Convert a fetched frame to its typed representation: categoricals (against the shared vocabulary, or local
+# categories when `shared` is False), datetime64[ns] timestamps and fixed-width integers
+def to_typed_frame(df, schema=ZABBIX_PROBLEMS, shared=True):
+    df = df.copy(deep=False)
+
+    for col in df.columns.intersection(list(schema)):
+        dtype = pandas_dtype(col, schema[col])
+
+        if dtype == "category":
+            if shared:
+                df[col] = get_vocabulary().encode(col, df[col])
+            elif isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].cat.remove_unused_categories()
+            else:
+                df[col] = df[col].astype("category")
+
+        elif dtype == "datetime64[ns]" and df[col].dtype != dtype:
+            df[col] = pd.to_datetime(df[col])
+
+        elif dtype is not None and df[col].dtype != dtype:
+            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0).astype(dtype)
+
+    return df
@@ -0,0 +1,215 @@
+import os
+import re
+import time
+import hashlib
+import threading
+import pandas as pd
+from collections import OrderedDict
+from db import query_fingerprint
+from snapshots import load_snapshot, snapshot_path, pin_snapshot, unpin_snapshot
+from config import SNAPSHOT_MEMORY_BUDGET_MB, SNAPSHOT_RELATIVE_WINDOW, SNAPSHOT_SESSION_TIMEOUT
+
+# Queries whose result depends on the clock as well as on the stored data
+RELATIVE_TIME = re.compile(r"\b(now|today|yesterday)\s*\(", re.IGNORECASE)
+
+# Key of a query's result: normalised SQL plus the data version (newest insert_time); clock-relative
+# queries also carry the current time window, so they are only shared for SNAPSHOT_RELATIVE_WINDOW seconds
+def snapshot_key(query, version, window=SNAPSHOT_RELATIVE_WINDOW):
+    if RELATIVE_TIME.search(query):
+        version = (version, int(time.time() // window))
+    return (query_fingerprint(query), str(version))
+
+# A published snapshot, its frame while loaded, and the sessions using it
+class StoreEntry:
+
+    def __init__(self, snapshot_id, key=None, truncated=False):
+        self.snapshot_id = snapshot_id
+        self.key = key
+        self.truncated = truncated
+        self.frame = None
+        self.nbytes = 0
+        self.content_hash = None
+        self.sessions = set()
+
+# Process-wide store of immutable snapshots: one fetch per distinct (query, version), one loaded frame
+# per snapshot shared by every session and kernel, evicted least recently used under a memory budget.
+# Pandas options are left alone: callers get shallow views and copy explicitly before writing values in place
+class SnapshotStore:
+
+    def __init__(self, memory_budget=SNAPSHOT_MEMORY_BUDGET_MB * 2**20, session_timeout=SNAPSHOT_SESSION_TIMEOUT):
+        self.memory_budget = memory_budget
+        self.session_timeout = session_timeout
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.keys = {}
+        self.sessions = {}
+        self.fetching = {}
+
+    def _entry(self, snapshot_id):
+        entry = self.entries.get(snapshot_id)
+        if entry is None:
+            entry = self.entries[snapshot_id] = StoreEntry(snapshot_id)
+        return entry
+
+    # Snapshot for (query, version), fetched by at most one caller at a time; `fetch` returns
+    # (snapshot id, truncated) or None, plus the fetched frame when it already has one in memory, which the
+    # store keeps instead of reading the snapshot back. Returns (snapshot id, truncated, reused) or None
+    def get_or_fetch(self, query, version, fetch):
+        key = snapshot_key(query, version)
+
+        while True:
+            with self.lock:
+                entry = self._lookup(key)
+                if entry is not None:
+                    return entry.snapshot_id, entry.truncated, True
+
+                pending = self.fetching.get(key)
+                if pending is None:
+                    pending = self.fetching[key] = threading.Event()
+                    break
+
+            # Another session is fetching the same data; wait for it instead of fetching again
+            pending.wait()
+
+        try:
+            fetched = fetch()
+            if fetched is not None and fetched[0] is not None:
+                self.register(query, version, *fetched)
+            return (fetched[0], fetched[1], False) if fetched is not None else None
+        finally:
+            with self.lock:
+                del self.fetching[key]
+            pending.set()
+
+    # Newest snapshot of the key's query if it holds the key's version and is still on disk
+    def _lookup(self, key):
+        entry = self.entries.get(self.keys.get(key[0]))
+        if entry is None or entry.key != key:
+            return None
+        if not os.path.exists(snapshot_path(entry.snapshot_id)):
+            del self.keys[key[0]]
+            entry.key = None
+            return None
+        return entry
+
+    # Record a snapshot as the newest result of its query, optionally with its already loaded frame
+    def register(self, query, version, snapshot_id, truncated=False, frame=None):
+        with self.lock:
+            entry = self._entry(snapshot_id)
+            entry.key, entry.truncated = snapshot_key(query, version), truncated
+
+            # Only the newest version of a query is reused; the one it replaces is forgotten once unused
+            replaced = self.entries.get(self.keys.get(entry.key[0]))
+            if replaced is not None and replaced is not entry:
+                replaced.key = None
+            self.keys[entry.key[0]] = snapshot_id
+
+            if frame is not None and entry.frame is None:
+                entry.frame, entry.nbytes = frame.copy(deep=False), int(frame.memory_usage(deep=True).sum())
+                self._evict(keep=snapshot_id)
+
+    # Point a session at a snapshot (releasing its previous one); repeated calls keep the session alive
+    def acquire(self, session_id, snapshot_id):
+        with self.lock:
+            self._expire()
+            previous = self.sessions.get(session_id)
+            if previous is not None and previous[0] != snapshot_id:
+                self._release(session_id)
+
+            entry = self._entry(snapshot_id)
+            if not entry.sessions:
+                pin_snapshot(snapshot_id)
+            entry.sessions.add(session_id)
+            self.sessions[session_id] = (snapshot_id, time.monotonic())
+
+    def release(self, session_id):
+        with self.lock:
+            self._release(session_id)
+
+    def _release(self, session_id):
+        snapshot_id, _ = self.sessions.pop(session_id, (None, None))
+        entry = self.entries.get(snapshot_id)
+        if entry is not None:
+            entry.sessions.discard(session_id)
+            if not entry.sessions:
+                unpin_snapshot(snapshot_id)
+
+    # Sessions that stopped running (closed tabs) give up their snapshots
+    def _expire(self):
+        now = time.monotonic()
+        for session_id, (_, last_seen) in list(self.sessions.items()):
+            if now - last_seen > self.session_timeout:
+                self._release(session_id)
+
+    # A snapshot's frame, loaded once and handed to each caller as its own shallow view: adding, replacing or
+    # dropping columns and rows stays private to the view, but the values are shared, so callers that may write
+    # them in place (.loc assignment, inplace=True) must take a deep copy first, as analysis kernels do
+    def frame(self, snapshot_id):
+        with self.lock:
+            entry = self._entry(snapshot_id)
+            self.entries.move_to_end(snapshot_id)
+            if entry.frame is not None:
+                return entry.frame.copy(deep=False)
+
+        # Load outside the lock so other snapshots stay available meanwhile
+        frame = load_snapshot(snapshot_id)
+        with self.lock:
+            entry = self._entry(snapshot_id)
+            if entry.frame is None:
+                entry.frame, entry.nbytes = frame, int(frame.memory_usage(deep=True).sum())
+            self._evict(keep=snapshot_id)
+            return entry.frame.copy(deep=False)
+
+    # Hash of a snapshot's columns and rows (not its id or creation time), computed once per snapshot, so
+    # caches keyed on it carry over to a re-fetch of identical data and miss as soon as the data changes
+    def content_hash(self, snapshot_id):
+        with self.lock:
+            entry = self.entries.get(snapshot_id)
+            if entry is not None and entry.content_hash is not None:
+                return entry.content_hash
+
+        frame = self.frame(snapshot_id)
+        digest = hashlib.sha1(",".join(map(str, frame.columns)).encode())
+        digest.update(pd.util.hash_pandas_object(frame, index=False).values.tobytes())
+
+        with self.lock:
+            self._entry(snapshot_id).content_hash = digest.hexdigest()[:16]
+            return self.entries[snapshot_id].content_hash
+
+    # Drop loaded frames, least recently used first, until the store fits its budget: frames no session
+    # uses go first, then frames of idle sessions (they are reloaded from their snapshot when needed)
+    def _evict(self, keep=None):
+        loaded = [e for e in self.entries.values() if e.frame is not None and e.snapshot_id != keep]
+        total = sum(e.nbytes for e in self.entries.values() if e.frame is not None)
+
+        for entry in sorted(loaded, key=lambda e: bool(e.sessions)):
+            if total <= self.memory_budget:
+                break
+            entry.frame, total = None, total - entry.nbytes
+
+        # Unloaded snapshots nobody uses are forgotten, unless they are still the newest of their query
+        for snapshot_id, entry in list(self.entries.items()):
+            if entry.frame is None and not entry.sessions and entry.key is None:
+                del self.entries[snapshot_id]
+
+    def stats(self):
+        with self.lock:
+            loaded = [e for e in self.entries.values() if e.frame is not None]
+            return {
+                "snapshots": len(self.entries),
+                "loaded": len(loaded),
+                "memory_bytes": sum(e.nbytes for e in loaded),
+                "sessions": len(self.sessions)
+            }
+
+_store = None
+_store_lock = threading.Lock()
+
+# Shared snapshot store for every session in this process
+def get_snapshot_store():
+    global _store
+
+    with _store_lock:
+        if _store is None:
+            _store = SnapshotStore()
+        return _store
@@ -0,0 +1,219 @@
+import os
+import time
+import uuid
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from schema import to_typed_frame
+from tracing import traced, current_span
+from config import SNAPSHOT_DIR, SNAPSHOT_KEEP
+
+CURRENT_POINTER = "CURRENT"
+SNAPSHOT_SUFFIX = ".arrow"
+
+def snapshot_path(snapshot_id):
+    return os.path.join(SNAPSHOT_DIR, f"{snapshot_id}{SNAPSHOT_SUFFIX}")
+
+# Id of the most recently published snapshot, or None before the first fetch
+def current_snapshot_id():
+    try:
+        with open(os.path.join(SNAPSHOT_DIR, CURRENT_POINTER)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+# Atomically write a small file so readers never see a partial write
+def _atomic_write(path, write):
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+# Snapshot ids sort by creation time
+def new_snapshot_id():
+    return f"{time.strftime('%Y%m%dT%H%M%S')}{time.time_ns() % 10**9:09d}-{uuid.uuid4().hex[:6]}"
+
+# Schema with the snapshot's metadata (id, source query, creation time, ...) attached
+def _with_metadata(schema, snapshot_id, query, **extra):
+    metadata = {"snapshot_id": snapshot_id, "query": query or "", "created": str(time.time()), **extra}
+    return schema.with_metadata({**(schema.metadata or {}), **{f"snapshot.{k}": str(v) for k, v in metadata.items()}})
+
+# Write a new versioned Arrow IPC snapshot and publish it as current
+@traced("snapshot.write", "io")
+def write_snapshot(df, query=None):
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    snapshot_id = new_snapshot_id()
+
+    table = pa.Table.from_pandas(to_typed_frame(df, shared=False), preserve_index=False)
+    table = table.replace_schema_metadata(_with_metadata(table.schema, snapshot_id, query, rows=table.num_rows).metadata)
+
+    def write_table(path):
+        with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+    _atomic_write(snapshot_path(snapshot_id), write_table)
+    current_span().set(rows=table.num_rows, bytes=os.path.getsize(snapshot_path(snapshot_id)))
+    publish_snapshot(snapshot_id)
+    prune_snapshots()
+    return snapshot_id
+
+# Writes fetched blocks into a new snapshot one at a time; categorical columns share a dictionary that
+# only grows, so each block after the first adds just its new values (an IPC dictionary delta)
+class SnapshotStreamWriter:
+
+    def __init__(self, query=None):
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        self.snapshot_id = new_snapshot_id()
+        self.query = query
+        self.tmp_path = f"{snapshot_path(self.snapshot_id)}.{uuid.uuid4().hex}.tmp"
+        self.vocabularies = {}
+        self.schema = None
+        self.sink = None
+        self.writer = None
+        self.rows = 0
+        self.nbytes = 0
+
+    # Dictionary-encode a categorical block against the column's shared vocabulary
+    def _encode(self, col, values):
+        vocabulary = self.vocabularies.get(col, pd.Index([], dtype=object))
+        categories = values.cat.categories.astype(str)
+        vocabulary = vocabulary.append(categories[vocabulary.get_indexer(categories) == -1])
+        self.vocabularies[col] = vocabulary
+
+        codes = values.cat.codes.to_numpy()
+        indices = np.where(codes >= 0, vocabulary.get_indexer(categories)[codes], -1).astype("int32")
+        return pa.DictionaryArray.from_arrays(pa.array(indices, mask=indices < 0), pa.array(vocabulary.to_numpy(), pa.string()))
+
+    def _batch(self, df):
+        df = to_typed_frame(df, shared=False)
+        categorical = [col for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)]
+        plain = pa.Table.from_pandas(df.drop(columns=categorical), preserve_index=False,
+                                     schema=None if self.schema is None else pa.schema([self.schema.field(c) for c in df.columns if c not in categorical]))
+
+        arrays = [self._encode(col, df[col]) if col in categorical else plain.column(col).combine_chunks() for col in df.columns]
+        return pa.RecordBatch.from_arrays(arrays, names=list(df.columns))
+
+    def write(self, df):
+        batch = self._batch(df)
+
+        if self.writer is None:
+            self.schema = batch.schema
+            self.sink = pa.OSFile(self.tmp_path, "wb")
+            options = pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+            self.writer = pa.ipc.new_file(self.sink, _with_metadata(self.schema, self.snapshot_id, self.query), options=options)
+
+        self.writer.write_batch(batch.cast(self.schema) if batch.schema != self.schema else batch)
+        self.rows += batch.num_rows
+        self.nbytes = self.sink.tell()
+
+    # Finish the file and publish it; returns the snapshot id, or None when no rows were written
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.sink.close()
+
+        if not self.rows:
+            self.abort()
+            return None
+
+        os.replace(self.tmp_path, snapshot_path(self.snapshot_id))
+        publish_snapshot(self.snapshot_id)
+        prune_snapshots()
+        return self.snapshot_id
+
+    def abort(self):
+        if self.sink is not None and not self.sink.closed:
+            self.sink.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+# Write a stream of DataFrame blocks to a new snapshot, stopping at the row/byte ceiling (0 for none);
+# returns (snapshot id or None, rows written, whether the result was truncated)
+@traced("snapshot.stream", "io")
+def stream_snapshot(blocks, query=None, max_rows=0, max_bytes=0, on_progress=None):
+    writer = SnapshotStreamWriter(query)
+    truncated = False
+
+    try:
+        for block in blocks:
+            if (max_rows and writer.rows >= max_rows) or (max_bytes and writer.nbytes >= max_bytes):
+                truncated = True
+                break
+
+            if max_rows and writer.rows + len(block) > max_rows:
+                block = block.iloc[:max_rows - writer.rows]
+                truncated = True
+            writer.write(block)
+
+            if on_progress:
+                on_progress(writer.rows, writer.nbytes)
+
+        current_span().set(rows=writer.rows, bytes=writer.nbytes, truncated=truncated)
+        return writer.close(), writer.rows, truncated
+
+    except BaseException:
+        writer.abort()
+        raise
+
+# Point readers at a snapshot
+def publish_snapshot(snapshot_id):
+    def write_pointer(path):
+        with open(path, "w") as f:
+            f.write(snapshot_id)
+
+    _atomic_write(os.path.join(SNAPSHOT_DIR, CURRENT_POINTER), write_pointer)
+
+# Snapshots sessions are still using; pruning leaves them alone
+_pinned = set()
+
+def pin_snapshot(snapshot_id):
+    _pinned.add(snapshot_id)
+
+def unpin_snapshot(snapshot_id):
+    _pinned.discard(snapshot_id)
+
+# Keep only the newest SNAPSHOT_KEEP snapshots (ids sort by creation time), plus the current and pinned ones
+def prune_snapshots(keep=SNAPSHOT_KEEP):
+    current = current_snapshot_id()
+    ids = sorted(name[:-len(SNAPSHOT_SUFFIX)] for name in os.listdir(SNAPSHOT_DIR) if name.endswith(SNAPSHOT_SUFFIX))
+
+    for snapshot_id in ids[:-keep]:
+        if snapshot_id != current and snapshot_id not in _pinned:
+            try:
+                os.remove(snapshot_path(snapshot_id))
+            except FileNotFoundError:
+                pass
+
+# Memory-map a snapshot as an Arrow table without copying it into memory
+def open_snapshot(snapshot_id=None):
+    snapshot_id = snapshot_id or current_snapshot_id()
+    if snapshot_id is None:
+        raise FileNotFoundError("No data snapshot has been written yet")
+
+    with pa.memory_map(snapshot_path(snapshot_id), "r") as source:
+        return pa.ipc.open_file(source).read_all()
+
+# Snapshot metadata (id, source query, creation time, row count)
+def read_metadata(snapshot_id=None):
+    snapshot_id = snapshot_id or current_snapshot_id()
+    with pa.memory_map(snapshot_path(snapshot_id), "r") as source:
+        reader = pa.ipc.open_file(source)
+        metadata = {k.decode(): v.decode() for k, v in (reader.schema.metadata or {}).items()}
+        metadata = {k[len("snapshot."):]: v for k, v in metadata.items() if k.startswith("snapshot.")}
+
+        # Streamed snapshots don't know their row count when the schema is written
+        if "rows" not in metadata:
+            metadata["rows"] = str(sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches)))
+
+    return metadata
+
+# Load a snapshot as a typed pandas DataFrame (the current one by default), its categoricals
+# re-encoded against the process-wide shared vocabulary
+@traced("snapshot.load", "io")
+def load_snapshot(snapshot_id=None):
+    table = open_snapshot(snapshot_id)
+    current_span().set(rows=table.num_rows, bytes=table.nbytes)
+    return to_typed_frame(table.to_pandas(split_blocks=True))
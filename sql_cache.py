@@ -0,0 +1,146 @@
+import os
+import re
+import json
+import time
+import uuid
+import datetime
+import threading
+from collections import OrderedDict
+from config import SQL_CACHE_PATH, SQL_CACHE_TTL, SQL_CACHE_MAX_ENTRIES
+
+# Words that don't change what a request asks for
+FILLER_WORDS = {"a", "an", "the", "all", "me", "please", "fetch", "get", "show", "give", "display", "list", "pull", "load", "find"}
+SYNONYMS = {"past": "last", "previous": "last", "servers": "server", "hosts": "host", "errors": "logs", "issues": "logs", "problems": "logs", "log": "logs"}
+
+# Requests phrased relative to "now" ("last 3 hours", "past day", "this week", "today", "2 days ago"); their
+# timestamp literals must not be frozen
+TIME_UNIT = r"(?:second|minute|hour|day|week|month|year)s?"
+RELATIVE_TIME = re.compile(
+    rf"\b(?:(?:last|past|previous)\s+(?:\d+\s+|few\s+|couple\s+(?:of\s+)?)?{TIME_UNIT}|(?:this|current)\s+{TIME_UNIT}|today|yesterday|tonight|ago)\b",
+    re.IGNORECASE
+)
+# Dates the user typed ("since 2025-01-01", "on 3/14", "after March 5"); they stay literal
+EXPLICIT_DATE = re.compile(
+    r"\b\d{4}-\d{1,2}-\d{1,2}\b|\b\d{1,2}/\d{1,2}(?:/\d{2,4})?\b"
+    r"|\b(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?\s+\d{1,2}(?:st|nd|rd|th)?\b"
+    r"|\b\d{1,2}(?:st|nd|rd|th)?\s+(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\b",
+    re.IGNORECASE
+)
+TIMESTAMP_LITERAL = re.compile(r"'(\d{4}-\d{2}-\d{2})(?:[ T](\d{2}:\d{2}:\d{2})(\.\d+)?)?'")
+PLACEHOLDER = re.compile(r"\{\{(now|today)([+-]\d+)\}\}")
+SELECT_STATEMENT = re.compile(r"^\s*(select|with)\b", re.IGNORECASE)
+
+# Canonical form of a request used as the cache key
+def normalize_request(text):
+    words = re.sub(r"[^a-z0-9\s]", " ", text.lower()).split()
+    return " ".join(SYNONYMS.get(w, w) for w in words if w not in FILLER_WORDS)
+
+# Replace timestamp literals with offsets from the generation time, e.g. {{now-86400}} or {{today-1}}
+def to_template(sql, generated_at):
+    def replace(match):
+        date, clock, _ = match.groups()
+        if clock is None:
+            days = (datetime.date.fromisoformat(date) - generated_at.date()).days
+            return f"'{{{{today{days:+d}}}}}'"
+
+        moment = datetime.datetime.fromisoformat(f"{date} {clock}")
+        return f"'{{{{now{round((moment - generated_at).total_seconds()):+d}}}}}'"
+
+    return TIMESTAMP_LITERAL.sub(replace, sql)
+
+# Fill offset placeholders relative to the current time
+def render_template(sql, now=None):
+    now = now or datetime.datetime.now()
+
+    def replace(match):
+        anchor, offset = match.group(1), int(match.group(2))
+        if anchor == "today":
+            return (now.date() + datetime.timedelta(days=offset)).isoformat()
+        return (now + datetime.timedelta(seconds=offset)).strftime("%Y-%m-%d %H:%M:%S")
+
+    return PLACEHOLDER.sub(replace, sql)
+
+# Persistent request -> validated SQL cache with TTL and LRU eviction
+class SQLCache:
+
+    def __init__(self, path=SQL_CACHE_PATH, ttl=SQL_CACHE_TTL, max_entries=SQL_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                self.entries = OrderedDict(json.load(f))
+        except (FileNotFoundError, ValueError):
+            self.entries = OrderedDict()
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        tmp_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+
+    # Cached SQL for a request, rendered against the current time, or None
+    def lookup(self, request):
+        key = normalize_request(request)
+
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry is None or time.time() - entry["created"] > self.ttl:
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return render_template(entry["sql"])
+
+    # Remember the SQL generated for a request; only plain SELECT statements are cached
+    def store(self, request, sql, generated_at=None):
+        if not SELECT_STATEMENT.match(sql):
+            return
+
+        # Only purely relative requests are templated; a typed date means every literal is meant as written
+        generated_at = generated_at or datetime.datetime.now()
+        if RELATIVE_TIME.search(request) and not EXPLICIT_DATE.search(request):
+            sql = to_template(sql, generated_at)
+
+        key = normalize_request(request)
+        with self.lock:
+            self.entries[key] = {"sql": sql, "created": time.time()}
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            self._save()
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses, "hit_rate": self.hit_rate()}
+
+_cache = None
+_cache_lock = threading.Lock()
+
+# Shared SQL cache, loaded from disk on first use
+def get_sql_cache():
+    global _cache
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = SQLCache()
+        return _cache
@@ -0,0 +1,100 @@
+import pandas as pd
+
+# Seconds as e.g. "2h 5m 10s"
+def format_duration(seconds):
+    if seconds is None or pd.isna(seconds):
+        return "n/a"
+
+    seconds = int(round(seconds))
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    parts = [f"{hours}h"] if hours else []
+    if hours or minutes:
+        parts.append(f"{minutes}m")
+    parts.append(f"{seconds}s")
+    return " ".join(parts)
+
+# Counts with percentage of total, most frequent first
+def _distribution(column, total, top=None):
+    counts = column.value_counts()
+    counts = counts[counts > 0]
+    if top:
+        counts = counts.head(top)
+    return [(str(value), int(count), round(100 * count / total, 2) if total else 0.0) for value, count in counts.items()]
+
+# Time-of-day figures from per-hour counts (a Series indexed by hour)
+def hourly_stats(hourly):
+    hourly = hourly[hourly > 0].sort_index()
+    return {
+        "hourly": [(str(hour), int(count)) for hour, count in hourly.items()],
+        "peak_hours": [(str(hour), int(count)) for hour, count in hourly.nlargest(10).items()],
+        "daily": [(str(day.date()), int(count)) for day, count in hourly.groupby(hourly.index.floor("D")).sum().items()],
+        "hour_of_day": [(int(hour), int(count)) for hour, count in hourly.groupby(hourly.index.hour).sum().items()]
+    }
+
+# Every figure the Error Summary Report asks for, computed with vectorised pandas operations
+def compute_error_stats(df):
+    total = len(df)
+    stats = {"total_errors": total}
+
+    if "severity_name" in df.columns:
+        stats["severity"] = _distribution(df["severity_name"], total)
+    if "status" in df.columns:
+        stats["status"] = _distribution(df["status"], total)
+    if "full_problem_description" in df.columns:
+        stats["top_messages"] = _distribution(df["full_problem_description"], total, top=5)
+    if "hostname" in df.columns:
+        stats["top_hosts"] = _distribution(df["hostname"], total, top=5)
+
+    if "duration" in df.columns:
+        duration = pd.to_numeric(df["duration"], errors="coerce")
+        stats["avg_duration"] = duration.mean()
+        stats["avg_resolved_duration"] = duration[duration > 0].mean()
+
+    if "problem_time" in df.columns:
+        problem_time = pd.to_datetime(df["problem_time"])
+        stats["first_problem"], stats["last_problem"] = problem_time.min(), problem_time.max()
+        stats.update(hourly_stats(problem_time.dt.floor("h").value_counts().sort_index()))
+
+    if {"status", "full_problem_description"} <= set(df.columns):
+        active = df["status"].astype(str).str.lower().eq("active")
+        stats["top_unresolved"] = _distribution(df.loc[active, "full_problem_description"], int(active.sum()), top=5)
+
+    return stats
+
+# Plain-text rendering of the statistics bundle for the agent prompt; long hourly series are summarised by day
+def format_error_stats(stats, max_hourly_points=72):
+    lines = [f"Total number of errors: {stats['total_errors']}"]
+
+    def section(title, rows):
+        lines.append(f"{title}:")
+        lines.extend(f"  - {value}: {count} ({pct}%)" for value, count, pct in rows)
+
+    if "severity" in stats:
+        section("Errors by severity", stats["severity"])
+    if "status" in stats:
+        section("Errors by status", stats["status"])
+    if "top_messages" in stats:
+        section("Top 5 most frequent error messages", stats["top_messages"])
+    if "top_hosts" in stats:
+        section("Top 5 most affected hosts", stats["top_hosts"])
+    if "top_unresolved" in stats:
+        section("Top 5 unresolved (Active) error messages, % of active", stats["top_unresolved"])
+
+    if "avg_duration" in stats:
+        lines.append(f"Average issue duration (all issues, unresolved count as 0): {format_duration(stats['avg_duration'])}")
+        lines.append(f"Average issue duration (resolved issues only): {format_duration(stats['avg_resolved_duration'])}")
+
+    if "hourly" in stats:
+        lines.append(f"Time range: {stats['first_problem']} to {stats['last_problem']}")
+        if len(stats["hourly"]) <= max_hourly_points:
+            lines.append("Errors per hour:")
+            lines.extend(f"  - {hour}: {count}" for hour, count in stats["hourly"])
+        else:
+            lines.append("Errors per day:")
+            lines.extend(f"  - {day}: {count}" for day, count in stats["daily"])
+            lines.append("Busiest hours:")
+            lines.extend(f"  - {hour}: {count}" for hour, count in stats["peak_hours"])
+        lines.append("Errors by hour of day: " + ", ".join(f"{hour:02d}h={count}" for hour, count in stats["hour_of_day"]))
+
+    return "\n".join(lines)
@@ -0,0 +1,45 @@
+import os
+import sys
+import logging
+import tempfile
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+# The app's config reads Streamlit secrets from the working directory, so the tests run in a throwaway
+# workspace with its own secrets, snapshot directory and caches
+SECRETS = """ANTHROPIC_API_KEY = "test"
+DB_HOST = "localhost"
+DB_USER = "test"
+DB_NAME = "test"
+DB_PASSWORD = "test"
+CSV_FILE_PATH = "{workdir}/data/logs.csv"
+SNAPSHOT_DIR = "{workdir}/data/snapshots"
+SQL_CACHE_PATH = "{workdir}/data/sql_cache.json"
+TRACE_EXPORTER = "none"
+"""
+
+WORKDIR = tempfile.mkdtemp(prefix="zabbix-tests-")
+os.makedirs(os.path.join(WORKDIR, ".streamlit"))
+os.makedirs(os.path.join(WORKDIR, "data", "snapshots"))
+with open(os.path.join(WORKDIR, ".streamlit", "secrets.toml"), "w") as f:
+    f.write(SECRETS.format(workdir=WORKDIR))
+os.chdir(WORKDIR)
+
+# Streamlit warns about the missing script run context on every st.* call outside `streamlit run`
+for name in ("streamlit", "streamlit.runtime"):
+    logging.getLogger(name).setLevel(logging.ERROR)
+
+# Small typed zabbix_problems frame (the benchmark generator, seeded)
+@pytest.fixture
+def problems():
+    from benchmarks.generate import generate_problems
+    from schema import to_typed_frame
+    return to_typed_frame(generate_problems(500, seed=7, days=3))
+
+# Snapshot of the problems frame
+@pytest.fixture
+def snapshot_id(problems):
+    from snapshots import write_snapshot
+    return write_snapshot(problems, "SELECT * FROM zabbix_problems")
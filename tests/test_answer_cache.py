@@ -0,0 +1,36 @@
+import pytest
+from answer_cache import analyse_snippet
+
+@pytest.mark.parametrize("code", [
+    "print(df['severity_name'].value_counts())",
+    "counts = df.groupby('hostname').size()\nprint(counts.sort_values().tail(5))",
+    "print(df.drop(columns=['status']).shape)",
+    "print(df.fillna(0, inplace=False).shape)",
+    "import pandas as pd\nprint(pd.to_datetime(df['problem_time']).dt.hour.max())",
+    "hosts = [h for h in df['hostname'].unique()]\nprint(sorted(hosts)[:3])"
+])
+def test_self_contained_snippets(code):
+    assert analyse_snippet(code).self_contained
+
+@pytest.mark.parametrize("code", [
+    "print(df.pop('status').value_counts())",
+    "df.insert(0, 'hour', df['problem_time'].dt.hour)",
+    "df.drop(columns=['status'], inplace=True)",
+    "df.fillna(0, inplace=flag)",
+    "hosts = []\nhosts.append(df['hostname'].iloc[0])",
+    "df.columns = [c.upper() for c in df.columns]",
+    "df['hour'] = df['problem_time'].dt.hour",
+    "setattr(df, 'flags', {})",
+    "print(counts.head())",
+    "df = df[df['status'] == 'Active']",
+    "del df",
+    "from numpy import linalg as pd",
+    "print(df.sample(5))"
+])
+def test_snippets_that_are_not_cacheable(code):
+    assert not analyse_snippet(code).self_contained
+
+def test_bindings_and_free_names():
+    snippet = analyse_snippet("top = df['hostname'].value_counts().head(limit)\nprint(top)")
+    assert snippet.bound == {"top"}
+    assert snippet.free == {"limit"}
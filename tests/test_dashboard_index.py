@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+from dashboard import prepare_data
+from dashboard_index import SnapshotIndex, parse_filter_query, combine_masks
+
+@pytest.fixture
+def index(problems):
+    return SnapshotIndex(prepare_data(problems))
+
+def test_parse_filter_query():
+    assert parse_filter_query('{hostname} contains "db && web" && {severity_name} = High') == [
+        ("hostname", "contains", "db && web"),
+        ("severity_name", "eq", "High")
+    ]
+    assert parse_filter_query("{full_problem_description} icontains 'disk \\'sda\\' full'") == [
+        ("full_problem_description", "contains", "disk 'sda' full")
+    ]
+    assert parse_filter_query("{duration} >= 60 && {status} ne Resolved && {problem_time} datestartswith 2024-05") == [
+        ("duration", "ge", "60"), ("status", "ne", "Resolved"), ("problem_time", "datestartswith", "2024-05")
+    ]
+    assert parse_filter_query('{hostname} contains "le = 5"') == [("hostname", "contains", "le = 5")]
+    assert parse_filter_query("{hostname} is blank && {status} = Active") == [("status", "eq", "Active")]
+    assert parse_filter_query(None) == []
+
+def test_filtering_matches_pandas(index, problems):
+    df = index.df
+    host = df["hostname"].iloc[0]
+    mask = combine_masks(
+        index.select({"hostname": [host], "status": ["Active"], "severity_name": []}),
+        index.filter_mask(parse_filter_query('{duration} > 60 && {full_problem_description} contains "a"'))
+    )
+    expected = (
+        (df["hostname"] == host) & (df["status"] == "Active") & (df["duration"] > 60)
+        & df["full_problem_description"].astype(str).str.contains("a", case=False, regex=False)
+    ).to_numpy()
+
+    np.testing.assert_array_equal(mask, expected)
+    assert index.count(mask) == expected.sum()
+    assert index.count(None) == len(problems)
+
+def test_paging_walks_the_order(index):
+    mask = (index.df["status"] == "Active").to_numpy()
+    expected = [i for i in index.time_order if mask[i]]
+
+    pages = [index.page(index.time_order, mask, offset, 7, chunk=16) for offset in range(0, len(expected), 7)]
+    paged = pd.concat(pages)
+
+    pd.testing.assert_frame_equal(paged, index.df.iloc[expected])
+    assert index.page(index.time_order, mask, len(expected), 7).empty
+    pd.testing.assert_frame_equal(index.page(index.time_order, None, 10, 5), index.df.iloc[index.time_order[10:15]])
+
+def test_dashboard_paths_name_their_snapshot(snapshot_id):
+    from dashboard import snapshot_from_path, snapshot_notice, dashboard_url, DASH_PREFIX
+
+    assert snapshot_from_path(f"{DASH_PREFIX}{snapshot_id}") == snapshot_id
+    assert dashboard_url(snapshot_id, url="").endswith(f"{DASH_PREFIX}{snapshot_id}")
+
+    # A bare path never falls back to whichever snapshot was fetched last
+    for path in (DASH_PREFIX, "/", None, f"{DASH_PREFIX}../etc"):
+        assert snapshot_from_path(path) is None
+        assert snapshot_notice(path).startswith("No snapshot selected")
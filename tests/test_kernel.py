@@ -0,0 +1,30 @@
+import pytest
+from kernel import NoSnapshotError, get_kernel, kernel_session, reset_kernel, run_code
+
+def test_session_without_data_is_not_given_another_snapshot(snapshot_id):
+    with kernel_session("no-data"):
+        assert run_code("print(len(df))").startswith("Execution failed: no data is loaded")
+        with pytest.raises(NoSnapshotError):
+            get_kernel()
+
+    with kernel_session("with-data", snapshot_id):
+        assert run_code("print(len(df))").strip() == "500"
+
+def test_session_that_rebinds_df_bypasses_the_output_cache(snapshot_id, problems):
+    active = int((problems["status"] == "Active").sum())
+
+    with kernel_session("reader", snapshot_id):
+        assert run_code("print(len(df))").strip() == "500"
+
+    with kernel_session("filterer", snapshot_id):
+        run_code("df = df[df['status'] == 'Active']")
+        assert run_code("print(len(df))").strip() == str(active)
+
+    # The filtered session's output was not cached for everyone else
+    with kernel_session("reader", snapshot_id):
+        assert run_code("print(len(df))").strip() == "500"
+
+    # A reset (new data) gives the session a pristine namespace again
+    reset_kernel("filterer")
+    with kernel_session("filterer", snapshot_id):
+        assert run_code("print(len(df))").strip() == "500"
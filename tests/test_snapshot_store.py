@@ -0,0 +1,112 @@
+import os
+import time
+import pytest
+import pandas as pd
+import pandas.testing as pdt
+from concurrent.futures import ThreadPoolExecutor
+from snapshot_store import SnapshotStore, get_snapshot_store
+from snapshots import write_snapshot, snapshot_path
+from kernel import AnalysisKernel
+from config import SNAPSHOT_KEEP
+
+def test_kernel_mutations_stay_private(snapshot_id):
+    store = get_snapshot_store()
+    original = store.frame(snapshot_id)
+    first, second = AnalysisKernel(snapshot_id), AnalysisKernel(snapshot_id)
+
+    output = first.run(
+        "df.drop(index=df.index[0], inplace=True)\n"
+        "df['hour'] = df['problem_time'].dt.hour\n"
+        "df.loc[df.index[0], 'duration'] = -1\n"
+        "print(len(df))"
+    )
+
+    assert output.strip() == str(len(original) - 1)
+    pdt.assert_frame_equal(store.frame(snapshot_id), original)
+    pdt.assert_frame_equal(second.namespace["df"], original)
+    assert "hour" not in second.run("print(list(df.columns))")
+
+@pytest.mark.filterwarnings("ignore")
+def test_store_leaves_pandas_options_alone(snapshot_id):
+    get_snapshot_store().frame(snapshot_id)
+    assert pd.get_option("mode.copy_on_write") is False
+
+    # Generated code relying on chained assignment still writes through within its own kernel
+    kernel = AnalysisKernel(snapshot_id)
+    output = kernel.run("first = df.index[0]\ndf['duration'][first] = -1\nprint(df.loc[first, 'duration'])")
+    assert output.strip() == "-1"
+    assert get_snapshot_store().frame(snapshot_id)["duration"].iloc[0] != -1
+
+def loaded(store, snapshot_id):
+    entry = store.entries.get(snapshot_id)
+    return entry is not None and entry.frame is not None
+
+def test_eviction_keeps_frames_sessions_use(problems):
+    first, second, third = (write_snapshot(problems, f"SELECT * FROM zabbix_problems LIMIT {n}") for n in range(3))
+    nbytes = int(problems.memory_usage(deep=True).sum())
+    store = SnapshotStore(memory_budget=int(2.5 * nbytes))
+
+    store.acquire("session", first)
+    store.frame(first)
+    store.frame(second)
+    store.frame(third)
+
+    # Over budget: the frame nobody uses goes, and its entry with it since no query points at it
+    assert loaded(store, first) and loaded(store, third)
+    assert second not in store.entries
+    assert store.stats()["loaded"] == 2
+
+    # Evicted frames are read back from their snapshot on the next use
+    pdt.assert_frame_equal(store.frame(second), store.frame(first))
+
+def test_frame_being_loaded_is_kept_over_frames_in_use(problems):
+    first, second = (write_snapshot(problems, f"SELECT * FROM zabbix_problems LIMIT {n}") for n in range(2))
+    store = SnapshotStore(memory_budget=int(1.5 * problems.memory_usage(deep=True).sum()))
+
+    store.acquire("a", first)
+    store.frame(first)
+    store.acquire("b", second)
+    store.frame(second)
+
+    assert loaded(store, second) and not loaded(store, first)
+    assert first in store.entries
+
+def test_acquired_snapshots_are_pinned_until_released(problems):
+    store = SnapshotStore()
+    pinned = write_snapshot(problems, "SELECT * FROM zabbix_problems WHERE 1")
+    store.acquire("session", pinned)
+
+    for n in range(SNAPSHOT_KEEP + 1):
+        write_snapshot(problems, f"SELECT * FROM zabbix_problems LIMIT {n}")
+    assert os.path.exists(snapshot_path(pinned))
+
+    store.release("session")
+    write_snapshot(problems, "SELECT * FROM zabbix_problems")
+    assert not os.path.exists(snapshot_path(pinned))
+
+def test_idle_sessions_release_their_snapshot(problems):
+    store = SnapshotStore(session_timeout=0)
+    snapshot_id = write_snapshot(problems, "SELECT * FROM zabbix_problems WHERE 1")
+    store.acquire("idle", snapshot_id)
+    time.sleep(0.01)
+
+    store.acquire("other", write_snapshot(problems, "SELECT * FROM zabbix_problems WHERE 2"))
+    assert "idle" not in store.sessions
+    assert not store.entries[snapshot_id].sessions
+
+def test_concurrent_fetches_of_one_query_share_a_snapshot(problems):
+    store = SnapshotStore()
+    query = "SELECT * FROM zabbix_problems WHERE hostname = 'web01'"
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.1)
+        return write_snapshot(problems, query), False
+
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(lambda _: store.get_or_fetch(query, 42, fetch), range(4)))
+
+    assert len(calls) == 1
+    assert len({snapshot_id for snapshot_id, _, _ in results}) == 1
+    assert sorted(reused for _, _, reused in results) == [False, True, True, True]
@@ -0,0 +1,47 @@
+import datetime
+from sql_cache import SQLCache, to_template, render_template
+
+GENERATED_AT = datetime.datetime(2025, 3, 10, 12, 0, 0)
+LATER = datetime.datetime(2025, 3, 12, 8, 30, 0)
+
+def cache(tmp_path):
+    return SQLCache(path=str(tmp_path / "sql_cache.json"))
+
+def test_relative_request_is_replayed_against_the_current_time(tmp_path):
+    sql = "SELECT * FROM zabbix_problems WHERE problem_time >= '2025-03-10 09:00:00' AND problem_time < '2025-03-10'"
+    store = cache(tmp_path)
+    store.store("errors in the last 3 hours", sql, generated_at=GENERATED_AT)
+
+    template = next(iter(store.entries.values()))["sql"]
+    assert template == to_template(sql, GENERATED_AT)
+    assert render_template(template, now=LATER) == (
+        "SELECT * FROM zabbix_problems WHERE problem_time >= '2025-03-12 05:30:00' AND problem_time < '2025-03-12'"
+    )
+
+def test_typed_dates_stay_literal(tmp_path):
+    sql = "SELECT * FROM zabbix_problems WHERE problem_time >= '2025-01-01'"
+    store = cache(tmp_path)
+
+    for request in ("logs since 2025-01-01", "logs since yesterday and 2025-01-01", "errors after March 5"):
+        store.store(request, sql, generated_at=GENERATED_AT)
+        assert store.lookup(request) == sql
+
+def test_words_near_time_are_not_relative(tmp_path):
+    sql = "SELECT * FROM zabbix_problems WHERE problem_time >= '2025-01-01'"
+    store = cache(tmp_path)
+
+    for request in ("current errors on web01", "show this host's problems", "logs since the outage"):
+        store.store(request, sql, generated_at=GENERATED_AT)
+        assert store.lookup(request) == sql
+
+def test_cache_hit_closes_the_event_stream():
+    from sql_cache import get_sql_cache
+    from agents.query_generator import generate_sql_query
+
+    sql = "SELECT * FROM zabbix_problems WHERE lower(hostname) = 'web01'"
+    get_sql_cache().store("problems on web01", sql)
+    events = []
+
+    response, _ = generate_sql_query("problems on web01", agent=None, on_event=events.append)
+    assert response["output"] == sql
+    assert events == [{"type": "cached", "text": sql}]
@@ -0,0 +1,16 @@
+from watcher import DataWatcher
+
+QUERY = "SELECT * FROM zabbix_problems WHERE hostname = 'web01'"
+
+def test_newer_subscription_moves_existing_subscribers():
+    watcher = DataWatcher(interval=3600)
+    watcher.subscribe("a", QUERY, 100, "older")
+    watcher.subscribe("b", QUERY, 200, "newer")
+
+    assert watcher.poll("a") == [{"type": "snapshot", "watermark": 200, "snapshot_id": "newer"}]
+    assert watcher.poll("b") == []
+
+    # A session subscribing with older data is moved forward instead of moving anyone back
+    watcher.subscribe("c", QUERY, 100, "older")
+    assert watcher.poll("c") == [{"type": "snapshot", "watermark": 200, "snapshot_id": "newer"}]
+    assert watcher.poll("a") == [] and watcher.poll("b") == []
@@ -0,0 +1,37 @@
+import pytest
+from worker_pool import WorkerPool
+
+@pytest.fixture
+def pool():
+    pool = WorkerPool(size=1, timeout=60, cpu_limit=0, memory_limit_mb=0, max_sessions=2)
+    yield pool
+    pool.close()
+
+def test_reset_drops_session_variables(pool, snapshot_id):
+    pool.run("a", snapshot_id, "x = len(df)")
+    pool.run("b", snapshot_id, "x = 'kept'")
+    assert pool.run("a", snapshot_id, "print(x)").strip() == "500"
+
+    pool.reset("a")
+
+    assert "name 'x' is not defined" in pool.run("a", snapshot_id, "print(x)")
+    assert pool.run("b", snapshot_id, "print(x)").strip() == "kept"
+
+def test_least_recently_used_kernels_are_evicted(pool, snapshot_id):
+    for session_id in ("a", "b", "c"):
+        pool.run(session_id, snapshot_id, f"x = '{session_id}'")
+
+    assert "name 'x' is not defined" in pool.run("a", snapshot_id, "print(x)")
+    assert pool.run("c", snapshot_id, "print(x)").strip() == "c"
+
+def test_restart_is_reported_to_every_session_on_the_worker(pool, snapshot_id):
+    pool.run("bystander", snapshot_id, "x = 1")
+    pool.run("culprit", snapshot_id, "y = 1")
+
+    pool.timeout = 1
+    assert "timed out" in pool.run("culprit", snapshot_id, "while True: pass")
+    pool.timeout = 60
+
+    assert "executor process was restarted" in pool.run("bystander", snapshot_id, "print(x)")
+    assert "name 'x' is not defined" in pool.run("bystander", snapshot_id, "print(x)")
+    assert "name 'y' is not defined" in pool.run("culprit", snapshot_id, "print(y)")
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+# Trend bucket sizes, finest first, and the point budget a chart may send to the browser;
+# buckets may overshoot the budget by OVERSAMPLE, LTTB then keeps the points that shape the line
+BUCKETS = [("1min", "Minute"), ("5min", "5 Minutes"), ("1h", "Hour"), ("1D", "Day")]
+POINT_BUDGET = 1000
+OVERSAMPLE = 4
+
+# Finest bucket giving at most `max_points` buckets over the span (the coarsest one otherwise)
+def choose_bucket(start, end, max_points=POINT_BUDGET * OVERSAMPLE):
+    span = pd.Timestamp(end) - pd.Timestamp(start)
+    for freq, label in BUCKETS:
+        if span / pd.Timedelta(freq) <= max_points:
+            return freq, label
+    return BUCKETS[-1]
+
+# Largest-Triangle-Three-Buckets: keep `threshold` points that preserve the visual shape of the series
+def lttb(x, y, threshold):
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # First and last points are always kept; the rest is split into threshold - 2 buckets
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        next_x, next_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+
+        # Point forming the largest triangle with the previously kept point and the next bucket's average
+        area = np.abs((x[previous] - next_x) * (y[start:end] - y[previous]) - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = selected[i + 1] = start + int(np.argmax(area))
+
+    return selected
+
+# Per-minute counts re-bucketed for the visible range and downsampled to the point budget
+def trend_series(trend, start=None, end=None, budget=POINT_BUDGET):
+    counts = trend.set_index("minute")["count"].sort_index()
+    if start is not None or end is not None:
+        counts = counts.loc[start:end]
+    if counts.empty:
+        return pd.DataFrame({"minute": pd.Series(dtype="datetime64[ns]"), "count": pd.Series(dtype="int64")}), BUCKETS[0][1]
+
+    freq, label = choose_bucket(counts.index[0], counts.index[-1], budget * OVERSAMPLE)
+    counts = counts.resample(freq).sum()
+
+    keep = lttb(counts.index.asi8.astype("float64"), counts.to_numpy(dtype="float64"), budget)
+    counts = counts.iloc[keep]
+    return counts.rename_axis("minute").reset_index(name="count"), label
@@ -1,30 +1,78 @@
+import time
 from typing import Type
-import clickhouse_connect
 from pydantic import BaseModel
 from langchain.tools import BaseTool
-from config import DB_HOST, DB_USER, DB_PASSWORD, DB_NAME
+from db import get_pool, as_subquery
+from config import VALIDATION_TIMEOUT, VALIDATION_MAX_ROWS_TO_READ, VALIDATION_SAMPLE_ROWS
 
 # Input Query Schema
 class QueryInput(BaseModel):
     query: str
 
+# Check syntax and output columns without executing the query
+def describe_query(query):
+    result = get_pool().query(f"DESCRIBE ({as_subquery(query)})", timeout=VALIDATION_TIMEOUT)
+    return [(row[0], row[1]) for row in result.result_rows]
+
+# Row count of the query with a capped scan; returns (count, exact, rows scanned). The count is a lower bound
+# when the scan hit the row cap or ran into the timeout, since both overflow modes break instead of failing
+def estimate_rows(query):
+    started = time.monotonic()
+    result = get_pool().query(
+        f"SELECT count() FROM ({as_subquery(query)})",
+        timeout=VALIDATION_TIMEOUT,
+        settings={
+            "max_rows_to_read": VALIDATION_MAX_ROWS_TO_READ,
+            "read_overflow_mode": "break",
+            "timeout_overflow_mode": "break"
+        }
+    )
+    summary = result.summary or {}
+    read_rows = int(summary.get("read_rows", 0))
+    elapsed = int(summary["elapsed_ns"]) / 1e9 if summary.get("elapsed_ns") else time.monotonic() - started
+    exact = read_rows < VALIDATION_MAX_ROWS_TO_READ and elapsed < VALIDATION_TIMEOUT
+    return result.result_rows[0][0], exact, read_rows
+
+# First few rows of the query, for the agent to sanity-check values
+def sample_rows(query, limit=VALIDATION_SAMPLE_ROWS):
+    return get_pool().query_df(f"SELECT * FROM ({as_subquery(query)}) LIMIT {int(limit)}", timeout=VALIDATION_TIMEOUT)
+
 # Tool to validate queries and return Clickhouse compatible SQL
 class ClickHouseQueryTool(BaseTool):
     name: str = "clickhouse_query_tool"
-    description: str = "Use this to run SQL queries against the system error logs database."
+    description: str = "Use this to validate SQL queries against the system error logs database. Returns the output columns, the number of matching rows and a few sample rows."
     args_schema: Type[BaseModel] = QueryInput
+    mode: str = "validate"
+    sample_size: int = VALIDATION_SAMPLE_ROWS
 
     def _run(self, query: str) -> str:
 
-        client = clickhouse_connect.get_client(
-            host=DB_HOST,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            database=DB_NAME
-        )
+        if self.mode != "validate":
+            return self._execute(query)
+
+        try:
+            columns = describe_query(query)
+            count, exact, read_rows = estimate_rows(query)
+
+            if count == 0:
+                return "No results." if exact else f"No rows in the first {read_rows} scanned rows (scan capped)"
+
+            lines = [
+                "Columns: " + ", ".join(f"{name} ({col_type})" for name, col_type in columns),
+                f"Data found: {count} rows" if exact else f"Data found: at least {count} rows (scan capped)"
+            ]
+            if self.sample_size:
+                lines.append("Sample:\n" + sample_rows(query, self.sample_size).to_string(index=False))
+            return "\n".join(lines)
+
+        except Exception as e:
+            return f"Query failed: {str(e)}"
+
+    # Full execution, materialising the result (legacy behaviour)
+    def _execute(self, query: str) -> str:
 
         try:
-            result = client.query_df(query)
+            result = get_pool().query_df(query)
             
             if result.empty:
                 return "No results."
@@ -0,0 +1,310 @@
+import os
+import json
+import time
+import uuid
+import queue
+import atexit
+import logging
+import functools
+import threading
+import contextlib
+import contextvars
+import pandas as pd
+import plotly.express as px
+from collections import OrderedDict, deque
+from logging.handlers import QueueListener, RotatingFileHandler
+from config import TRACE_ENABLED, TRACE_EXPORTER, TRACE_PATH, TRACE_OTLP_ENDPOINT, TRACE_SERVICE_NAME, TRACE_KEEP
+from config import TRACE_MAX_BYTES, TRACE_BACKUPS, TRACE_MAX_SESSIONS
+
+logger = logging.getLogger(__name__)
+
+# Finished spans waiting for the JSONL writer; spans beyond this are dropped rather than slowing traced code
+JSONL_QUEUE_SIZE = 10_000
+
+# Span the current code runs under; copied into report section threads with the rest of the context
+_current = contextvars.ContextVar("trace_span", default=None)
+
+# Resident set size of this process in bytes (Linux only; None elsewhere)
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+# One timed stage, agent step, tool call, query or LLM call; children share the root's trace id
+class Span:
+
+    def __init__(self, name, kind, parent=None, attributes=None):
+        self.name = name
+        self.kind = kind
+        self.parent = parent
+        self.root = parent.root if parent else self
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.attributes = dict(attributes or {})
+        self.error = None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.rss_start = _rss_bytes()
+        self.rss_end = None
+
+        # Spans of the whole trace, collected on the root for the waterfall
+        if parent is None:
+            self.spans = []
+            self.lock = threading.Lock()
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+        return self
+
+    @property
+    def duration_ms(self):
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    # Change in process RSS while the span was open (includes concurrent work in other threads)
+    @property
+    def memory_delta(self):
+        if self.rss_start is None or self.rss_end is None:
+            return None
+        return self.rss_end - self.rss_start
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent else None,
+            "name": self.name,
+            "kind": self.kind,
+            "start": self.start_ns / 1e9,
+            "duration_ms": self.duration_ms,
+            "memory_delta": self.memory_delta,
+            "error": self.error,
+            "attributes": self.attributes
+        }
+
+# Appends finished spans to a local JSONL file, one object per line, from a background thread; the file is
+# rotated at `max_bytes`, keeping `backups` older files
+class JSONLExporter:
+
+    def __init__(self, path=TRACE_PATH, max_bytes=TRACE_MAX_BYTES, backups=TRACE_BACKUPS):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, delay=True)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+
+        self.path = path
+        self.dropped = 0
+        self.closed = False
+        self.lock = threading.Lock()
+        self.queue = queue.Queue(maxsize=JSONL_QUEUE_SIZE)
+        self.listener = QueueListener(self.queue, handler)
+        self.listener.start()
+        atexit.register(self.close)
+
+    def start(self, span):
+        pass
+
+    def end(self, span):
+        line = json.dumps(span.to_dict(), default=str)
+        try:
+            self.queue.put_nowait(logging.makeLogRecord({"msg": line}))
+        except queue.Full:
+            self.dropped += 1
+
+    # Write out queued spans and close the file
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+        self.listener.stop()
+        for handler in self.listener.handlers:
+            handler.close()
+
+# Mirrors spans to an OpenTelemetry collector over OTLP/HTTP (needs opentelemetry-sdk and
+# opentelemetry-exporter-otlp-proto-http)
+class OTelExporter:
+
+    def __init__(self, endpoint=TRACE_OTLP_ENDPOINT, service_name=TRACE_SERVICE_NAME):
+        from opentelemetry import trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.trace import Status, StatusCode
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=endpoint)))
+        self.tracer = provider.get_tracer(__name__)
+        self.trace = trace
+        self.error_status = lambda text: Status(StatusCode.ERROR, text)
+        self.open = {}
+        self.lock = threading.Lock()
+
+    def start(self, span):
+        with self.lock:
+            parent = self.open.get(span.parent.span_id) if span.parent else None
+        context = self.trace.set_span_in_context(parent) if parent else None
+        otel_span = self.tracer.start_span(span.name, context=context, start_time=span.start_ns)
+        with self.lock:
+            self.open[span.span_id] = otel_span
+
+    def end(self, span):
+        with self.lock:
+            otel_span = self.open.pop(span.span_id, None)
+        if otel_span is None:
+            return
+
+        attributes = {k: v for k, v in span.attributes.items() if isinstance(v, (str, bool, int, float))}
+        attributes.update({"span.kind": span.kind, "duration_ms": span.duration_ms})
+        if span.memory_delta is not None:
+            attributes["memory_delta"] = span.memory_delta
+        otel_span.set_attributes(attributes)
+        if span.error:
+            otel_span.set_status(self.error_status(span.error))
+        otel_span.end(end_time=span.end_ns)
+
+# Configured exporter; a missing OpenTelemetry install falls back to the JSONL file
+def _create_exporter():
+    if not TRACE_ENABLED or TRACE_EXPORTER == "none":
+        return None
+    if TRACE_EXPORTER == "otlp":
+        try:
+            return OTelExporter()
+        except ImportError as e:
+            logger.warning("OpenTelemetry export unavailable (%s), writing spans to %s", e, TRACE_PATH)
+    return JSONLExporter()
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+def get_exporter():
+    global _exporter
+
+    with _exporter_lock:
+        if _exporter is None:
+            _exporter = _create_exporter() or False
+        return _exporter or None
+
+# Exporting must never break the traced code
+def _export(method, span):
+    exporter = get_exporter()
+    if exporter is None:
+        return
+    try:
+        getattr(exporter, method)(span)
+    except Exception as e:
+        logger.warning("Span export failed: %s", e)
+
+# Finished traces per session (newest last), for the debug panel
+_traces = OrderedDict()
+_traces_lock = threading.Lock()
+
+def current_span():
+    return _current.get()
+
+# Make a span current outside a with-block (callback handlers open and close spans in separate calls)
+def activate(span):
+    return _current.set(span)
+
+def deactivate(token, previous=None):
+    try:
+        _current.reset(token)
+    except ValueError:
+        _current.set(previous)
+
+# Open a span under `parent` (the current span by default) without making it current
+def start_span(name, kind="stage", parent=None, **attributes):
+    span = Span(name, kind, parent or _current.get(), attributes)
+    _export("start", span)
+    return span
+
+# Close a span; a finished root span publishes its whole trace for its session
+def end_span(span, error=None):
+    if span.end_ns is not None:
+        return
+
+    span.end_ns = time.time_ns()
+    span.rss_end = _rss_bytes()
+    span.error = str(error) if error is not None else span.error
+    _export("end", span)
+
+    with span.root.lock:
+        span.root.spans.append(span)
+    if span is span.root and TRACE_ENABLED:
+        with _traces_lock:
+            traces = _traces.setdefault(span.attributes.get("session_id"), deque(maxlen=TRACE_KEEP))
+            traces.append(span)
+            _traces.move_to_end(span.attributes.get("session_id"))
+            while len(_traces) > TRACE_MAX_SESSIONS:
+                _traces.popitem(last=False)
+
+# Run a block as the current span; exceptions mark it failed (Streamlit's rerun/stop signals are not Exceptions)
+@contextlib.contextmanager
+def span(name, kind="stage", **attributes):
+    current = start_span(name, kind, **attributes)
+    token = _current.set(current)
+    error = None
+    try:
+        yield current
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        _current.reset(token)
+        end_span(current, error)
+
+# Decorator form of span()
+def traced(name, kind="stage"):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name, kind):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# Recently finished traces of a session, newest first
+def recent_traces(session_id):
+    with _traces_lock:
+        return list(reversed(_traces.get(session_id, ())))
+
+# Spans of a trace depth-first (children in start order under their parent), with their depth below the root
+def trace_rows(root):
+    with root.lock:
+        spans = list(root.spans)
+
+    children = {}
+    for s in sorted(spans, key=lambda s: s.start_ns):
+        children.setdefault(s.parent.span_id if s.parent else None, []).append(s)
+
+    # Spans whose parent never finished hang off the root level
+    ids = {s.span_id for s in spans}
+    stack = [(s, 0) for s in reversed([s for parent, group in children.items() if parent is None or parent not in ids for s in group])]
+    rows = []
+    while stack:
+        s, depth = stack.pop()
+        stack.extend((child, depth + 1) for child in reversed(children.get(s.span_id, [])))
+
+        attributes = s.attributes
+        rows.append({
+            "span": f"{len(rows) + 1:>3} " + "· " * depth + s.name,
+            "kind": s.kind,
+            "start_ms": (s.start_ns - root.start_ns) / 1e6,
+            "duration_ms": s.duration_ms,
+            "rows": attributes.get("rows"),
+            "bytes": attributes.get("bytes"),
+            "tokens": (attributes.get("input_tokens") or 0) + (attributes.get("output_tokens") or 0) or None,
+            "memory_delta_mb": s.memory_delta / 2**20 if s.memory_delta is not None else None,
+            "error": s.error
+        })
+    return pd.DataFrame(rows)
+
+# Timing waterfall of a trace: one bar per span, offset from the start of the run
+def waterfall_figure(rows):
+    fig = px.bar(rows, x="duration_ms", y="span", base="start_ms", color="kind", orientation="h",
+                 hover_data=["rows", "bytes", "tokens", "memory_delta_mb", "error"])
+    fig.update_yaxes(autorange="reversed", categoryorder="array", categoryarray=list(rows["span"]), title=None)
+    fig.update_xaxes(title="ms since start of run")
+    fig.update_layout(height=max(200, 22 * len(rows) + 80), margin=dict(l=0, r=0, t=10, b=0), legend_title_text=None)
+    return fig
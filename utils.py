@@ -1,28 +1,79 @@
+import io
 import re
+import sys
+import threading
+import contextlib
 import streamlit as st
-import clickhouse_connect
-from config import DB_HOST, DB_USER, DB_PASSWORD, DB_NAME
+from db import get_pool
+from snapshots import stream_snapshot
+from tracing import traced
+from config import FETCH_BLOCK_ROWS, FETCH_MAX_ROWS, FETCH_MAX_BYTES
 
 # Fetch Data using Clickhouse
+@traced("fetch", "stage")
 def fetch_csv_from_db(query):
     try:
-        client = clickhouse_connect.get_client(host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=DB_NAME)
-        return client.query_df(query)
+        return get_pool().query_df(query)
     
     except Exception as e:
         st.error(f"❌ Query execution failed: {str(e)}")
         return None
 
-# Cleanup function to reset Session States
+# Stream the query result block by block into a new snapshot, holding at most one block in memory;
+# returns (snapshot id or None if empty, rows fetched, truncated at the ceiling). Query errors propagate
+# to the caller, which reports them
+@traced("fetch", "stage")
+def fetch_to_snapshot(query, on_progress=None, max_rows=FETCH_MAX_ROWS, max_bytes=FETCH_MAX_BYTES):
+    settings = {"max_block_size": FETCH_BLOCK_ROWS}
+
+    # Let the server stop producing rows soon after the ceiling instead of streaming the rest
+    if max_rows:
+        settings.update({"max_result_rows": max_rows, "result_overflow_mode": "break"})
+
+    with get_pool().query_df_stream(query, settings=settings) as blocks:
+        return stream_snapshot(blocks, query, max_rows, max_bytes, on_progress)
+
+# Cleanup function to reset Session States (the dashboard server is shared, so only this session's link goes)
 def cleanup():
-    if "dashboard_process" in st.session_state:
-        st.session_state.dashboard_process.terminate()
+    if st.session_state.get("dashboard_generated"):
         st.session_state.dashboard_generated = False
-        del st.session_state["dashboard_process"]
-        st.sidebar.success("🛑 Dashboard Stopped Successfully!")
-        st.rerun()
+        st.sidebar.success("🛑 Dashboard Closed Successfully!")
 
 # Clean Agent Thought Process
 def strip_ansi_codes(text):
     ansi_escape = re.compile(r'\x1B[@-_][0-?]*[ -/]*[@-~]')
-    return ansi_escape.sub('', text)
\ No newline at end of file
+    return ansi_escape.sub('', text)
+
+# sys.stdout stand-in that routes writes to a per-thread buffer while output is being captured
+class ThreadLocalStdout:
+
+    def __init__(self, default):
+        self.default = default
+        self.local = threading.local()
+
+    def target(self):
+        buffer = getattr(self.local, "buffer", None)
+        return self.default if buffer is None else buffer
+
+    def write(self, text):
+        return self.target().write(text)
+
+    def flush(self):
+        return self.target().flush()
+
+    def __getattr__(self, name):
+        return getattr(self.default, name)
+
+# Capture output of the current thread only (nestable), so concurrent sessions don't see each other's prints
+@contextlib.contextmanager
+def capture_stdout():
+    if not isinstance(sys.stdout, ThreadLocalStdout):
+        sys.stdout = ThreadLocalStdout(sys.stdout)
+
+    stdout = sys.stdout
+    previous = getattr(stdout.local, "buffer", None)
+    stdout.local.buffer = buffer = io.StringIO()
+    try:
+        yield buffer
+    finally:
+        stdout.local.buffer = previous
\ No newline at end of file
@@ -0,0 +1,173 @@
+import time
+import threading
+from collections import deque
+from db import query_fingerprint
+from refresh import probe_watermark, probe_row_count, refresh_incremental
+from snapshots import write_snapshot
+from snapshot_store import get_snapshot_store
+from config import WATCH_INTERVAL, WATCH_IDLE_TIMEOUT
+
+# A query watched on behalf of every session viewing it, with the snapshot of its newest merged data (the
+# frame itself stays in the shared store)
+class WatchedQuery:
+
+    def __init__(self, query, watermark, snapshot_id):
+        self.query = query
+        self.watermark = watermark
+        self.snapshot_id = snapshot_id
+        self.row_count = None
+        self.subscribers = {}
+
+# One background thread probing the source table for every watched query; each change is fetched once
+# per distinct query and fanned out to the subscribed sessions as events
+class DataWatcher:
+
+    def __init__(self, interval=WATCH_INTERVAL, idle_timeout=WATCH_IDLE_TIMEOUT):
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        self.lock = threading.Lock()
+        self.queries = {}
+        self.sessions = {}
+        self.thread = None
+
+    # Watch a session's query, sharing the watcher (and its snapshot) with other sessions on the same query;
+    # whichever side holds older data is moved onto the newer snapshot
+    def subscribe(self, session_id, query, watermark, snapshot_id):
+        fingerprint = query_fingerprint(query)
+
+        with self.lock:
+            self._unsubscribe(session_id)
+
+            watched = self.queries.get(fingerprint)
+            if watched is None or (watermark is not None and (watched.watermark is None or watermark > watched.watermark)):
+                subscribers = watched.subscribers if watched else {}
+                watched = self.queries[fingerprint] = WatchedQuery(query, watermark, snapshot_id)
+                watched.subscribers = subscribers
+
+                for subscriber in subscribers.values():
+                    subscriber["events"].append(self._moved(watched))
+
+            newer = watermark is not None and watched.watermark is not None and watched.watermark > watermark
+            events = deque([self._moved(watched)] if newer else [])
+            watched.subscribers[session_id] = {"events": events, "last_seen": time.monotonic()}
+            self.sessions[session_id] = fingerprint
+
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="data-watcher", daemon=True)
+                self.thread.start()
+
+        return fingerprint
+
+    def _moved(self, watched):
+        return {"type": "snapshot", "watermark": watched.watermark, "snapshot_id": watched.snapshot_id}
+
+    def unsubscribe(self, session_id):
+        with self.lock:
+            self._unsubscribe(session_id)
+
+    def _unsubscribe(self, session_id):
+        fingerprint = self.sessions.pop(session_id, None)
+        watched = self.queries.get(fingerprint)
+        if watched is not None:
+            watched.subscribers.pop(session_id, None)
+            if not watched.subscribers:
+                del self.queries[fingerprint]
+
+    # Events queued for a session since its last poll, or None when it isn't subscribed (any more)
+    def poll(self, session_id):
+        with self.lock:
+            watched = self.queries.get(self.sessions.get(session_id))
+            if watched is None:
+                return None
+
+            subscriber = watched.subscribers[session_id]
+            subscriber["last_seen"] = time.monotonic()
+            events = list(subscriber["events"])
+            subscriber["events"].clear()
+            return events
+
+    def _publish(self, watched, event):
+        with self.lock:
+            for subscriber in watched.subscribers.values():
+                subscriber["events"].append(event)
+
+    # Sessions that stopped polling (closed tabs) are dropped, and queries nobody watches with them
+    def _expire(self):
+        now = time.monotonic()
+        with self.lock:
+            for session_id, fingerprint in list(self.sessions.items()):
+                if now - self.queries[fingerprint].subscribers[session_id]["last_seen"] > self.idle_timeout:
+                    self._unsubscribe(session_id)
+
+    # One probe of the source table, then a delta fetch only for queries whose data is older than it
+    def check(self):
+        self._expire()
+        with self.lock:
+            watched_queries = list(self.queries.values())
+        if not watched_queries:
+            return
+
+        latest = probe_watermark()
+        for watched in watched_queries:
+            if latest is None or (watched.watermark is not None and latest <= watched.watermark):
+                continue
+
+            try:
+                self._refresh(watched, latest)
+            except Exception as e:
+                self._publish(watched, {"type": "error", "text": str(e)})
+
+    def _refresh(self, watched, latest):
+        store = get_snapshot_store()
+        current = store.frame(watched.snapshot_id)
+        data, watermark, delta_rows = refresh_incremental(watched.query, current, watched.watermark, latest=latest)
+
+        # Result has no eventid to upsert on, fall back to a count probe
+        if delta_rows is None:
+            row_count = probe_row_count(watched.query)
+            watched.watermark = watermark
+            if watched.row_count is None:
+                watched.row_count = len(current)
+            if row_count > watched.row_count:
+                watched.row_count = row_count
+                self._publish(watched, {"type": "new_data", "rows": row_count})
+
+        elif delta_rows:
+            snapshot_id = write_snapshot(data, watched.query)
+
+            # Sessions switch to the merged snapshot through the shared store, which already holds its frame
+            store.register(watched.query, watermark, snapshot_id, frame=data)
+            watched.watermark, watched.snapshot_id, watched.row_count = watermark, snapshot_id, len(data)
+            self._publish(watched, {"type": "delta", "watermark": watermark, "snapshot_id": snapshot_id, "delta_rows": delta_rows})
+
+        else:
+            watched.watermark = watermark
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+
+            with self.lock:
+                if not self.queries:
+                    self.thread = None
+                    return
+
+            try:
+                self.check()
+            except Exception as e:
+                with self.lock:
+                    watched_queries = list(self.queries.values())
+                for watched in watched_queries:
+                    self._publish(watched, {"type": "error", "text": str(e)})
+
+_watcher = None
+_watcher_lock = threading.Lock()
+
+# Shared watcher for every session in this process
+def get_watcher():
+    global _watcher
+
+    with _watcher_lock:
+        if _watcher is None:
+            _watcher = DataWatcher()
+        return _watcher
@@ -0,0 +1,213 @@
+import os
+import time
+import signal
+import resource
+import threading
+import multiprocessing
+from collections import OrderedDict
+from config import KERNEL_MAX_SESSIONS, EXECUTOR_WORKERS, EXECUTOR_TIMEOUT, EXECUTOR_CPU_LIMIT, EXECUTOR_MEMORY_LIMIT_MB
+
+# Raised inside a worker when a snippet exhausts its CPU-time budget
+class CpuLimitExceeded(Exception):
+    pass
+
+def _raise_cpu_limit(signum, frame):
+    raise CpuLimitExceeded("CPU time limit exceeded")
+
+# Arm RLIMIT_CPU so the snippet gets at most `seconds` more CPU time
+def _limit_cpu(seconds):
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if seconds:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        soft = int(usage.ru_utime + usage.ru_stime) + seconds
+        resource.setrlimit(resource.RLIMIT_CPU, (soft if hard == resource.RLIM_INFINITY else min(soft, hard), hard))
+    else:
+        resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+
+# Worker loop: keeps pandas imported, the current snapshot mapped and one kernel per session, the least
+# recently used dropped beyond `max_sessions`. Messages are ("run", session_id, snapshot_id, code, cpu_limit),
+# answered with the output, ("drop", session_id), which is not answered, and None to stop
+def _worker_main(conn, max_sessions):
+    from kernel import AnalysisKernel
+    from snapshots import current_snapshot_id
+    from snapshot_store import get_snapshot_store
+
+    signal.signal(signal.SIGXCPU, _raise_cpu_limit)
+    frame = get_snapshot_store().frame
+    kernels = OrderedDict()
+
+    # Warm start: map the current snapshot before the first request arrives
+    try:
+        if current_snapshot_id():
+            frame(current_snapshot_id())
+    except Exception:
+        pass
+
+    while True:
+        message = conn.recv()
+        if message is None:
+            return
+
+        if message[0] == "drop":
+            kernels.pop(message[1], None)
+            continue
+
+        _, session_id, snapshot_id, code, cpu_limit = message
+        kernel = kernels.get(session_id)
+
+        try:
+            if kernel is None or kernel.snapshot_id != snapshot_id:
+                kernel = kernels[session_id] = AnalysisKernel(snapshot_id, frame(snapshot_id))
+            kernels.move_to_end(session_id)
+            while len(kernels) > max_sessions:
+                kernels.popitem(last=False)
+
+            _limit_cpu(cpu_limit)
+            try:
+                output = kernel.run(code)
+            finally:
+                _limit_cpu(None)
+
+        except Exception as e:
+            output = f"Execution failed: {str(e)}"
+
+        conn.send(output)
+
+# Resident set size of a process in bytes (Linux only; None elsewhere)
+def _rss_bytes(pid):
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+# One warm worker process and the pipe used to talk to it
+class Worker:
+
+    def __init__(self, context, max_sessions):
+        self.context = context
+        self.max_sessions = max_sessions
+        self.lock = threading.Lock()
+        self.sessions = set()
+        self.start()
+
+    def start(self):
+        self.conn, child_conn = self.context.Pipe()
+        self.process = self.context.Process(target=_worker_main, args=(child_conn, self.max_sessions), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    # Kill and replace the process; sessions pinned to it lose their variables
+    def restart(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+        self.sessions.clear()
+        self.start()
+
+    # Tell the process to forget a session's kernel; a dead process has nothing to forget
+    def drop(self, session_id):
+        with self.lock:
+            self.sessions.discard(session_id)
+            try:
+                self.conn.send(("drop", session_id))
+            except (OSError, BrokenPipeError):
+                pass
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (OSError, BrokenPipeError):
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+
+# Pool of isolated executor processes with per-call wall-clock, CPU and RSS limits
+class WorkerPool:
+
+    def __init__(self, size=EXECUTOR_WORKERS, timeout=EXECUTOR_TIMEOUT, cpu_limit=EXECUTOR_CPU_LIMIT,
+                 memory_limit_mb=EXECUTOR_MEMORY_LIMIT_MB, max_sessions=KERNEL_MAX_SESSIONS):
+        self.timeout = timeout
+        self.cpu_limit = cpu_limit
+        self.memory_limit = memory_limit_mb * 1024 * 1024 if memory_limit_mb else None
+        self.context = multiprocessing.get_context("spawn")
+        self.workers = [Worker(self.context, max_sessions) for _ in range(max(1, size))]
+        self.assignments = {}
+        self.restarted = set()
+        self.lock = threading.Lock()
+
+    # Sessions stick to one worker so their variables persist; new sessions go to the least loaded. Also says
+    # whether the session lost its variables to a restart caused by another session since its last call
+    def _worker_for(self, session_id):
+        with self.lock:
+            worker = self.assignments.get(session_id)
+
+            if worker is None or session_id not in worker.sessions:
+                worker = min(self.workers, key=lambda w: len(w.sessions))
+                worker.sessions.add(session_id)
+                self.assignments[session_id] = worker
+
+            restarted = session_id in self.restarted
+            self.restarted.discard(session_id)
+            return worker, restarted
+
+    # Replace a worker after `session_id` broke a limit; the other sessions on it are told on their next call
+    def _restart(self, worker, session_id):
+        with self.lock:
+            self.restarted.update(worker.sessions - {session_id})
+        worker.restart()
+
+    # Drop a session's kernel in its worker now, so its variables don't outlive the data they were built from
+    def reset(self, session_id):
+        with self.lock:
+            worker = self.assignments.pop(session_id, None)
+            self.restarted.discard(session_id)
+        if worker is not None:
+            worker.drop(session_id)
+
+    def run(self, session_id, snapshot_id, code):
+        worker, restarted = self._worker_for(session_id)
+        if restarted:
+            return ("Execution failed: the executor process was restarted after another session's code exceeded its limits, "
+                    "so this session's variables were reset. Re-run the code defining any variables this snippet needs.")
+
+        with worker.lock:
+            worker.conn.send(("run", session_id, snapshot_id, code, self.cpu_limit))
+            deadline = time.monotonic() + self.timeout
+
+            # Wait for the result while watching wall-clock time, memory and liveness
+            while not worker.conn.poll(0.05):
+                if time.monotonic() > deadline:
+                    failure = f"timed out after {self.timeout:g}s"
+                elif self.memory_limit and (_rss_bytes(worker.process.pid) or 0) > self.memory_limit:
+                    failure = f"memory limit of {self.memory_limit // (1024 * 1024)} MB exceeded"
+                elif not worker.process.is_alive():
+                    failure = "worker process crashed"
+                else:
+                    continue
+
+                self._restart(worker, session_id)
+                return f"Execution failed: {failure}. Session variables were reset."
+
+            try:
+                return worker.conn.recv()
+            except EOFError:
+                self._restart(worker, session_id)
+                return "Execution failed: worker process crashed. Session variables were reset."
+
+    def close(self):
+        for worker in self.workers:
+            worker.stop()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Shared worker pool, started lazily on first use
+def get_worker_pool():
+    global _pool
+
+    with _pool_lock:
+        if _pool is None:
+            _pool = WorkerPool()
+        return _pool